@@ -5,10 +5,13 @@ Standalone HB-Maison importer.
 
 Defaults (no args):
 - Find HB-Maison.xlsm automatically under BASE_DIR (and common subfolders)
-- Backup DB (JSON + SQLite file if applicable)
+- Backup DB (JSONL dump + online SQLite snapshot if applicable; see manage.py backup)
 - Wipe Party/Item/Inventory/Transaction
 - Import from 'Transactions' sheet (header row = 3rd visual row)
 - Sync Party roles from history, prune orphan Parties
+
+--incremental skips the wipe: each imported transaction stores a fingerprint of its
+spreadsheet row, so only new/changed/removed rows are written and only their items replayed.
 """
 
 """
@@ -18,6 +21,8 @@ python import_hbmaison.py --excel /path/file.xlsm
 python import_hbmaison.py --settings mysite.settings
 python import_hbmaison.py --limit 200 --strict
 python import_hbmaison.py --app ledger --database default
+python import_hbmaison.py --incremental --dry-run   # فقط تعداد ردیف‌های جدید/تغییرکرده/حذفی
+python import_hbmaison.py --incremental            # بدون پاک کردن؛ فقط تفاوت‌ها ثبت و بازپخش می‌شوند
 """
 
 
@@ -31,8 +36,7 @@ django.setup()
 
 from ledger.models import OP_SELL, OP_BUY, OP_RCV, OP_PAY, OP_USE
 import argparse
-import shutil
-from datetime import datetime
+import hashlib
 from typing import Optional, Tuple
 
 import warnings
@@ -92,32 +96,16 @@ def ensure_backups_dir() -> str:
     return bdir
 
 def backup_database(database_alias: str = "default"):
-    from django.core import management
-    from django.conf import settings
+    from django.db import connections
+    from ledger.services import backup
     bdir = ensure_backups_dir()
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-
-    # JSON dump
-    json_path = os.path.join(bdir, f"dump-{ts}.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        management.call_command(
-            "dumpdata",
-            "--natural-foreign", "--natural-primary",
-            "--indent", "2",
-            stdout=f,
-            database=database_alias
-        )
-    print(f"✅ JSON backup: {json_path}")
-
-    # SQLite copy (if applicable)
-    dbcfg = settings.DATABASES.get(database_alias, {})
-    engine = dbcfg.get("ENGINE", "")
-    if "sqlite" in engine:
-        db_path = dbcfg.get("NAME")
-        if db_path and os.path.exists(db_path):
-            sqlite_copy = os.path.join(bdir, f"db-{ts}.sqlite3")
-            shutil.copy2(db_path, sqlite_copy)
-            print(f"✅ SQLite backup: {sqlite_copy}")
+
+    # SQLite: کپی سازگار با Online Backup API (نه کپی فایل در حال نوشتن)؛ بقیه: JSONL
+    if connections[database_alias].vendor == "sqlite":
+        result = backup.snapshot(bdir, using=database_alias)
+        print(f"✅ SQLite backup: {result['path']} ({result['seconds']:.1f}s)")
+    result = backup.dump_jsonl(bdir, using=database_alias)
+    print(f"✅ JSONL backup: {result['path']} ({result['seconds']:.1f}s)")
 
 # --- Jalali -> Gregorian (no external deps) ---
 def jalali_to_gregorian(j_y: int, j_m: int, j_d: int) -> Tuple[int, int, int]:
@@ -198,41 +186,66 @@ SETTLEMENT_MAP = {
 }
 
 # --------------- Import core ---------------
-def run_import(excel_path: str, app_label: str = "ledger", limit: Optional[int] = None, strict: bool = False):
-    import pandas as pd
-    from django.apps import apps
-    from django.db import transaction as dbtx
-    from ledger.services.stock import post_stock_tx
+SYSTEM_ITEM = "(سیستمی) قلم نامشخص"
+ITEM_OPS = (OP_SELL, OP_BUY, OP_USE)
 
-    def to_int0(x):
-        # NaN/None/"" → 0 ؛ عدد اعشاری → floor/int
-        if x is None:
-            return 0
-        try:
-            if pd.isna(x):
-                return 0
-        except Exception:
-            pass
-        try:
-            return int(float(x))
-        except Exception:
-            return 0
 
-    Transaction = apps.get_model(app_label, "Transaction")
-    Party = apps.get_model(app_label, "Party")
-    Item = apps.get_model(app_label, "Item")
+class _Timer:
+    """Prints elapsed time per import phase."""
+    def __init__(self):
+        import time
+        self._now = time.perf_counter
+        self.started = self.last = self._now()
+
+    def phase(self, label: str, rows: Optional[int] = None):
+        now = self._now()
+        took = now - self.last
+        rate = f" ({rows / took:,.0f} rows/s)" if rows and took > 0 else ""
+        print(f"⏱ {label}: {took:.2f}s{rate}")
+        self.last = now
 
+    @property
+    def total(self) -> float:
+        return self._now() - self.started
+
+
+def _norm_col(col):
+    """Vectorized norm_str over a column (None for empty/'nan'/'none'/'null')."""
+    s = col.astype("string")
+    s = (s.str.replace("\u064a", "\u06cc", regex=False).str.replace("\u0643", "\u06a9", regex=False)
+          .str.replace("\u200c", "", regex=False).str.replace("\xa0", " ", regex=False)
+          .str.strip())
+    s = s.mask(s.str.lower().isin(["nan", "none", "null", ""]))
+    return s.astype(object).where(s.notna(), None)
+
+
+def _int0(col):
+    """Vectorized to_int0: NaN/None/"" → 0, decimals truncated."""
+    import pandas as pd
+    return pd.to_numeric(col, errors="coerce").fillna(0).astype("int64")
+
+
+def read_transactions_sheet(excel_path: str):
+    import pandas as pd
     HEADER_ROW = 2
-    SHEET_NAME_CANDIDATES = ["transactions", "Transactions"]
-    df = None
-    for SHEET_NAME in SHEET_NAME_CANDIDATES:
+    for sheet_name in ["transactions", "Transactions"]:
         try:
-            df = pd.read_excel(excel_path, sheet_name=SHEET_NAME, header=HEADER_ROW)
-            break
+            return pd.read_excel(excel_path, sheet_name=sheet_name, header=HEADER_ROW)
         except Exception:
             pass
-    if df is None:
-        raise RuntimeError("Failed to read Excel: could not find sheet 'transactions' or 'Transactions'")
+    raise RuntimeError("Failed to read Excel: could not find sheet 'transactions' or 'Transactions'")
+
+
+def normalize_frame(df, limit: Optional[int] = None):
+    """
+    Rename/normalize the sheet columns with vectorized pandas operations.
+    Returns (df, skipped) where df has one row per usable spreadsheet row and the columns
+    date_shamsi, date_miladi, op_type, party_name, item_name, qty, unit_price, total_price,
+    payment_amount, payment_method (already mapped to PaymentMethod codes).
+    Item rows with qty <= 0 are kept (their party/item are still created) and dropped in build_specs.
+    """
+    import pandas as pd
+    from datetime import date as _date
 
     df = df.loc[:, ~df.columns.astype(str).str.contains("^Unnamed")]
     df = df.rename(columns={
@@ -242,215 +255,297 @@ def run_import(excel_path: str, app_label: str = "ledger", limit: Optional[int]
         "قیمت کل": "total_price", "تسویه": "payment_amount", "نحوه تسویه": "payment_method",
         "سود فروش": "profit",
     })
-
-    for c in ["year", "month", "day"]:
-        if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
-    for c in ["qty", "unit_price", "total_price", "payment_amount", "profit"]:
-        if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce")
-    for c in ["op_type", "item_name", "party_name", "payment_method"]:
-        if c in df.columns: df[c] = df[c].apply(norm_str)
-
-    # فیلتر ردیف‌های فاقد نوع عملیات
     if "op_type" not in df.columns:
         raise RuntimeError("Excel is missing 'op_type' (ستون «نوع عملیات»)")
-    before = len(df)
-    df = df[df["op_type"].notna() & (df["op_type"].str.strip() != "")]
-    removed = before - len(df)
-    if removed:
-        print(f"⚠ {removed} rows dropped: missing op_type")
+    for c in ["item_name", "party_name", "payment_method", "year", "month", "day",
+              "qty", "unit_price", "total_price", "payment_amount"]:
+        if c not in df.columns:
+            df[c] = None
 
-    # ⬇️ فیلتر: ردیف‌هایی که نوع عملیات ندارند حذف شوند
-    if "op_type" not in df.columns:
-        raise RuntimeError("Excel is missing 'op_type' (ستون «نوع عملیات»)")
+    for c in ["op_type", "item_name", "party_name", "payment_method"]:
+        df[c] = _norm_col(df[c])
 
+    # ردیف‌های فاقد نوع عملیات
     before = len(df)
-    df = df[df["op_type"].notna() & (df["op_type"].str.strip() != "")]
-    removed = before - len(df)
-    if removed:
-        print(f"⚠ {removed} rows dropped: missing op_type")
-
-    shamsi, miladi, ok = [], [], []
-    for _, row in df.iterrows():
-        y = row.get("year"); m = row.get("month"); d = row.get("day")
-        if y < 100: y += 1400
-        if pd.isna(y) or pd.isna(m) or pd.isna(d):
-            shamsi.append(None); miladi.append(None); ok.append(False); continue
-        y, m, d = int(y), int(m), int(d)
-        sh = f"{y}/{z2(m)}/{z2(d)}"
+    df = df[df["op_type"].notna()]
+    if before - len(df):
+        print(f"⚠ {before - len(df)} rows dropped: missing op_type")
+    if limit:
+        df = df.head(limit)
+    total_rows = len(df)
+
+    # تاریخ: سال دورقمی → 14xx؛ تبدیل فقط یک بار برای هر روز یکتا
+    y = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+    y = y.where((y >= 100).fillna(True), y + 1400)
+    m = pd.to_numeric(df["month"], errors="coerce").astype("Int64")
+    d = pd.to_numeric(df["day"], errors="coerce").astype("Int64")
+    has_date = (y.notna() & m.notna() & d.notna()).to_numpy()
+    days = list(zip(y[has_date].astype(int), m[has_date].astype(int), d[has_date].astype(int)))
+
+    shamsi, miladi = {}, {}
+    for key in set(days):
+        jy, jm, jd = key
+        shamsi[key] = f"{jy}/{z2(jm)}/{z2(jd)}"
         try:
-            gy, gm, gd = jalali_to_gregorian(y, m, d)
-            gr = f"{gy}-{z2(gm)}-{z2(gd)}"
-            shamsi.append(sh); miladi.append(gr); ok.append(True)
+            miladi[key] = _date(*jalali_to_gregorian(jy, jm, jd))
         except Exception:
-            shamsi.append(sh); miladi.append(None); ok.append(False)
-    df["date_shamsi"] = shamsi
-    df["date_miladi"] = miladi
-    df["date_ok"] = ok
-
-    if limit: df = df.head(limit)
-
-    party_cache, item_cache = {}, {}
-    def get_or_create_party(name: Optional[str]):
-        if not name: return None
-        if name in party_cache: return party_cache[name]
-        obj, _ = Party.objects.get_or_create(name=name, defaults={"is_customer": True, "is_supplier": False})
-
-        if not (obj.is_customer or obj.is_supplier):
-            obj.is_customer = True
-            obj.is_supplier = False
-            obj.save(update_fields=["is_customer", "is_supplier"])
-
-        party_cache[name] = obj
-        return obj
-
-    def get_or_create_item(name: Optional[str], is_consignment):
-        if not name: return None
-        if name in item_cache: return item_cache[name]
-        obj, _ = Item.objects.get_or_create(name=name, defaults={"unit": "عدد"})
-
-        if obj.unit != "عدد":
-            obj.unit = "عدد"
-            obj.save(update_fields=["unit"])
-
-        if obj.group != "formal":
-            obj.group = "formal"
-            obj.save(update_fields=["group"])
-
-        if is_consignment:
-            obj.is_consignment = True
-            obj.commission_amount = 0
-            obj.commission_percent = 0
-            obj.save(update_fields=["is_consignment", "commission_amount", "commission_percent"])
-
-        item_cache[name] = obj
-        return obj
-
-    created_tx = skipped = updated_sell_price = 0
-    from datetime import date as _date
+            miladi[key] = None
+
+    date_shamsi = pd.Series(None, index=df.index, dtype=object)
+    date_miladi = pd.Series(None, index=df.index, dtype=object)
+    date_shamsi[has_date] = [shamsi[k] for k in days]
+    date_miladi[has_date] = [miladi[k] for k in days]
+
+    out = pd.DataFrame({
+        "date_shamsi": date_shamsi,
+        "date_miladi": date_miladi,
+        "op_type": df["op_type"].map(OP_MAP),
+        "party_name": df["party_name"],
+        "item_name": df["item_name"],
+        "qty": _int0(df["qty"]),
+        "unit_price": _int0(df["unit_price"]),
+        "total_price": _int0(df["total_price"]),
+        "payment_amount": _int0(df["payment_amount"]),
+        "payment_method": df["payment_method"].map(lambda v: SETTLEMENT_MAP.get(v or "", "CASH")),
+    }, index=df.index)
+
+    keep = (out["date_miladi"].notna()
+            & ~out["party_name"].isin(SKIP_PARTIES)
+            & out["op_type"].notna())
+    out = out[keep].copy()
+
+    is_item = out["op_type"].isin(ITEM_OPS)
+    out.loc[is_item & out["item_name"].isna(), "item_name"] = SYSTEM_ITEM
+    neg = is_item & (out["qty"] > 0) & (out["unit_price"] < 0)
+    out.loc[neg, "unit_price"] = out.loc[neg, "total_price"] // out.loc[neg, "qty"]
+    skipped = total_rows - int(keep.sum())
+    return out, skipped
+
+
+def _chunks(seq, size=500):
+    seq = list(seq)
+    for k in range(0, len(seq), size):
+        yield seq[k:k + size]
+
+
+def resolve_names(Model, names, defaults: dict, normalize_search):
+    """
+    {name: obj} for all distinct names: existing rows in chunked IN queries, missing ones
+    with one bulk_create (bulk_create skips save() → search_name is filled here).
+    """
+    names = [n for n in dict.fromkeys(names) if n]  # ترتیب اولین ظهور در فایل
+    found = {}
+    for chunk in _chunks(names):
+        for obj in Model.objects.filter(name__in=chunk).order_by("-id"):
+            found[obj.name] = obj  # نام تکراری در دیتابیس → کوچک‌ترین id (مثل get_or_create اول)
+    missing = [Model(name=n, search_name=normalize_search(n), **defaults) for n in names if n not in found]
+    for obj in Model.objects.bulk_create(missing, batch_size=500):
+        found[obj.name] = obj
+    return found, len(missing)
+
+
+def fingerprint(*parts) -> str:
+    """Stable sha1 over the given values (None → empty)."""
+    raw = "\x1f".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def build_specs(df):
+    """
+    post_stock_txs specs in spreadsheet order (each row's item line, then its settlement line),
+    still holding party_name/item_name (resolve_specs swaps them for objects).
+    Each spec carries import_key (row identity: date, op, party, item + occurrence number of that
+    identity in the file) and import_fp (identity + qty/prices/settlement) for incremental imports.
+    """
+    specs = []
+    seen = {}
+
+    def add(spec, source):
+        ident = (spec["date_shamsi"], spec["op_type"], spec["party_name"], source)
+        seen[ident] = seen.get(ident, 0) + 1
+        spec["import_key"] = fingerprint(*ident, seen[ident])
+        spec["import_fp"] = fingerprint(*ident, spec["qty"], spec["unit_price"], spec["total_price"],
+                                        spec["payment_method"], spec.get("description"))
+        specs.append(spec)
+
+    cols = ["date_shamsi", "date_miladi", "op_type", "party_name", "item_name",
+            "qty", "unit_price", "total_price", "payment_amount", "payment_method"]
+    for sh, dm, op, party_name, item_name, qty, unit_price, total_price, payment, method in zip(*(df[c] for c in cols)):
+        if op in ITEM_OPS:
+            if qty <= 0:
+                continue  # ردیف کالایی بدون تعداد مثبت کلاً رد می‌شود (تسویه‌ی همان ردیف هم)
+            add(dict(
+                date_shamsi=sh, date_miladi=dm, op_type=op, item_name=item_name, party_name=party_name,
+                qty=int(qty), unit_price=int(unit_price), total_price=int(total_price), payment_method=None,
+            ), item_name)
+        if payment > 0:
+            add(dict(
+                date_shamsi=sh, date_miladi=dm,
+                op_type=OP_RCV if op in (OP_SELL, OP_RCV, OP_USE) else OP_PAY,
+                party_name=party_name, item_name=None, qty=None, unit_price=None, total_price=int(payment),
+                payment_method=method,
+                description=item_name if op in (OP_RCV, OP_PAY) else None,
+            ), item_name)
+    return specs
+
+
+def resolve_specs(specs, parties: dict, items: dict):
+    out = []
+    for spec in specs:
+        spec = dict(spec)
+        party_name, item_name = spec.pop("party_name"), spec.pop("item_name")
+        spec["party"] = parties.get(party_name) if party_name else None
+        spec["item"] = items[item_name] if item_name else None
+        out.append(spec)
+    return out
+
+
+def resolve_lookups(df, Party, Item, timer):
+    """
+    Parties/items of the sheet (missing ones bulk-created), role/unit/group fixes and
+    sell_price = unit price of each item's last sale in the file.
+    Returns (parties, items).
+    """
+    from ledger.utils import normalize_search
+    from ledger import viewcache
+
+    parties, new_parties = resolve_names(Party, df["party_name"].unique(),
+                                         {"is_customer": True, "is_supplier": False}, normalize_search)
+    # طرف حساب موجود بدون نقش → مشتری
+    no_role = [p.id for p in parties.values() if not (p.is_customer or p.is_supplier)]
+    for chunk in _chunks(no_role):
+        Party.objects.filter(id__in=chunk).update(is_customer=True)
+
+    item_rows = df[df["op_type"].isin(ITEM_OPS)]
+    items, new_items = resolve_names(Item, item_rows["item_name"].unique(),
+                                     {"unit": "عدد", "group": "formal"}, normalize_search)
+    informal = [i.id for i in items.values() if i.unit != "عدد" or i.group != "formal"]
+    for chunk in _chunks(informal):
+        Item.objects.filter(id__in=chunk).update(unit="عدد", group="formal")
+
+    # قیمت فروش = قیمت واحد آخرین فروش هر کالا در فایل
+    sells = item_rows[(item_rows["op_type"] == OP_SELL) & (item_rows["qty"] > 0)]
+    last_sell = sells.groupby("item_name")["unit_price"].last()
+    changed_prices = []
+    for name, price in last_sell.items():
+        item = items[name]
+        if item.sell_price != int(price):
+            item.sell_price = int(price)
+            changed_prices.append(item)
+    Item.objects.bulk_update(changed_prices, ["sell_price"], batch_size=500)
+    viewcache.bump(viewcache.ITEMS, viewcache.PARTIES)
+    timer.phase(f"lookups (parties +{new_parties}, items +{new_items})")
+    print(f"🧾 Updated Sell Price: {len(changed_prices)}")
+    return parties, items
 
-    @dbtx.atomic
-    def do_import():
-        nonlocal created_tx, skipped, updated_sell_price
-        for _, r in df.iterrows():
-            if not r.get("date_ok"): skipped += 1; continue
-            if r.get("party_name") in SKIP_PARTIES: skipped +=1; continue
-
-            op_type = OP_MAP.get(r.get("op_type"), None)
-            if not op_type: skipped += 1; continue
-
-            party = get_or_create_party(r.get("party_name")) if r.get("party_name") else None
-            qty         = to_int0(r.get("qty"))
-            unit_price  = to_int0(r.get("unit_price"))
-            total_price = to_int0(r.get("total_price"))
-            payment_amount = to_int0(r.get("payment_amount"))
-            method = SETTLEMENT_MAP.get(r.get("payment_method") or "", "CASH")
-            item_name = r.get("item_name")
-
-            y, m, d = map(int, str(r.get("date_miladi")).split("-"))
-            dm_date = _date(y, m, d)
-
-            if op_type in (OP_SELL, OP_BUY, OP_USE):
-                if not item_name:
-                    item_name = "(سیستمی) قلم نامشخص"
-
-                item = get_or_create_item(item_name, method == 'اعتباری')
-
-                if not qty or qty <= 0:
-                    continue
-                if unit_price is None or unit_price < 0:
-                    unit_price = to_int0(total_price // qty) if (total_price is not None and qty) else 0
-                if total_price is None:
-                    total_price = (unit_price or 0) * (qty or 0)
-
-                post_stock_tx(
-                    date_shamsi=r.get("date_shamsi"),
-                    date_miladi=dm_date,
-                    op_type=op_type,
-                    item=item,
-                    party=party,
-                    qty=qty,
-                    unit_price=unit_price,
-                    total_price=total_price,
-                    payment_method=None,
-                )
-                created_tx += 1
-
-                if op_type == OP_SELL:
-                    if item.sell_price != unit_price:
-                        item.sell_price = unit_price
-                        item.save(update_fields=["sell_price"])
-                        updated_sell_price += 1
-
-            if payment_amount > 0:
-                description = item_name if op_type in (OP_RCV, OP_PAY) else None
-
-                if op_type in (OP_SELL, OP_RCV, OP_USE):
-                    op_type = OP_RCV
-                elif op_type in (OP_BUY, OP_PAY):
-                    op_type = OP_PAY
-                else:
-                    continue
-
-                Transaction.objects.create(
-                    date_shamsi=r.get("date_shamsi"),
-                    date_miladi=dm_date,
-                    op_type=op_type,
-                    party=party,
-                    item=None,
-                    qty=None,
-                    unit_price=None,
-                    total_price=payment_amount,
-                    payment_method=method,
-                    description=description,
-                )
-                created_tx += 1
-
-    do_import()
-    print(f"📊 Import: created≈{created_tx}, skipped={skipped}")
-    print(f"🧾 Updated Sell Price: {updated_sell_price}")
 
-def sync_roles_and_prune(app_label: str = "ledger"):
-    from django.db.models import Q, Count
+def run_import(excel_path: str, app_label: str = "ledger", limit: Optional[int] = None, strict: bool = False):
     from django.apps import apps
+    from django.db import transaction as dbtx
+    from ledger.services.stock import post_stock_txs
+
     Party = apps.get_model(app_label, "Party")
+    Item = apps.get_model(app_label, "Item")
     Transaction = apps.get_model(app_label, "Transaction")
+    timer = _Timer()
+
+    raw = read_transactions_sheet(excel_path)
+    timer.phase(f"read ({len(raw):,} rows)", len(raw))
+
+    df, skipped = normalize_frame(raw, limit)
+    specs = build_specs(df)
+    timer.phase("normalize", len(raw))
+
+    keys = [spec["import_key"] for spec in specs]
+    if any(Transaction.objects.filter(import_key__in=chunk).exists() for chunk in _chunks(keys)):
+        raise RuntimeError("Rows of this workbook are already imported; wipe first or use --incremental")
+
+    with dbtx.atomic():
+        parties, items = resolve_lookups(df, Party, Item, timer)
+        post_stock_txs(resolve_specs(specs, parties, items))
+        timer.phase(f"insert + replay ({len(specs):,} transactions)", len(specs))
+
+    print(f"📊 Import: created={len(specs)}, skipped={skipped}")
+    print(f"⏱ Total: {timer.total:.2f}s ({len(raw) / max(timer.total, 1e-9):,.0f} rows/s)")
+
+
+def run_delta_import(excel_path: str, app_label: str = "ledger", dry_run: bool = False) -> dict:
+    """
+    Incremental import: spreadsheet rows are matched to transactions by import_key.
+    - key not in DB → insert; same key, different import_fp → update in place; key gone from the file → delete
+    - transactions without import_key (entered in the app) are never touched
+    - only the items/parties of changed rows are replayed (services.stock.sync_stock_txs)
+    dry_run: only prints/returns the diff counts.
+    """
+    from django.apps import apps
+    from django.db import transaction as dbtx
+    from ledger.services.stock import sync_stock_txs
 
-    stats = (
-        Transaction.objects.exclude(party__isnull=True)
-        .values("party")
-        .annotate(
-            sale=Count("id", filter=Q(op_type="SELL")),
-            recv=Count("id", filter=Q(op_type="RCV")),
-            purch=Count("id", filter=Q(op_type="BUY")),
-            pay=Count("id", filter=Q(op_type="PAY")),
-            own=Count("id", filter=Q(op_type="USE")),
+    Party = apps.get_model(app_label, "Party")
+    Item = apps.get_model(app_label, "Item")
+    Transaction = apps.get_model(app_label, "Transaction")
+    timer = _Timer()
+
+    raw = read_transactions_sheet(excel_path)
+    timer.phase(f"read ({len(raw):,} rows)", len(raw))
+
+    df, skipped = normalize_frame(raw)
+    specs = build_specs(df)
+    timer.phase("normalize", len(raw))
+
+    existing = {key: (tx_id, fp) for tx_id, key, fp in
+                Transaction.objects.exclude(import_key=None).values_list("id", "import_key", "import_fp")}
+    keys = set()
+    create, update = [], {}
+    for spec in specs:
+        keys.add(spec["import_key"])
+        found = existing.get(spec["import_key"])
+        if found is None:
+            create.append(spec)
+        elif found[1] != spec["import_fp"]:
+            update[found[0]] = spec
+    delete = [tx_id for key, (tx_id, _) in existing.items() if key not in keys]
+    diff = {"insert": len(create), "update": len(update), "delete": len(delete),
+            "unchanged": len(specs) - len(create) - len(update)}
+    timer.phase(f"diff ({len(existing):,} imported transactions)")
+    print(f"🔍 Diff: +{diff['insert']} ~{diff['update']} -{diff['delete']} ={diff['unchanged']} (skipped rows={skipped})")
+
+    if dry_run:
+        print("↷ Dry run: nothing written.")
+        return diff
+
+    with dbtx.atomic():
+        parties, items = resolve_lookups(df, Party, Item, timer)
+        result = sync_stock_txs(
+            create=resolve_specs(create, parties, items),
+            update=dict(zip(update, resolve_specs(update.values(), parties, items))),
+            delete=delete,
         )
-    )
-    updated = 0
-    for r in stats:
-        pid = r["party"]
-        cust = (r["sale"] or 0) + (r["recv"] or 0) + (r["own"] or 0)
-        supp = (r["purch"] or 0) + (r["pay"] or 0)
-        # cust و supp همان شمارنده‌های مشتری/فروشنده شما هستند
-
-        is_customer = cust > 0
-        is_supplier = supp > 0
-
-        if not is_customer and not is_supplier:
-            is_customer = True
-
-        p = Party.objects.get(id=pid)
-        if p.is_customer != is_customer or p.is_supplier != is_supplier:
-            p.is_customer = is_customer
-            p.is_supplier = is_supplier
-            p.save(update_fields=["is_customer", "is_supplier"])
-            updated += 1
-
-    pruned = Party.objects.filter(transactions__isnull=True).count()
-    Party.objects.filter(transactions__isnull=True).delete()
-    print(f"👥 Roles synced (updated={updated}); 🧽 orphan Parties pruned={pruned}")
+        timer.phase(f"sync + replay ({result['items']} items, {result['parties']} parties)")
+
+    print(f"⏱ Total: {timer.total:.2f}s")
+    return diff
+
+def sync_roles_and_prune(app_label: str = "ledger"):
+    from ledger.services.parties import sync_roles
+    result = sync_roles()
+    print(f"👥 Roles synced (customers={result['customers']}, suppliers={result['suppliers']}); "
+          f"🧽 orphan Parties pruned={result['pruned']} ({result['seconds']:.2f}s)")
 
 # --------------- CLI ---------------
+def wipe_ledger(app_label: str = "ledger"):
+    """
+    پاک کردن همه‌ی داده‌های دفتر قبل از ورود کامل؛ جدول‌های مشتق (جمع روزانه، چک‌پوینت‌ها، خلاصه‌ی طرف حساب)
+    FK ندارند یا نباید بمانند → صریح پاک می‌شوند (مثل generate_ledger --flush)
+    """
+    from django.apps import apps
+    from django.db import transaction as dbtx
+    names = ("StockCheckpoint", "DailySalesRollup", "PartyBalance", "Transaction", "Inventory", "Item", "Party")
+    with dbtx.atomic():
+        for name in names:
+            apps.get_model(app_label, name).objects.all().delete()
+
+
 def main():
     parser = argparse.ArgumentParser(description="HB-Maison Excel importer (standalone).")
     parser.add_argument("--excel", help="Path to HB-Maison.xlsm (optional; auto-discover if omitted)")
@@ -461,7 +556,14 @@ def main():
     parser.add_argument("--no-backup", action="store_true", help="Skip backup")
     parser.add_argument("--no-wipe", action="store_true", help="Do not wipe tables")
     parser.add_argument("--database", default="default", help="Database alias (default: default)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Apply only inserted/changed/removed rows (no wipe; rows matched by fingerprint)")
+    parser.add_argument("--dry-run", action="store_true", help="With --incremental: report the diff without writing")
     args = parser.parse_args()
+    if args.dry_run and not args.incremental:
+        parser.error("--dry-run requires --incremental")
+    if args.incremental and args.limit:
+        parser.error("--limit cannot be combined with --incremental (rows past the limit would be deleted)")
 
     settings_module = django_setup(args.settings)
     print(f"⚙ Using settings: {settings_module}")
@@ -471,6 +573,10 @@ def main():
     if not excel or not os.path.exists(excel):
         raise SystemExit("❌ Excel file not found. Put 'HB-Maison.xlsm' next to manage.py or pass --excel /full/path.xlsm")
 
+    if args.dry_run:
+        run_delta_import(excel_path=excel, app_label=args.app, dry_run=True)
+        return
+
     # Backup (default ON)
     if not args.no_backup:
         backup_database(args.database)
@@ -479,25 +585,21 @@ def main():
 
     # Wipe (default ON)
     from django.apps import apps
-    from django.db import transaction as dbtx
-    Party = apps.get_model(args.app, "Party")
-    Item = apps.get_model(args.app, "Item")
-    Inventory = apps.get_model(args.app, "Inventory")
-    Transaction = apps.get_model(args.app, "Transaction")
-
-    if not args.no_wipe:
-        print("🧹 Wiping tables (Transaction, Inventory, Item, Party)...")
-        with dbtx.atomic():
-            Transaction.objects.all().delete()
-            Inventory.objects.all().delete()
-            Item.objects.all().delete()
-            Party.objects.all().delete()
+
+    if args.incremental:
+        print("↷ Incremental import: no wipe.")
+    elif not args.no_wipe:
+        print("🧹 Wiping ledger tables...")
+        wipe_ledger(args.app)
         print("✔ Tables wiped.")
     else:
         print("↷ Skip wiping (--no-wipe).")
 
     # Import
-    run_import(excel_path=excel, app_label=args.app, limit=args.limit, strict=args.strict)
+    if args.incremental:
+        run_delta_import(excel_path=excel, app_label=args.app)
+    else:
+        run_import(excel_path=excel, app_label=args.app, limit=args.limit, strict=args.strict)
 
     # Post-process
     sync_roles_and_prune(app_label=args.app)
@@ -2,9 +2,47 @@ from django.contrib import admin
 from .models import Item, Party, Inventory, Transaction, OP_RCV, OP_PAY
 from .proxies import Receipt, Payment
 from .forms import PartyForm
+from .services.balances import resync_parties
+from .services.rollup import rebuild_rollup
+from .services.stock import replay_items
+from . import viewcache
+
+class _DerivedStateAdminMixin:
+    """
+    ویرایش/حذف تراکنش خارج از مسیر ثبت → همه‌ی داده‌های مشتق‌شده دوباره ساخته می‌شوند:
+    COGS کالاها (بازپخش از ردیف درگیر)، مانده‌ی طرف حساب‌ها، جمع روزانه‌ی فروش روزهای درگیر و نسخه‌ی کش گزارش‌ها
+    """
+    def save_model(self, request, obj, form, change):
+        old_party, old_day, old_pos = None, None, None
+        if change:
+            old = (Transaction.objects.filter(pk=obj.pk)
+                   .values_list("party_id", "jy", "jm", "jd", "item_id", "date_miladi").first())
+            if old:
+                old_party, old_day, old_pos = old[0], old[1:4], (old[4], (old[5], obj.pk))
+        super().save_model(request, obj, form, change)
+        replay_items([p for p in (old_pos, (obj.item_id, (obj.date_miladi, obj.pk))) if p])
+        resync_parties({old_party, obj.party_id})
+        rebuild_rollup({old_day, (obj.jy, obj.jm, obj.jd)})
+        viewcache.bump(viewcache.TX)
+
+    def delete_model(self, request, obj):
+        party_id, day, pos = obj.party_id, (obj.jy, obj.jm, obj.jd), (obj.item_id, (obj.date_miladi, obj.pk))
+        super().delete_model(request, obj)
+        replay_items([pos])
+        resync_parties({party_id})
+        rebuild_rollup({day})
+        viewcache.bump(viewcache.TX)
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list("party_id", "jy", "jm", "jd", "item_id", "date_miladi", "id"))
+        super().delete_queryset(request, queryset)
+        replay_items([(r[4], (r[5], r[6])) for r in rows])
+        resync_parties({r[0] for r in rows})
+        rebuild_rollup({r[1:4] for r in rows})
+        viewcache.bump(viewcache.TX)
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(_DerivedStateAdminMixin, admin.ModelAdmin):
     list_display = ("id","date_shamsi","date_miladi", "op_type","item","item_id","party","party_id","qty","unit_price","total_price","description","cogs")
     list_select_related = ("item","party")
     list_filter  = ("op_type", "party", "date_shamsi", "date_miladi")
@@ -12,7 +50,7 @@ class TransactionAdmin(admin.ModelAdmin):
     ordering = ("-date_miladi",)
 
 # پایه‌ی مشترک برای دریافت/پرداخت
-class _MoneyMoveBaseAdmin(admin.ModelAdmin):
+class _MoneyMoveBaseAdmin(_DerivedStateAdminMixin, admin.ModelAdmin):
     list_display = ("date_shamsi", "date_miladi", "party", "op_type", "total_price", "payment_method", "description")
     list_filter  = ("party", "payment_method", "date_shamsi", "date_miladi")
     search_fields = ("party__name",)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class LedgerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ledger"
+
+    def ready(self):
+        from .sqlite import configure_connection
+        from .slowlog import install as install_slow_query_log
+        connection_created.connect(configure_connection, dispatch_uid="ledger.sqlite.configure_connection")
+        connection_created.connect(install_slow_query_log, dispatch_uid="ledger.slowlog.install")
@@ -1,8 +1,9 @@
 from decimal import Decimal, InvalidOperation
 from django import forms
+from django.urls import reverse_lazy
 from .models import Item, Party, PaymentMethod, OpType, OP_SELL, OP_BUY, OP_RCV, OP_PAY, OP_USE, ItemGroup
 import jdatetime
-from .utils import toFa
+from .utils import toFa, toEn, normalize_search
 
 _digit_map = str.maketrans({
     "۰":"0","۱":"1","۲":"2","۳":"3","۴":"4","۵":"5","۶":"6","۷":"7","۸":"8","۹":"9",
@@ -32,6 +33,33 @@ def _normalize_number(value, allow_decimal=False):
     except InvalidOperation:
         raise forms.ValidationError("مقدار عددی نامعتبر است.")
 
+class AutocompleteSelect(forms.Select):
+    """
+    Select برای لیست‌های بزرگ (کالا/طرف حساب): فقط گزینه‌ی انتخاب‌شده رندر می‌شود
+    و بقیه با جستجوی ajax (data-autocomplete) در select2 می‌آیند.
+    اعتبارسنجی همان ModelChoiceField است (یک get روی id ارسال‌شده).
+    """
+    def __init__(self, url, attrs=None):
+        attrs = {**(attrs or {}), "data-autocomplete": url}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        ids = [v for v in value if v not in ("", None)]
+        try:
+            selected = list(field.queryset.filter(pk__in=ids)) if ids else []
+        except (ValueError, TypeError):
+            selected = []
+        choices = [("", field.empty_label)] if field.empty_label is not None else []
+        choices += [(field.prepare_value(obj), field.label_from_instance(obj)) for obj in selected]
+
+        original, self.choices = self.choices, choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = original
+
+
 class TransactionForm(forms.Form):
     # تاریخ (مخفی و نمایشی)
     date_shamsi = forms.CharField(
@@ -67,7 +95,7 @@ class TransactionForm(forms.Form):
     party = forms.ModelChoiceField(
         queryset=Party.objects.none(),
         label="طرف حساب",
-        widget=forms.Select(attrs={
+        widget=AutocompleteSelect(reverse_lazy("ajax_party_search"), attrs={
             "class": "select2 field-md",
             "id": "party",
             "required": "required",
@@ -78,7 +106,7 @@ class TransactionForm(forms.Form):
     item = forms.ModelChoiceField(
         queryset=Item.objects.none(),
         label="کالا",
-        widget=forms.Select(attrs={
+        widget=AutocompleteSelect(reverse_lazy("ajax_item_search"), attrs={
             "class": "select2 field-md",
             "id": "item",
             "required": "required",
@@ -172,11 +200,13 @@ class TransactionForm(forms.Form):
         # فیلتر طرف حساب
         if op_type in (OP_SELL, OP_RCV, OP_USE):
             qs_party = qs_party.filter(is_customer=True)
+            self.fields["party"].widget.attrs["data-role"] = "customer"
             self.fields["party"].label = "مشتری:"
             self.fields["total_price"].widget.attrs["readonly"] = True
             self.fields["payment_amount"].label = "دریافت"
         elif op_type in (OP_BUY, OP_PAY):
             qs_party = qs_party.filter(is_supplier=True)
+            self.fields["party"].widget.attrs["data-role"] = "supplier"
             self.fields["party"].label = "فروشنده:"
             self.fields["total_price"].widget.attrs["readonly"] = False
             self.fields["payment_amount"].label = "پرداخت"
@@ -243,8 +273,8 @@ class TransactionFilterForm(forms.Form):
     year_input  = forms.CharField(required=False, widget=forms.TextInput(attrs={'data-maxint': '4', 'inputmode': 'numeric'}))
 
     op_type = forms.ChoiceField(choices=OpType.choices, required=False, widget=forms.Select(attrs={"class": "select"}))
-    item    = forms.ModelChoiceField(queryset=Item.objects.none(), required=False, widget=forms.Select(attrs={"class": "select2"}))
-    party   = forms.ModelChoiceField(queryset=Party.objects.none(), required=False, widget=forms.Select(attrs={"class": "select2"}))
+    item    = forms.ModelChoiceField(queryset=Item.objects.none(), required=False, widget=AutocompleteSelect(reverse_lazy("ajax_item_search"), attrs={"class": "select2"}))
+    party   = forms.ModelChoiceField(queryset=Party.objects.none(), required=False, widget=AutocompleteSelect(reverse_lazy("ajax_party_search"), attrs={"class": "select2"}))
 
     qty          = forms.CharField(required=False, widget=forms.TextInput(attrs={"data-maxint": "3", 'inputmode': 'numeric'}))
     unit_price   = forms.CharField(required=False)
@@ -261,6 +291,37 @@ class TransactionFilterForm(forms.Form):
         self.fields['party'].queryset = Party.objects.all().order_by('name')
         self.fields['party'].empty_label = 'همه'
 
+    def filter_queryset(self, qs):
+        """اعمال فیلترهای فرم (بعد از is_valid) روی qs تراکنش‌ها — مشترک بین لیست و خروجی."""
+        cd = self.cleaned_data
+        op_type     = cd.get('op_type') or ''
+        party       = cd.get('party') or ''
+        item        = cd.get('item') or ''
+        qty         = toEn(cd.get('qty'), True)
+        unit_price  = toEn(cd.get('unit_price'), True)
+        total_price = toEn(cd.get('total_price'), True)
+        cogs        = toEn(cd.get('cogs'), True)
+        description = normalize_search(cd.get('description'))  # ستون search_description
+
+        if op_type:     qs = qs.filter(op_type=op_type)
+        if item:        qs = qs.filter(item=item)
+        if party:       qs = qs.filter(party=party)
+        if qty is not None:         qs = qs.filter(qty=qty)
+        if unit_price is not None:  qs = qs.filter(unit_price=unit_price)
+        if total_price is not None: qs = qs.filter(total_price=total_price)
+        if cogs is not None:        qs = qs.filter(cogs=cogs)
+        if description: qs = qs.filter(search_description__contains=description)
+
+        day   = toEn(cd.get('day_input'), True)
+        month = toEn(cd.get('month_input'), True)
+        year  = toEn(cd.get('year_input'), True)
+
+        # 🧠 فیلتر ترکیبی تاریخ (ستون‌های عددی ایندکس‌دار jy/jm/jd)
+        if year:  qs = qs.filter(jy=year)
+        if month: qs = qs.filter(jm=month)
+        if day:   qs = qs.filter(jd=day)
+        return qs
+
 
 class ItemForm(forms.ModelForm):
     sell_price = forms.CharField(
@@ -0,0 +1,182 @@
+# ledger/instrumentation.py
+"""
+اندازه‌گیری هر درخواست (جایگزین print های ajax_debug_logger).
+
+- تعداد و زمان کل کوئری‌ها (execute_wrapper روی اتصال‌ها)، زمان رندر قالب و زمان کل view
+- کوئری‌های هم‌شکل تکراری (اثر انگشت SQL بدون مقادیر) → هشدار N+1
+- خروجی: هدر Server-Timing (در DevTools مرورگر دیده می‌شود) + یک خط لاگ ledger.requests
+- بدنه‌ی پاسخ دست نمی‌خورد (HTML، JSON و تکه‌های HTML ajax همه یکسان)
+- خاموش (LEDGER_INSTRUMENT=False یا پیش‌فرض DEBUG=False): middleware اصلاً در زنجیره نیست (MiddlewareNotUsed)
+
+پیام‌های اشکال‌زدایی view ها با dlog(request, ...) به لاگ ledger.views می‌روند؛ در DEBUG در هدر
+X-Ledger-Debug هم برمی‌گردند (کنسول مرورگر) بدون باز و بسته کردن JSON پاسخ.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+log = logging.getLogger("ledger.requests")
+view_log = logging.getLogger("ledger.views")
+
+_current = ContextVar("ledger_request_stats", default=None)
+
+# مقادیر ثابت و لیست‌های IN متغیرند؛ شکل کوئری نه
+_FINGERPRINT = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(sql):
+    """شکل نرمال‌شده‌ی SQL: مقادیر → ? و IN (?, ?, ...) → (...)"""
+    for pattern, repl in _FINGERPRINT:
+        sql = pattern.sub(repl, sql)
+    return sql.strip()
+
+
+def current():
+    """آمار درخواست جاری (None اگر ابزار خاموش است یا بیرون از درخواست)."""
+    return _current.get()
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_ms", "fingerprints", "template_ms", "total_ms", "logs", "_in_template")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.fingerprints = Counter()
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.logs = []
+        self._in_template = False
+
+    def execute(self, execute, sql, params, many, context):
+        """execute_wrapper جنگو"""
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - t0) * 1000
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        """[(fingerprint, n)] برای کوئری‌هایی که دست‌کم threshold بار با همان شکل اجرا شده‌اند."""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+
+def dlog(request, *parts):
+    """پیام اشکال‌زدایی view (جایگزین request.dlog)."""
+    stats = _current.get()
+    if stats is None and not view_log.isEnabledFor(logging.DEBUG):
+        return
+    msg = " ".join(str(p) for p in parts)
+    view_log.debug("%s %s", request.path, msg)
+    if stats is not None:
+        stats.logs.append(msg)
+
+
+_template_timer_installed = False
+
+
+def _install_template_timer():
+    """
+    Template.render را یک بار می‌پیچد: فقط بیرونی‌ترین رندر (نه include های داخلش) زمان‌گیری می‌شود.
+    بیرون از درخواست اندازه‌گیری‌شده فقط یک ContextVar.get اضافه دارد.
+    """
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    from django.template.base import Template
+
+    original = Template.render
+
+    @wraps(original)
+    def render(self, context):
+        stats = _current.get()
+        if stats is None or stats._in_template:
+            return original(self, context)
+        stats._in_template = True
+        t0 = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_ms += (time.perf_counter() - t0) * 1000
+            stats._in_template = False
+
+    Template.render = render
+    _template_timer_installed = True
+
+
+def enabled():
+    value = getattr(settings, "LEDGER_INSTRUMENT", None)
+    return settings.DEBUG if value is None else bool(value)
+
+
+class RequestInstrumentationMiddleware:
+    """
+    settings:
+        LEDGER_INSTRUMENT                 None → همان DEBUG
+        LEDGER_INSTRUMENT_DUP_THRESHOLD   تکرار یک شکل کوئری از این تعداد به بالا → هشدار N+1 (پیش‌فرض 3)
+        LEDGER_SLOW_REQUEST_MS            خط لاگ درخواست‌های کندتر با سطح WARNING (پیش‌فرض 500)
+    """
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.dup_threshold = getattr(settings, "LEDGER_INSTRUMENT_DUP_THRESHOLD", 3)
+        self.slow_ms = getattr(settings, "LEDGER_SLOW_REQUEST_MS", 500)
+        _install_template_timer()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        t0 = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(stats.execute))
+                response = self.get_response(request)
+        finally:
+            stats.total_ms = (time.perf_counter() - t0) * 1000
+            _current.reset(token)
+
+        dups = stats.duplicates(self.dup_threshold)
+        # پاسخ stream: زمان تا برگشتن view (نه تا پایان ارسال بدنه)
+        timing = [
+            f'sql;dur={stats.sql_ms:.1f};desc="{stats.queries} queries"',
+            f"tpl;dur={stats.template_ms:.1f}",
+            f"total;dur={stats.total_ms:.1f}",
+        ]
+        if dups:
+            timing.append(f'dup;desc="{len(dups)} repeated"')
+        response["Server-Timing"] = ", ".join(timing)
+        if settings.DEBUG and stats.logs:
+            response["X-Ledger-Debug"] = json.dumps(stats.logs)  # ASCII (\u....) → مجاز در هدر
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "-"
+        record = {
+            "method": request.method, "path": request.path, "status": response.status_code, "view": view,
+            "ms": round(stats.total_ms, 1), "sql_ms": round(stats.sql_ms, 1), "queries": stats.queries,
+            "dup": len(dups), "tpl_ms": round(stats.template_ms, 1),
+        }
+        level = logging.WARNING if stats.total_ms >= self.slow_ms else logging.INFO
+        log.log(level, " ".join(f"{k}={v}" for k, v in record.items()), extra={"request_stats": record})
+        for fp, n in dups:
+            log.warning("N+1? %dx in %s: %s", n, view, fp[:300])
+        return response
@@ -0,0 +1,71 @@
+"""
+پشتیبان‌گیری آنلاین از دیتابیس (بدون توقف برنامه) + چرخش پشتیبان‌های قدیمی.
+
+python manage.py backup                          # snapshot فشرده‌ی gzip در backups/ ، ۷ تای آخر نگه داشته می‌شود
+python manage.py backup --format jsonl           # خروجی JSONL قابل انتقال (loaddata)
+python manage.py backup --format both --compress zstd --keep 14 --keep-days 30
+python manage.py backup --verify                 # بررسی checksum همه‌ی پشتیبان‌های موجود
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.services import backup
+
+
+class Command(BaseCommand):
+    help = "Consistent online database backup (SQLite backup API and/or JSONL dump) with compression, checksums and rotation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["sqlite", "jsonl", "both"], default="sqlite")
+        parser.add_argument("--compress", choices=backup.COMPRESSIONS, default="gzip")
+        parser.add_argument("--dir", default=os.path.join(settings.BASE_DIR, "backups"), help="Backup directory")
+        parser.add_argument("--database", default="default", help="Database alias")
+        parser.add_argument("--apps", nargs="+", help="JSONL: only these app labels (default: all)")
+        parser.add_argument("--pages", type=int, default=256, help="SQLite pages copied per step (-1 = all at once)")
+        parser.add_argument("--sleep", type=float, default=0.005, help="Pause between steps so writers can proceed (s)")
+        parser.add_argument("--keep", type=int, default=7, help="Newest backups kept per format")
+        parser.add_argument("--keep-days", type=int, help="Also keep anything newer than this many days")
+        parser.add_argument("--verify", action="store_true", help="Only verify checksums of existing backups")
+
+    def handle(self, *args, **opts):
+        directory = opts["dir"]
+        if opts["verify"]:
+            return self._verify(directory)
+
+        try:
+            if opts["format"] in ("sqlite", "both"):
+                result = backup.snapshot(directory, using=opts["database"], compression=opts["compress"],
+                                         pages=opts["pages"], sleep=opts["sleep"])
+                self._report("🗄 SQLite snapshot", result)
+            if opts["format"] in ("jsonl", "both"):
+                result = backup.dump_jsonl(directory, using=opts["database"], compression=opts["compress"],
+                                           app_labels=opts["apps"])
+                self._report(f"🧾 JSONL dump ({sum(result['rows'].values()):,} rows)", result)
+        except backup.BackupError as e:
+            raise CommandError(str(e))
+
+        for prefix in ("db-", "dump-"):
+            removed = backup.rotate(directory, prefix, opts["keep"], opts["keep_days"])
+            if removed:
+                self.stdout.write(f"🧹 Rotated {len(removed)} old {prefix[:-1]} backup(s)")
+        self.stdout.write(self.style.SUCCESS("✅ Done"))
+
+    def _report(self, label, result):
+        self.stdout.write(f"{label}: {result['path']} | {result['bytes'] / 1e6:.1f} MB | "
+                          f"sha256 {result['checksum'][:12]}… | {result['seconds']:.1f}s")
+
+    def _verify(self, directory):
+        failed = 0
+        paths = backup.backups(directory, "db-") + backup.backups(directory, "dump-")
+        for path in paths:
+            try:
+                backup.verify(path)
+                self.stdout.write(f"✔ {os.path.basename(path)}")
+            except backup.BackupError as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"✘ {e}"))
+        if failed:
+            raise CommandError(f"{failed} of {len(paths)} backups failed verification")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(paths)} backups verified"))
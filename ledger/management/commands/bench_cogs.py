@@ -0,0 +1,169 @@
+"""
+بنچمارک هسته‌ی بازپخش COGS (ledger/services/cogs.py) در برابر پیاده‌سازی قبلی
+(حلقه‌ی روی آبجکت‌های Transaction در post_stock_tx و recalc.py) روی تاریخچه‌های مصنوعی.
+
+python manage.py bench_cogs                              # 10k / 100k / 1M ردیف، هر سه سیاست
+python manage.py bench_cogs --sizes 50000 --policy FIFO
+python manage.py bench_cogs --legacy-max 1000000         # پیاده‌سازی قبلی تا 1M هم اجرا شود (کند)
+
+به دیتابیس دست نمی‌زند: ردیف‌ها در حافظه ساخته می‌شوند و خروجی دو پیاده‌سازی مقایسه می‌شود.
+"""
+import random
+import time
+from collections import deque
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.models import Transaction, OP_BUY, OP_SELL, OP_USE
+from ledger.services.cogs import FIFO, LPP, AVG, POLICIES, CostParams, ReplayState, replay
+
+
+def _history(n, seed):
+    """تاریخچه‌ی مصنوعی یک کالا به‌صورت تاپل‌های ROW_FIELDS (با فروش قبل از خرید و موجودی منفی)."""
+    rnd = random.Random(seed)
+    day = date(2020, 1, 1)
+    price = 1000
+    rows = []
+    for tx_id in range(1, n + 1):
+        if rnd.random() < 0.05:
+            day += timedelta(days=1)
+        # خرید کمی بیشتر از خروجی است؛ موجودی گاهی منفی می‌شود و دوباره پوشش داده می‌شود
+        r = rnd.random()
+        if r < 0.4:
+            price = max(1, price + rnd.randint(-50, 60))
+            op, up, q = OP_BUY, price, rnd.randint(1, 12)
+        elif r < 0.9:
+            op, up, q = OP_SELL, price * 13 // 10, rnd.randint(1, 8)
+        else:
+            op, up, q = OP_USE, 0, rnd.randint(1, 8)
+        rows.append((tx_id, op, q, up, day, None, False))
+    return rows
+
+
+def _legacy_fifo(txs):
+    """حلقه‌ی FIFO قبلی post_stock_tx (بدون کوئری) روی آبجکت‌های Transaction."""
+    layers = deque()
+    changed = []
+    last_buy_price = None
+    for tx in txs:
+        op = tx.op_type
+        q = int(tx.qty or 0)
+        up = int(tx.unit_price or 0)
+        if op == OP_BUY:
+            buy_qty = q
+            while buy_qty > 0 and layers and layers[0][0] < 0:
+                neg_qty, neg_price, neg_tx = layers[0]
+                cover = min(buy_qty, -neg_qty)
+                neg_tx.cogs = int(neg_tx.cogs or 0) - cover * int(neg_price) + cover * up
+                if neg_qty + cover == 0:
+                    neg_tx.is_cogs_temp = False
+                    layers.popleft()
+                else:
+                    layers[0][0] = neg_qty + cover
+                changed.append(neg_tx)
+                buy_qty -= cover
+            if buy_qty > 0:
+                layers.append([buy_qty, up, None])
+            last_buy_price = up
+        elif op in (OP_SELL, OP_USE):
+            sell_qty = q
+            cogs_val = 0
+            while sell_qty > 0 and layers and layers[0][0] > 0:
+                layer_qty, layer_price, _ = layers[0]
+                use = min(sell_qty, layer_qty)
+                cogs_val += use * int(layer_price)
+                sell_qty -= use
+                layer_qty -= use
+                if layer_qty == 0:
+                    layers.popleft()
+                else:
+                    layers[0][0] = layer_qty
+            if sell_qty > 0:
+                last_pos_price = None
+                for lqty, lprice, _ in reversed(layers):
+                    if lqty > 0:
+                        last_pos_price = lprice
+                        break
+                if last_pos_price is not None:
+                    base_price = int(last_pos_price)
+                elif last_buy_price is not None:
+                    base_price = int(last_buy_price)
+                else:
+                    base_price = up
+                cogs_val += sell_qty * base_price
+                layers.append([-sell_qty, base_price, tx])
+                tx.is_cogs_temp = True
+            else:
+                tx.is_cogs_temp = False
+            tx.cogs = cogs_val
+            changed.append(tx)
+    return changed
+
+
+def _legacy_moving(txs, policy):
+    """حلقه‌ی LPP/AVG قبلی recalc.py روی آبجکت‌های Transaction."""
+    qty = avg_cost = last_buy_cost = 0
+    changed = []
+    for tx in txs:
+        op = tx.op_type
+        q = int(tx.qty or 0)
+        up = int(tx.unit_price or 0)
+        if op == OP_BUY:
+            new_qty = qty + q
+            if new_qty > 0:
+                avg_cost = int((qty * avg_cost + q * up) / new_qty)
+            qty = new_qty
+            last_buy_cost = up
+        elif op in (OP_SELL, OP_USE):
+            base_cost = last_buy_cost if policy == LPP else avg_cost
+            tx.cogs = base_cost * q
+            qty -= q
+            changed.append(tx)
+    return changed
+
+
+def _as_objects(rows):
+    # هزینه‌ی ساخت آبجکت ORM بخشی از پیاده‌سازی قبلی بود (qs.iterator())، پس در زمان آن حساب می‌شود
+    for tx_id, op, q, up, d, cogs, is_temp in rows:
+        yield Transaction(id=tx_id, op_type=op, qty=q, unit_price=up, date_miladi=d,
+                          cogs=cogs, is_cogs_temp=is_temp)
+
+
+class Command(BaseCommand):
+    help = "Benchmark the shared COGS replay kernel against the previous per-object replay."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                            help="Rows per item (default: 10k 100k 1M)")
+        parser.add_argument("--policy", nargs="+", choices=sorted(POLICIES), default=[FIFO, LPP, AVG])
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--legacy-max", type=int, default=200_000,
+                            help="Skip the previous implementation above this many rows (default 200k; "
+                                 "its negative-stock scan is quadratic)")
+
+    def handle(self, *args, **opts):
+        params = CostParams(False, None, None)
+        for n in opts["sizes"]:
+            rows = _history(n, opts["seed"])
+            for policy in opts["policy"]:
+                t0 = time.perf_counter()
+                changes, _ = replay(rows, ReplayState(), params, policy=policy)
+                kernel = time.perf_counter() - t0
+                line = f"{policy:<4} rows={n:>9,}  kernel={kernel:7.3f}s ({n / kernel:>10,.0f} rows/s)"
+
+                if n <= opts["legacy_max"]:
+                    t0 = time.perf_counter()
+                    if policy == FIFO:
+                        changed = _legacy_fifo(_as_objects(rows))
+                    else:
+                        changed = _legacy_moving(_as_objects(rows), policy)
+                    legacy = time.perf_counter() - t0
+
+                    expected = {tx.id: (tx.cogs, tx.is_cogs_temp) for tx in changed}
+                    if expected != changes:
+                        raise CommandError(f"{policy} n={n}: kernel output differs from the previous implementation")
+                    line += f"  previous={legacy:7.3f}s  ×{legacy / kernel:.1f}  (same output)"
+
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
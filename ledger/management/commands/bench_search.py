@@ -0,0 +1,71 @@
+"""
+بنچمارک جستجوی نام کالا: name__icontains قبلی در برابر ستون نرمال‌شده‌ی search_name.
+
+python manage.py bench_search                 # 100k نام مصنوعی
+python manage.py bench_search --rows 500000 --repeat 50
+
+نام‌ها داخل یک تراکنش ساخته و در پایان rollback می‌شوند (داده‌ی واقعی دست نمی‌خورد).
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as dbtx
+
+from ledger.models import Item
+from ledger.utils import normalize_search, search_prefix
+
+WORDS = ["مانتو", "پیراهن", "شلوار", "کیف", "کفش", "روسری", "شال", "کت", "دامن", "تونیک", "کاپشن", "جوراب"]
+ADJ = ["مشکی", "سفید", "آبی", "کرم", "یاسی", "طوسی", "زرشکی", "سبز", "نخی", "کتان", "مجلسی", "اسپرت"]
+# شکل‌های دیگر همان حروف/رقم‌ها (صفحه‌کلید عربی، نیم‌فاصله، رقم فارسی/عربی)
+VARIANTS = [("ی", "ي"), ("ک", "ك"), (" ", "‌"), ("1", "۱"), ("2", "٢")]
+
+
+def _name(rnd):
+    name = f"{rnd.choice(WORDS)} {rnd.choice(ADJ)} {rnd.randint(1, 999)}"
+    for a, b in VARIANTS:
+        if a in name and rnd.random() < 0.3:
+            name = name.replace(a, b)
+    return name
+
+
+class Command(BaseCommand):
+    help = "Benchmark item-name search: name__icontains vs the normalized, indexed search_name column."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20, help="Queries per search term")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+        terms = ["مانتو", "كيف", "پیراهن یاسی", "کفش مشکی 12", "روسری"]
+
+        with dbtx.atomic():
+            t0 = time.perf_counter()
+            Item.objects.bulk_create(
+                [Item(name=n, search_name=normalize_search(n)) for n in (_name(rnd) for _ in range(opts["rows"]))],
+                batch_size=2000,
+            )
+            self.stdout.write(f"📦 {opts['rows']:,} names inserted in {time.perf_counter() - t0:.1f}s")
+
+            for term in terms:
+                norm = normalize_search(term)
+                # (برچسب، فیلتر، ترتیب) — همان کوئری‌های items_list و جستجوی ajax
+                cases = [
+                    ("icontains", Item.objects.filter(name__icontains=term), "name"),
+                    ("prefix", Item.objects.filter(search_prefix("search_name", norm)), "search_name"),
+                    ("contains", Item.objects.filter(search_name__contains=norm), "name"),
+                ]
+                line = f"{term!s:<14}"
+                for label, qs, order in cases:
+                    hits = qs.count()
+                    t0 = time.perf_counter()
+                    for _ in range(opts["repeat"]):
+                        list(qs.order_by(order).values_list("id", "name")[:20])
+                    ms = (time.perf_counter() - t0) / opts["repeat"] * 1000
+                    line += f"  {label}={ms:6.2f}ms ({hits:>6,} hits)"
+                self.stdout.write(line)
+
+            dbtx.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("✅ Done (rolled back)."))
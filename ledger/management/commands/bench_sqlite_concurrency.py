@@ -0,0 +1,169 @@
+"""
+بنچمارک هم‌زمانی SQLite: تأخیر خواننده‌های گزارش در حین رگبار ثبت تراکنش، با تنظیمات پیش‌فرض SQLite
+در برابر پروفایل production در ledger/sqlite.py (WAL ، synchronous=NORMAL ، BEGIN IMMEDIATE و ...).
+
+python manage.py bench_sqlite_concurrency                        # هر دو پروفایل، ۱۰ ثانیه
+python manage.py bench_sqlite_concurrency --rows 500000 --writers 4 --readers 8 --seconds 20
+
+روی یک فایل موقت با جدول‌هایی به شکل ledger_transaction / ledger_inventory کار می‌کند (دیتابیس اصلی دست نمی‌خورد).
+هر «ثبت» همان الگوی post_stock_tx است: خواندن ردیف Inventory ، درج تراکنش، به‌روزرسانی گروهی cogs
+ردیف‌های بعدی همان کالا و به‌روزرسانی Inventory در یک تراکنش. هر «خواندن» جمع فروش ماهانه است.
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from ledger.models import OP_BUY, OP_SELL
+from ledger.sqlite import PROFILES, apply_pragmas
+
+SCHEMA = """
+CREATE TABLE tx (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, op_type TEXT NOT NULL, date_miladi TEXT NOT NULL,
+                 qty INTEGER NOT NULL, unit_price INTEGER NOT NULL, total_price INTEGER NOT NULL, cogs INTEGER);
+CREATE INDEX tx_item_date ON tx (item_id, date_miladi, id);
+CREATE INDEX tx_date ON tx (date_miladi, id);
+CREATE TABLE inventory (item_id INTEGER PRIMARY KEY, qty INTEGER NOT NULL, last_tx_id INTEGER);
+"""
+
+READ_SQL = """
+SELECT substr(date_miladi, 1, 7) AS ym, SUM(total_price), SUM(cogs), COUNT(*)
+FROM tx WHERE op_type = ? AND date_miladi >= ? GROUP BY ym
+"""
+
+# Django پیش‌فرض timeout=5 ثانیه به sqlite3.connect می‌دهد
+DEFAULT_TIMEOUT = 5
+
+
+def _populate(path, rows, items, seed):
+    rnd = random.Random(seed)
+    start = date(2020, 1, 1)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    batch = []
+    for tx_id in range(1, rows + 1):
+        item = rnd.randint(1, items)
+        op = OP_BUY if rnd.random() < 0.4 else OP_SELL
+        q, up = rnd.randint(1, 10), rnd.randint(100, 5000)
+        day = start + timedelta(days=tx_id * 1500 // rows)
+        batch.append((tx_id, item, op, day.isoformat(), q, up, q * up, q * up * 8 // 10 if op == OP_SELL else None))
+    db.executemany("INSERT INTO tx VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    db.executemany("INSERT INTO inventory VALUES (?, 0, NULL)", [(i,) for i in range(1, items + 1)])
+    db.commit()
+    db.close()
+
+
+def _connect(path, profile):
+    # isolation_level=None: BEGIN را خودمان می‌نویسیم (مثل transaction_mode جنگو)
+    conn = sqlite3.connect(path, timeout=DEFAULT_TIMEOUT, isolation_level=None, check_same_thread=False)
+    apply_pragmas(conn, profile)
+    return conn
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Command(BaseCommand):
+    help = "Measure report-reader latency during a burst of stock postings: default SQLite vs the production profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--items", type=int, default=500)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+        parser.add_argument("--profile", nargs="+", choices=sorted(PROFILES), default=["default", "production"])
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        for profile in opts["profile"]:
+            with tempfile.TemporaryDirectory() as d:
+                path = os.path.join(d, "bench.sqlite3")
+                t0 = time.perf_counter()
+                _populate(path, opts["rows"], opts["items"], opts["seed"])
+                self.stdout.write(f"📦 [{profile}] {opts['rows']:,} rows in {time.perf_counter() - t0:.1f}s")
+                self._run(path, profile, opts)
+
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
+
+    def _run(self, path, profile, opts):
+        # پروفایل production همان transaction_mode=IMMEDIATE تنظیمات را دارد؛ پیش‌فرض جنگو DEFERRED است
+        begin = "BEGIN IMMEDIATE" if profile == "production" else "BEGIN"
+        stop = threading.Event()
+        lock = threading.Lock()
+        read_ms, write_ms = [], []
+        errors = {"read": 0, "write": 0}
+
+        def writer(n):
+            rnd = random.Random(opts["seed"] * 1000 + n)
+            conn = _connect(path, profile)
+            next_day = date(2024, 2, 10)
+            while not stop.is_set():
+                item = rnd.randint(1, opts["items"])
+                # پس‌تاریخ: cogs ردیف‌های بعدی کالا باید دوباره نوشته شود
+                day = (next_day - timedelta(days=rnd.randint(0, 400))).isoformat()
+                t0 = time.perf_counter()
+                try:
+                    conn.execute(begin)
+                    conn.execute("SELECT qty FROM inventory WHERE item_id = ?", (item,)).fetchone()
+                    conn.execute("INSERT INTO tx (item_id, op_type, date_miladi, qty, unit_price, total_price, cogs) "
+                                 "VALUES (?, ?, ?, 1, 1000, 1000, 800)", (item, OP_SELL, day))
+                    conn.execute("UPDATE tx SET cogs = coalesce(cogs, 0) + 1 WHERE item_id = ? AND date_miladi >= ? "
+                                 "AND op_type = ?", (item, day, OP_SELL))
+                    conn.execute("UPDATE inventory SET qty = qty - 1, last_tx_id = last_insert_rowid() WHERE item_id = ?",
+                                 (item,))
+                    conn.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    # "database is locked": در حالت DEFERRED بن‌بست ارتقای قفل بدون صبر همین خطا را می‌دهد
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    with lock:
+                        errors["write"] += 1
+                    continue
+                with lock:
+                    write_ms.append((time.perf_counter() - t0) * 1000)
+            conn.close()
+
+        def reader(n):
+            conn = _connect(path, profile)
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                try:
+                    conn.execute(READ_SQL, (OP_SELL, "2023-01-01")).fetchall()
+                except sqlite3.OperationalError:
+                    with lock:
+                        errors["read"] += 1
+                    continue
+                with lock:
+                    read_ms.append((time.perf_counter() - t0) * 1000)
+            conn.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(opts["writers"])]
+        threads += [threading.Thread(target=reader, args=(n,)) for n in range(opts["readers"])]
+        for t in threads:
+            t.start()
+        time.sleep(opts["seconds"])
+        stop.set()
+        for t in threads:
+            t.join()
+
+        secs = opts["seconds"]
+        self.stdout.write(
+            f"   reads : {len(read_ms):>7,} ({len(read_ms) / secs:>7,.0f}/s)  "
+            f"p50={_pct(read_ms, .5):7.1f}ms  p95={_pct(read_ms, .95):7.1f}ms  max={max(read_ms, default=0):7.1f}ms  "
+            f"errors={errors['read']}"
+        )
+        self.stdout.write(
+            f"   writes: {len(write_ms):>7,} ({len(write_ms) / secs:>7,.0f}/s)  "
+            f"p50={_pct(write_ms, .5):7.1f}ms  p95={_pct(write_ms, .95):7.1f}ms  "
+            f"mean={statistics.fmean(write_ms) if write_ms else 0:7.1f}ms  errors={errors['write']}"
+        )
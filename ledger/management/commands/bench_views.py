@@ -0,0 +1,285 @@
+"""
+بنچمارک همه‌ی صفحه‌ها/ajax ها و مسیر ثبت موجودی روی داده‌ی مصنوعی (generate_ledger) در چند اندازه.
+
+python manage.py bench_views                                   # 10k و 100k تراکنش، گزارش در bench_report.json
+python manage.py bench_views --sizes 20000 --repeat 10 --output /tmp/new.json --compare /tmp/old.json
+python manage.py bench_views --max-queries 4 --max-ms 200      # بودجه‌ی سراسری؛ در صورت تخطی خطا (exit 1)
+python manage.py bench_views --only items_list parties_list
+
+- بودجه‌ی هر endpoint (تعداد کوئری/زمان/حافظه) از bench_budget.json ریشه‌ی پروژه خوانده می‌شود (--budget برای فایل دیگر)
+- روی دیتابیس تست جداگانه اجرا می‌شود (مثل manage.py test)؛ دیتابیس اصلی دست نمی‌خورد
+  (--in-place: روی همین دیتابیس؛ داده‌ی دفتر پاک می‌شود — برای تست‌ها)
+- هر endpoint: میانه‌ی زمان کل، تعداد کوئری، زمان SQL و اوج حافظه‌ی پایتون (tracemalloc، در یک اجرای جدا)
+- کش گزارش‌ها خاموش است تا خود view اندازه گرفته شود (--with-cache برای اندازه‌گیری با کش)
+- گزارش JSON با کلیدهای مرتب تا بین دو commit قابل diff باشد
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import django
+import jdatetime
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+
+from ledger.models import CHRONO_DESC, Item, Party, Transaction, OP_SELL
+from ledger.services import stock
+
+BENCH_SETTINGS = dict(
+    DEBUG=False,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    # صفحه‌های کامل بدون collectstatic
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+
+DEFAULT_BUDGET = "bench_budget.json"
+
+
+def _fixtures():
+    """پرکارترین کالا/مشتری/فروشنده و آخرین ماه شمسی داده‌ی ساخته‌شده (ورودی endpoint ها)."""
+    top = lambda qs, field: qs.values(field).annotate(n=Count("id")).order_by("-n").values_list(field, flat=True)[0]
+    item = Item.objects.get(pk=top(Transaction.objects.filter(item__isnull=False), "item"))
+    customer = Party.objects.get(pk=top(Transaction.objects.filter(op_type=OP_SELL), "party"))
+    supplier = Party.objects.filter(is_supplier=True).order_by("id").first()
+    last = Transaction.objects.order_by(*CHRONO_DESC).values_list("jy", "jm", "date_miladi").first()
+    return {"item": item, "customer": customer, "supplier": supplier, "jy": last[0], "jm": last[1], "last": last[2]}
+
+
+def _endpoints(client, fx):
+    """(نام، تابع) — تابع یک پاسخ برمی‌گرداند (یا None برای مسیرهای بدون HTTP)."""
+    item, customer = fx["item"], fx["customer"]
+    xhr = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+    j = jdatetime.date.fromgregorian(date=fx["last"])
+    today = f"{j.year:04d}/{j.month:02d}/{j.day:02d}"
+    counter = iter(range(10 ** 9))
+
+    def post_sell():
+        return client.post("/sell/", {
+            "date_shamsi": today, "date_shamsi_display": today, "party": customer.pk, "item": item.pk,
+            "qty": "1", "unit_price": "1000", "total_price": "1000", "payment_amount": "1000",
+            "payment_method": "CASH", "description": f"bench {next(counter)}",
+        })
+
+    def posting(days_back):
+        def run():
+            stock.post_stock_tx(
+                date_shamsi=today, date_miladi=fx["last"] - timedelta(days=days_back), op_type=OP_SELL,
+                item=item, party=customer, qty=1, unit_price=1000, total_price=1000,
+            )
+        return run
+
+    get = client.get
+    return [
+        ("register_sell", lambda: get("/sell/")),
+        ("register_purchase", lambda: get("/purchase/")),
+        ("register_payment", lambda: get("/payment/")),
+        ("register_receipt", lambda: get("/receipt/")),
+        ("register_transaction_post", post_sell),
+        ("post_stock_tx_append", posting(0)),
+        ("post_stock_tx_backdated_90d", posting(90)),
+        ("transaction_list", lambda: get("/transactions/")),
+        ("transaction_list_xhr_filtered", lambda: get("/transactions/", {"op_type": OP_SELL, "year_input": j.year}, **xhr)),
+        ("transaction_export_csv", lambda: get("/transactions/export/", {"format": "csv", "item": item.pk})),
+        ("items_list", lambda: get("/items/")),
+        ("parties_list", lambda: get("/parties/")),
+        ("customer_balance_report", lambda: get("/reports/customer-balance/")),
+        ("monthly_sales", lambda: get("/monthly_sales/")),
+        ("daily_sales", lambda: get(f"/{fx['jy']}/{fx['jm']}/")),
+        ("ajax_party_txs", lambda: get("/ajax/party-txs/", {"party_id": customer.pk, "source": "sell"})),
+        ("ajax_item_txs", lambda: get("/ajax/item-txs/", {"item_id": item.pk, "source": "sell"})),
+        ("get_party_transactions", lambda: get("/ajax/get-party-transactions/", {"party": customer.pk})),
+        ("get_item_transactions", lambda: get("/ajax/get-item-transactions/", {"item": item.pk})),
+        ("get_recent_transactions", lambda: get("/ajax/get-recent-transactions/", {"op_type": OP_SELL})),
+        ("get_sell_price", lambda: get("/ajax/get-sell-price/", {"item_id": item.pk})),
+        ("ajax_item_search", lambda: get("/ajax/items/search/", {"q": item.name[:3]})),
+        ("ajax_party_search", lambda: get("/ajax/parties/search/", {"q": customer.name[:3]})),
+    ]
+
+
+def _consume(response):
+    if response is None:
+        return 200
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+def measure(fn, repeat):
+    """یک اجرای گرم‌کردن، repeat اجرای اندازه‌گیری و یک اجرای جدا زیر tracemalloc."""
+    _consume(fn())
+    walls, sqls, queries, status = [], [], 0, 200
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            status = max(status, _consume(fn()))
+            walls.append((time.perf_counter() - t0) * 1000)
+        queries = len(ctx.captured_queries)
+        sqls.append(sum(float(q["time"]) for q in ctx.captured_queries) * 1000)
+
+    tracemalloc.start()
+    try:
+        _consume(fn())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ms": round(statistics.median(walls), 2),
+        "ms_min": round(min(walls), 2),
+        "sql_ms": round(statistics.median(sqls), 2),
+        "queries": queries,
+        "peak_kb": round(peak / 1024),
+        "status": status,
+    }
+
+
+def check_budget(report, budget):
+    """
+    budget: {"default": {"queries": n, "ms": x}, "endpoints": {name: {...}}, "known_errors": [name, ...]}
+    (مقدار هر endpoint روی default غالب است؛ "sizes": {"100000": {name: {...}}} برای یک اندازه‌ی خاص)
+    خروجی: لیست پیام‌های تخطی
+    """
+    errors = []
+    known = set(budget.get("known_errors", []))
+    for size, results in report["sizes"].items():
+        for name, r in results.items():
+            limits = {**budget.get("default", {}), **budget.get("endpoints", {}).get(name, {}),
+                      **budget.get("sizes", {}).get(size, {}).get(name, {})}
+            if r["status"] >= 400 and name not in known:
+                errors.append(f"[{size}] {name}: HTTP {r['status']}")
+            for key in ("queries", "ms", "sql_ms", "peak_kb"):
+                if key in limits and r[key] > limits[key]:
+                    errors.append(f"[{size}] {name}: {key}={r[key]} > budget {limits[key]}")
+    return errors
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark every view, the ajax endpoints and stock posting on generated data; write a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000], help="Item transactions per dataset")
+        parser.add_argument("--repeat", type=int, default=5, help="Measured requests per endpoint")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--only", nargs="+", help="Only these endpoints")
+        parser.add_argument("--output", default=os.path.join(settings.BASE_DIR, "bench_report.json"))
+        parser.add_argument("--compare", help="Previous report to print differences against")
+        parser.add_argument("--budget", help=f"Budget JSON (default: {DEFAULT_BUDGET} in BASE_DIR if present)")
+        parser.add_argument("--max-queries", type=int, help="Budget for every endpoint (overrides the file default)")
+        parser.add_argument("--max-ms", type=float, help="Budget for every endpoint (overrides the file default)")
+        parser.add_argument("--with-cache", action="store_true", help="Keep the configured report cache")
+        parser.add_argument("--in-place", action="store_true",
+                            help="Use the configured database instead of a throwaway test database (ledger data is replaced)")
+
+    def handle(self, *args, **opts):
+        overrides = dict(BENCH_SETTINGS)
+        if opts["with_cache"]:
+            overrides.pop("CACHES")
+
+        old_name = None
+        if not opts["in_place"]:
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(**overrides):
+                report = self._run(opts)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        with open(opts["output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        self.stdout.write(f"📝 Report: {opts['output']}")
+
+        if opts["compare"]:
+            self._compare(opts["compare"], report)
+
+        budget = {}
+        path = opts["budget"] or os.path.join(settings.BASE_DIR, DEFAULT_BUDGET)
+        if not opts["budget"] and not os.path.exists(path):
+            path = None
+        if path:
+            with open(path, encoding="utf-8") as f:
+                budget = json.load(f)
+        default = budget.setdefault("default", {})
+        if opts["max_queries"] is not None:
+            default["queries"] = opts["max_queries"]
+        if opts["max_ms"] is not None:
+            default["ms"] = opts["max_ms"]
+        errors = check_budget(report, budget)
+        if errors:
+            for e in errors:
+                self.stdout.write(self.style.ERROR(f"✘ {e}"))
+            raise CommandError(f"{len(errors)} budget violation(s)")
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
+
+    def _run(self, opts):
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(username="bench", defaults={"is_staff": True})
+        report = {
+            "meta": {
+                "commit": _git_commit(), "date": date.today().isoformat(), "python": platform.python_version(),
+                "django": django.get_version(), "database": connection.vendor, "seed": opts["seed"],
+                "repeat": opts["repeat"], "cache": opts["with_cache"],
+            },
+            "sizes": {},
+        }
+        for size in opts["sizes"]:
+            t0 = time.perf_counter()
+            call_command("generate_ledger", "--flush", "--transactions", str(size), "--seed", str(opts["seed"]),
+                         "--items", str(max(50, size // 100)), "--parties", str(max(40, size // 250)),
+                         "--workers", "1", stdout=open(os.devnull, "w"))
+            rows = Transaction.objects.count()
+            self.stdout.write(f"📦 size={size:,}: {rows:,} transactions generated in {time.perf_counter() - t0:.1f}s")
+
+            # خطای یک view بنچمارک را متوقف نمی‌کند؛ وضعیت 500 در گزارش می‌ماند و بودجه آن را می‌گیرد
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            results = {}
+            for name, fn in _endpoints(client, _fixtures()):
+                if opts["only"] and name not in opts["only"]:
+                    continue
+                r = results[name] = measure(fn, opts["repeat"])
+                self.stdout.write(f"   {name:<30} {r['ms']:>9.1f}ms  q={r['queries']:<4} sql={r['sql_ms']:>8.1f}ms  "
+                                  f"peak={r['peak_kb']:>7,}KB  [{r['status']}]")
+            report["sizes"][str(size)] = results
+        return report
+
+    def _compare(self, path, report):
+        with open(path, encoding="utf-8") as f:
+            old = json.load(f)
+        self.stdout.write(f"🔍 Compared with {path} (commit {old.get('meta', {}).get('commit')})")
+        for size, results in report["sizes"].items():
+            for name, r in results.items():
+                before = old.get("sizes", {}).get(size, {}).get(name)
+                if not before:
+                    continue
+                ratio = r["ms"] / before["ms"] if before["ms"] else float("inf")
+                line = (f"   [{size}] {name:<30} {before['ms']:>9.1f} → {r['ms']:>9.1f}ms (×{ratio:.2f})  "
+                        f"q {before['queries']} → {r['queries']}")
+                style = self.style.ERROR if ratio > 1.2 or r["queries"] > before["queries"] else (lambda s: s)
+                self.stdout.write(style(line))
@@ -0,0 +1,59 @@
+"""
+خروجی CSV/XLSX تراکنش‌ها با حافظه‌ی ثابت (همان فیلترهای لیست تراکنش‌ها).
+
+python manage.py export_transactions -o tx.csv
+python manage.py export_transactions -o tx.xlsx --year 1403 --month 5
+python manage.py export_transactions -o sells.csv --op-type SELL --party 12 --item 7
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger.forms import TransactionFilterForm
+from ledger.models import OP_CHOICES, Transaction
+from ledger.services.export import CHUNK_SIZE, export_rows, iter_csv, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Export transactions to CSV or XLSX in constant memory, using the transaction list filters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", required=True, help="Output file (.csv or .xlsx)")
+        parser.add_argument("--format", choices=["csv", "xlsx"], help="Default: from the output extension")
+        parser.add_argument("--op-type", choices=[op for op, _ in OP_CHOICES])
+        parser.add_argument("--party", type=int, help="Party id")
+        parser.add_argument("--item", type=int, help="Item id")
+        parser.add_argument("--year", type=int, help="Jalali year")
+        parser.add_argument("--month", type=int, help="Jalali month")
+        parser.add_argument("--day", type=int, help="Jalali day")
+        parser.add_argument("--description", help="Description contains")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **opts):
+        output = opts["output"]
+        fmt = opts["format"] or ("xlsx" if output.lower().endswith(".xlsx") else "csv")
+
+        data = {
+            "op_type": opts["op_type"], "party": opts["party"], "item": opts["item"],
+            "year_input": opts["year"], "month_input": opts["month"], "day_input": opts["day"],
+            "description": opts["description"],
+        }
+        form = TransactionFilterForm({k: v for k, v in data.items() if v is not None})
+        if not form.is_valid():
+            raise CommandError(f"Invalid filters: {form.errors.as_text()}")
+        rows = export_rows(form.filter_queryset(Transaction.objects.all()), chunk_size=opts["chunk_size"])
+
+        started = time.perf_counter()
+        stats = {}
+        if fmt == "csv":
+            with open(output, "w", encoding="utf-8", newline="") as f:
+                for line in iter_csv(rows, stats):
+                    f.write(line)
+        else:
+            with open(output, "wb") as f:
+                write_xlsx(rows, f, stats)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['rows']:,} rows → {output} in {elapsed:.1f}s ({stats['rows'] / elapsed:,.0f} rows/s)"
+        ))
@@ -0,0 +1,211 @@
+"""
+ساخت داده‌ی مصنوعی (قابل تکرار با seed) برای تست بار و بنچمارک.
+
+python manage.py generate_ledger --flush                                  # ۲۰۰ هزار تراکنش در ۳ سال
+python manage.py generate_ledger --flush --transactions 1000000 --years 5 --items 5000 --parties 2000
+python manage.py generate_ledger --flush --seed 7 --backdated 0.05 --negative 0.2
+
+- طرف حساب‌ها (مشتری/فروشنده/هر دو) و کالاها (شامل امانی با کمیسیون ثابت و درصدی) با محبوبیت نامتوازن (Zipf)
+- خرید/فروش/مصرف روزانه با فصل‌بندی (جمعه کم، اسفند پرفروش) و تورم قیمت خرید؛ دریافت/پرداخت کنار بخشی از فروش/خریدها
+- بخشی از ردیف‌ها با تاریخ گذشته ثبت می‌شوند (id بزرگ‌تر، تاریخ قدیمی‌تر) و بخشی از کالاها قبل از اولین خرید فروخته می‌شوند
+  (موجودی منفی → is_cogs_temp)
+- درج با bulk_create؛ سپس موجودی/COGS، مانده‌ی طرف حساب‌ها و جمع روزانه با همان دستورهای بازسازی ساخته می‌شوند
+"""
+import bisect
+import os
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+import jdatetime
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as dbtx
+
+from ledger import viewcache
+from ledger.models import (
+    DailySalesRollup, Inventory, Item, ItemGroup, Party, PartyBalance, PaymentMethod, StockCheckpoint, Transaction,
+    OP_BUY, OP_PAY, OP_RCV, OP_SELL, OP_USE,
+)
+from ledger.utils import normalize_search
+
+WORDS = ["مانتو", "پیراهن", "شلوار", "کیف", "کفش", "روسری", "شال", "کت", "دامن", "تونیک", "کاپشن", "جوراب", "مایو"]
+ADJ = ["مشکی", "سفید", "آبی", "کرم", "یاسی", "طوسی", "زرشکی", "سبز", "نخی", "کتان", "مجلسی", "اسپرت", "لی"]
+FIRST = ["مریم", "زهرا", "سارا", "نگار", "هستی", "الهام", "مینا", "لیلا", "نرگس", "پریسا", "آزاده", "شیما"]
+LAST = ["احمدی", "رضایی", "محمدی", "کریمی", "حسینی", "موسوی", "جعفری", "صادقی", "نوری", "کاظمی", "رحیمی"]
+SUPPLIER = ["پخش", "تولیدی", "گالری", "بوتیک", "بازرگانی"]
+CASH_METHODS = [m.value for m in PaymentMethod]
+
+# (عملیات، سهم) برای ردیف‌های کالایی؛ دریافت/پرداخت کنار فروش/خرید ساخته می‌شوند
+ITEM_OPS = [(OP_SELL, 0.74), (OP_BUY, 0.23), (OP_USE, 0.03)]
+
+
+def _zipf(n, s=1.1):
+    """وزن تجمعی محبوبیت n عضو (اولی‌ها خیلی پرتکرارتر) برای bisect."""
+    return list(accumulate(1 / (k + 1) ** s for k in range(n)))
+
+
+def _pick(rnd, cum):
+    return bisect.bisect(cum, rnd.random() * cum[-1])
+
+
+def _round(x, step=1000):
+    return max(step, int(x) // step * step)
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic ledger (parties, items, transactions) for load and scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transactions", type=int, default=200_000, help="Item rows (BUY/SELL/USE); RCV/PAY come on top")
+        parser.add_argument("--parties", type=int, default=800)
+        parser.add_argument("--items", type=int, default=2000)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument("--start", type=date.fromisoformat, default=date(2022, 3, 21), help="First day (ISO date)")
+        parser.add_argument("--consignment", type=float, default=0.1, help="Share of consignment items")
+        parser.add_argument("--backdated", type=float, default=0.02, help="Share of rows posted with a past date")
+        parser.add_argument("--negative", type=float, default=0.1, help="Share of items sold before their first purchase")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--batch", type=int, default=5000, help="Rows per bulk_create")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="rebuild_inventory processes")
+        parser.add_argument("--flush", action="store_true", help="Delete all existing parties, items and transactions first")
+
+    def handle(self, *args, **opts):
+        if Transaction.objects.exists() and not opts["flush"]:
+            raise CommandError("The ledger already has transactions; pass --flush to replace them")
+        rnd = random.Random(opts["seed"])
+        started = time.perf_counter()
+
+        if opts["flush"]:
+            with dbtx.atomic():
+                for model in (StockCheckpoint, DailySalesRollup, PartyBalance, Transaction, Inventory, Item, Party):
+                    model.objects.all().delete()
+            self.stdout.write("🧹 Existing ledger data deleted")
+
+        with dbtx.atomic():
+            customers, suppliers = self._parties(rnd, opts["parties"])
+            items = self._items(rnd, opts["items"], opts["consignment"])
+            rows = self._transactions(rnd, opts, items, customers, suppliers)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"📦 {opts['parties']:,} parties, {len(items):,} items, {rows:,} transactions "
+                          f"inserted in {elapsed:.1f}s ({rows / max(elapsed, 1e-9) * 60:,.0f} rows/min)")
+
+        # موجودی/COGS (و جمع روزانه‌ی فروش)، سپس مانده‌ی طرف حساب‌ها
+        call_command("rebuild_inventory", "--restart", "--workers", str(opts["workers"]), stdout=self.stdout)
+        call_command("rebuild_party_balances", stdout=self.stdout)
+        viewcache.bump(viewcache.TX, viewcache.ITEMS, viewcache.PARTIES)
+
+        temp = Transaction.objects.filter(is_cogs_temp=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Done in {time.perf_counter() - started:.1f}s (is_cogs_temp rows: {temp:,})"))
+
+    def _parties(self, rnd, n):
+        parties = []
+        for k in range(n):
+            r = rnd.random()
+            if r < 0.12:
+                name, flags = f"{rnd.choice(SUPPLIER)} {rnd.choice(LAST)} {k}", (False, True)
+            elif r < 0.15:
+                name, flags = f"{rnd.choice(FIRST)} {rnd.choice(LAST)} {k}", (True, True)
+            else:
+                name, flags = f"{rnd.choice(FIRST)} {rnd.choice(LAST)} {k}", (True, False)
+            parties.append(Party(name=name, search_name=normalize_search(name), is_customer=flags[0], is_supplier=flags[1]))
+        parties = Party.objects.bulk_create(parties, batch_size=1000)
+        customers = [p for p in parties if p.is_customer]
+        suppliers = [p for p in parties if p.is_supplier]
+        if not customers or not suppliers:
+            raise CommandError("--parties is too small to have both customers and suppliers")
+        rnd.shuffle(customers)
+        rnd.shuffle(suppliers)
+        return customers, suppliers
+
+    def _items(self, rnd, n, consignment):
+        """[(کالا، قیمت خرید پایه)] به ترتیب محبوبیت."""
+        groups = [g.value for g in ItemGroup]
+        items = []
+        for k in range(n):
+            name = f"{rnd.choice(WORDS)} {rnd.choice(ADJ)} {k}"
+            cost = _round(rnd.lognormvariate(13.5, 0.8))  # میانه حدود ۷۳۰ هزار
+            item = Item(name=name, search_name=normalize_search(name), unit="عدد", group=rnd.choice(groups),
+                        sell_price=_round(cost * rnd.uniform(1.3, 1.8)))
+            if rnd.random() < consignment:
+                item.is_consignment = True
+                if rnd.random() < 0.5:
+                    item.commission_amount = _round(item.sell_price * rnd.uniform(0.1, 0.3))
+                else:
+                    item.commission_percent = Decimal(rnd.choice([10, 12.5, 15, 20, 25, 30])).quantize(Decimal("0.01"))
+            items.append((item, cost))
+        Item.objects.bulk_create([item for item, _ in items], batch_size=1000)
+        rnd.shuffle(items)
+        return items
+
+    def _transactions(self, rnd, opts, items, customers, suppliers):
+        days = opts["years"] * 365
+        start = opts["start"]
+        item_cum, cust_cum, supp_cum = _zipf(len(items)), _zipf(len(customers)), _zipf(len(suppliers))
+        ops, op_cum = [op for op, _ in ITEM_OPS], list(accumulate(w for _, w in ITEM_OPS))
+
+        # روز شروع خرید هر کالا: کالاهای «منفی» اول فروخته و بعداً خریده می‌شوند
+        first_buy = {item.pk: (rnd.randint(20, 120) if rnd.random() < opts["negative"] else 0) for item, _ in items}
+        # وزن روزها: جمعه کم، اسفند (ماه ۱۲) پرفروش
+        jdays = [jdatetime.date.fromgregorian(date=start + timedelta(days=d)) for d in range(days)]
+        weight = [(0.4 if (start + timedelta(days=d)).weekday() == 4 else 1.0) * (1.8 if jdays[d].month == 12 else 1.0)
+                  for d in range(days)]
+        scale = opts["transactions"] / sum(weight)
+
+        batch, total, made = [], 0, 0
+        carry = 0.0
+
+        def add(day, **fields):
+            j = jdays[day]
+            batch.append(Transaction(
+                date_miladi=start + timedelta(days=day), date_shamsi=f"{j.year:04d}/{j.month:02d}/{j.day:02d}",
+                jy=j.year, jm=j.month, jd=j.day, cogs=None, is_cogs_temp=False, **fields))
+
+        for day in range(days):
+            carry += weight[day] * scale
+            n, carry = int(carry), carry - int(carry)
+            # خطای گرد کردن به روز آخر می‌رسد تا تعداد دقیقاً همان --transactions باشد
+            n = opts["transactions"] - made if day == days - 1 else min(n, opts["transactions"] - made)
+            inflation = 1 + 0.02 * day / 30  # حدود ۲٪ در ماه
+            for _ in range(n):
+                made += 1
+                item, cost = items[_pick(rnd, item_cum)]
+                op = ops[bisect.bisect(op_cum, rnd.random() * op_cum[-1])]
+                if op == OP_BUY and day < first_buy[item.pk]:
+                    op = OP_SELL
+                # ثبت با تاریخ گذشته: همین حالا (id بعدی) ولی برای چند روز قبل
+                d = max(0, day - rnd.randint(1, 60)) if rnd.random() < opts["backdated"] else day
+
+                if op == OP_BUY:
+                    party = suppliers[_pick(rnd, supp_cum)]
+                    # حجم خرید کمی بیشتر از فروش+مصرف است؛ موجودی گاهی منفی می‌شود و دوباره پوشش داده می‌شود
+                    qty = rnd.randint(1, 8)
+                    price = _round(cost * inflation * rnd.uniform(0.9, 1.1))
+                    add(d, op_type=OP_BUY, item=item, party=party, qty=qty, unit_price=price, total_price=qty * price,
+                        payment_method="")
+                    if rnd.random() < 0.5:
+                        add(d, op_type=OP_PAY, party=party, qty=0, unit_price=0,
+                            total_price=_round(qty * price * rnd.choice([1, 1, 0.5])), payment_method=rnd.choice(CASH_METHODS))
+                elif op == OP_SELL:
+                    party = customers[_pick(rnd, cust_cum)]
+                    qty = 1 if rnd.random() < 0.8 else rnd.randint(2, 4)
+                    price = _round(item.sell_price * inflation * rnd.uniform(0.85, 1.05))
+                    add(d, op_type=OP_SELL, item=item, party=party, qty=qty, unit_price=price, total_price=qty * price,
+                        payment_method="")
+                    if rnd.random() < 0.6:
+                        add(d, op_type=OP_RCV, party=party, qty=0, unit_price=0,
+                            total_price=_round(qty * price * rnd.choice([1, 1, 1, 0.5])), payment_method=rnd.choice(CASH_METHODS))
+                else:
+                    add(d, op_type=OP_USE, item=item, party=None, qty=1, unit_price=0, total_price=0, payment_method="")
+
+                if len(batch) >= opts["batch"]:
+                    Transaction.objects.bulk_create(batch, batch_size=1000)
+                    total += len(batch)
+                    batch = []
+        if batch:
+            Transaction.objects.bulk_create(batch, batch_size=1000)
+            total += len(batch)
+        return total
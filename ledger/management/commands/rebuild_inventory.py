@@ -0,0 +1,205 @@
+"""
+بازسازی موجودی و COGS همه‌ی کالاها با بازپخش کامل (جایگزین recalc_inventory.py).
+
+python manage.py rebuild_inventory                  # همه‌ی کالاها؛ اگر قبلاً نیمه‌کاره مانده، ادامه می‌دهد
+python manage.py rebuild_inventory --items 12 15    # فقط همین کالاها
+python manage.py rebuild_inventory --workers 4      # تعداد پروسس‌های بازپخش (1 = بدون پروسس جدا)
+python manage.py rebuild_inventory --restart        # پیشرفت قبلی نادیده گرفته شود
+python manage.py rebuild_inventory --policy AVG     # سیاست COGS: FIFO (پیش‌فرض) / LPP / AVG
+"""
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction as dbtx
+
+from ledger.models import CHRONO, Item, Inventory, StockCheckpoint, Transaction
+from ledger.services.cogs import (
+    FIFO, POLICIES, ROW_FIELDS, CostParams, ReplayState, signature, replay, inventory_snapshot,
+)
+from ledger.services.rollup import rebuild_rollup
+from ledger.services.stock import CHECKPOINT_EVERY, bulk_update_cogs
+
+
+def _replay_chunk(chunk, policy=FIFO):
+    """
+    بازپخش یک دسته کالا (داخل پروسس جدا؛ بدون دسترسی به دیتابیس).
+    chunk: [(item_id, params, rows)]
+    """
+    out = []
+    for item_id, params, rows in chunk:
+        state = ReplayState()
+        changes, checkpoints = replay(rows, state, params, CHECKPOINT_EVERY, policy)
+        qty, last_buy_cost = inventory_snapshot(state, params, policy)
+        out.append((item_id, changes, checkpoints, qty, last_buy_cost, state.to_json(signature(params, policy))))
+    return out
+
+
+class Command(BaseCommand):
+    help = "Rebuild inventory snapshots and COGS for all (or selected) items by replay (FIFO / LPP / AVG)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", nargs="+", type=int, help="Only rebuild these item ids")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Replay processes (default: CPU count; 1 = in-process)")
+        parser.add_argument("--chunk-rows", type=int, default=20000,
+                            help="Transactions per work unit / write batch (default 20000)")
+        parser.add_argument("--policy", choices=sorted(POLICIES), default=FIFO,
+                            help="COGS policy (default FIFO; consignment items keep their own rule under FIFO)")
+        parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start over")
+        parser.add_argument("--progress-file", default=os.path.join(settings.BASE_DIR, "rebuild_inventory.progress.json"),
+                            help="Where progress is recorded for resuming")
+
+    def handle(self, *args, **opts):
+        selection = sorted(set(opts["items"])) if opts["items"] else None
+        policy = opts["policy"]
+        progress_file = opts["progress_file"]
+
+        items = Item.objects.all()
+        if selection:
+            items = items.filter(id__in=selection)
+        params = {
+            iid: CostParams(bool(cons), amount, percent)
+            for iid, cons, amount, percent in items.values_list(
+                "id", "is_consignment", "commission_amount", "commission_percent")
+        }
+
+        # ادامه از آخرین کالای کامل‌شده (فقط اگر انتخاب کالاها همان باشد)
+        progress = self._load_progress(progress_file)
+        resume_after = None
+        if progress and not opts["restart"] and progress.get("items") == selection \
+                and progress.get("policy", FIFO) == policy:
+            resume_after = progress["last_item_id"]
+            self.stdout.write(f"↻ Resuming after item #{resume_after} (started {progress['started']})")
+        else:
+            self.stdout.write("♻ Resetting inventory snapshots and cost layers...")
+            inv_qs = Inventory.objects.all()
+            cp_qs = StockCheckpoint.objects.all()
+            if selection:
+                inv_qs = inv_qs.filter(item_id__in=selection)
+                cp_qs = cp_qs.filter(item_id__in=selection)
+            # کالاهای بدون تراکنش همین‌جا صفر می‌شوند؛ بقیه در بازپخش بازنویسی می‌شوند
+            inv_qs.update(qty=0, last_buy_cost=0, replay_state=None)
+            cp_qs.delete()
+            progress = {"items": selection, "policy": policy, "last_item_id": None, "started": datetime.now().isoformat(timespec="seconds")}
+
+        workers = max(1, opts["workers"])
+        if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            self.stdout.write("⚠ Process pool needs 'fork'; replaying in-process.")
+            workers = 1
+
+        self.stdout.write(f"📦 Items to rebuild: {len(params)} | policy={policy} | workers={workers}")
+        self.started = time.monotonic()
+        self.items_done = self.rows_done = self.rows_changed = 0
+        self.last_report = self.started
+
+        chunks = self._chunks(params, selection, resume_after, opts["chunk_rows"])
+
+        if workers == 1:
+            for chunk in chunks:
+                self._write(_replay_chunk(chunk, policy), progress, progress_file)
+        else:
+            # پروسس‌ها قبل از باز شدن کرسر ساخته می‌شوند (اتصال SQLite نباید fork شود)
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(_replay_chunk, (chunk, policy)))
+                    # نتایج به ترتیب کالا نوشته می‌شوند تا پیشرفت ذخیره‌شده معتبر بماند
+                    while len(pending) >= workers * 2:
+                        self._write(pending.popleft().get(), progress, progress_file)
+                while pending:
+                    self._write(pending.popleft().get(), progress, progress_file)
+
+        if os.path.exists(progress_file):
+            os.remove(progress_file)
+
+        # COGS فروش‌ها عوض شده → جمع روزانه‌ی فروش از نو ساخته می‌شود
+        days = rebuild_rollup()
+        self.stdout.write(f"📊 Daily sales rollup rebuilt: days={days}")
+
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuild done. items={self.items_done}, rows={self.rows_done}, "
+            f"COGS updated={self.rows_changed} in {elapsed:.1f}s "
+            f"({self.items_done / elapsed:.1f} items/s, {self.rows_done / elapsed:.0f} rows/s)"
+        ))
+
+    def _chunks(self, params, selection, resume_after, chunk_rows):
+        """همه‌ی تراکنش‌ها یک بار به ترتیب (item_id, date_miladi, id) خوانده و دسته‌بندی می‌شوند."""
+        qs = Transaction.objects.filter(item__isnull=False)
+        if selection:
+            qs = qs.filter(item_id__in=selection)
+        if resume_after is not None:
+            qs = qs.filter(item_id__gt=resume_after)
+        stream = (qs.order_by("item_id", *CHRONO)
+                    .values_list("item_id", *ROW_FIELDS)
+                    .iterator(chunk_size=5000))
+
+        chunk, size = [], 0
+        for item_id, group in groupby(stream, key=itemgetter(0)):
+            rows = [r[1:] for r in group]
+            chunk.append((item_id, params[item_id], rows))
+            size += len(rows)
+            if size >= chunk_rows:
+                yield chunk
+                chunk, size = [], 0
+        if chunk:
+            yield chunk
+
+    def _write(self, results, progress, progress_file):
+        item_ids = [r[0] for r in results]
+        changes = {}
+        for _, item_changes, _, _, _, _ in results:
+            changes.update(item_changes)
+
+        with dbtx.atomic():
+            bulk_update_cogs(changes, batch_size=2000)
+
+            StockCheckpoint.objects.filter(item_id__in=item_ids).delete()
+            StockCheckpoint.objects.bulk_create([
+                StockCheckpoint(item_id=item_id, date_miladi=d, tx_id=i, state=s)
+                for item_id, _, checkpoints, _, _, _ in results
+                for d, i, s in checkpoints
+            ], batch_size=500)
+
+            invs = {inv.item_id: inv for inv in Inventory.objects.filter(item_id__in=item_ids)}
+            missing = []
+            for item_id, _, _, qty, last_buy_cost, state in results:
+                inv = invs.get(item_id)
+                if inv is None:
+                    inv = Inventory(item_id=item_id)
+                    missing.append(inv)
+                inv.qty, inv.last_buy_cost, inv.replay_state = qty, last_buy_cost, state
+            Inventory.objects.bulk_update(list(invs.values()), ["qty", "last_buy_cost", "replay_state"], batch_size=500)
+            Inventory.objects.bulk_create(missing)
+
+        progress["last_item_id"] = item_ids[-1]
+        with open(progress_file, "w", encoding="utf-8") as f:
+            json.dump(progress, f)
+
+        self.items_done += len(results)
+        self.rows_done += sum(s["rows"] for *_, s in results)
+        self.rows_changed += len(changes)
+
+        now = time.monotonic()
+        if now - self.last_report >= 5:
+            elapsed = now - self.started
+            self.stdout.write(f"… items={self.items_done} rows={self.rows_done} "
+                              f"({self.items_done / elapsed:.1f} items/s, {self.rows_done / elapsed:.0f} rows/s)")
+            self.last_report = now
+
+    @staticmethod
+    def _load_progress(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
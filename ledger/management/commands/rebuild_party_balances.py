@@ -0,0 +1,53 @@
+"""
+بازسازی/تطبیق مانده‌ی طرف حساب‌ها: جدول خلاصه‌ی PartyBalance و running_balance تراکنش‌ها.
+
+python manage.py rebuild_party_balances                 # همه‌ی طرف حساب‌ها
+python manage.py rebuild_party_balances --parties 3 7   # فقط همین طرف حساب‌ها
+python manage.py rebuild_party_balances --summary-only  # فقط PartyBalance
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as dbtx
+
+from ledger.models import PartyBalance, Transaction
+from ledger.services.balances import refresh_party, rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the PartyBalance summary table and per-transaction running balances."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--parties", nargs="+", type=int, help="Only rebuild these party ids")
+        parser.add_argument("--summary-only", action="store_true", help="Skip per-transaction running balances")
+
+    def handle(self, *args, **opts):
+        selection = sorted(set(opts["parties"])) if opts["parties"] else None
+        started = time.monotonic()
+
+        # مقایسه با وضعیت قبلی فقط برای گزارش اختلاف‌ها
+        before = PartyBalance.objects.all()
+        if selection:
+            before = before.filter(party_id__in=selection)
+        before = {p.party_id: p.balance for p in before}
+
+        summaries = rebuild_summary(selection)
+        after = PartyBalance.objects.all()
+        if selection:
+            after = after.filter(party_id__in=selection)
+        after = dict(after.values_list("party_id", "balance"))
+        drift = sum(1 for pid in set(before) | set(after) if before.get(pid) != after.get(pid))
+        self.stdout.write(f"📊 PartyBalance rows={summaries} | corrected={drift}")
+
+        if not opts["summary_only"]:
+            party_ids = selection or list(
+                Transaction.objects.filter(party__isnull=False)
+                .order_by().values_list("party_id", flat=True).distinct()
+            )
+            rows_changed = 0
+            for party_id in party_ids:
+                with dbtx.atomic():
+                    rows_changed += len(refresh_party(party_id))
+            self.stdout.write(f"🧾 Running balances: parties={len(party_ids)} | rows corrected={rows_changed}")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Done in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,30 @@
+"""
+پر کردن/تطبیق ستون‌های جستجوی نرمال‌شده (Item.search_name، Party.search_name، Transaction.search_description).
+
+python manage.py rebuild_search_index                 # هر سه جدول
+python manage.py rebuild_search_index --only items    # فقط یک جدول (items / parties / transactions)
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as dbtx
+
+from ledger.services.search import SEARCH_COLUMNS, refresh_search
+
+
+class Command(BaseCommand):
+    help = "Backfill or repair the normalized search columns used by name/description searches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", nargs="+", choices=sorted(SEARCH_COLUMNS), help="Only these tables")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        for name in opts["only"] or SEARCH_COLUMNS:
+            model, source, target = SEARCH_COLUMNS[name]
+            t0 = time.monotonic()
+            with dbtx.atomic():
+                changed = refresh_search(model, source, target, batch_size=opts["batch_size"])
+            self.stdout.write(f"🔎 {name}: {target} corrected={changed} ({time.monotonic() - t0:.1f}s)")
+        self.stdout.write(self.style.SUCCESS(f"✅ Done in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,71 @@
+"""
+گزارش لاگ کوئری‌های کند (ledger/slowlog.py): گروه‌بندی با اثر انگشت SQL ، مرتب به مجموع زمان.
+
+python manage.py slow_queries                          # ۱۰ مورد پرهزینه
+python manage.py slow_queries --top 20 --sort p95 --since 2026-10-01
+python manage.py slow_queries --fail-on-scan           # اگر اسکن کامل ledger_transaction باشد exit 1 (برای CI)
+python manage.py slow_queries --clear                  # خالی کردن فایل لاگ
+
+- برای هر گروه: تعداد، مجموع/p50/p95/بیشینه‌ی زمان، صدازننده‌ها، یک نمونه با پارامترها و نقشه‌ی اجرا
+- نقشه‌ای که کل جدول ledger_transaction را می‌خواند (SCAN بدون ایندکس / Seq Scan) علامت می‌خورد
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ledger import slowlog
+
+SORTS = {"total": "total_ms", "p95": "p95", "count": "count", "max": "max"}
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow-query log by SQL fingerprint and flag full scans of ledger_transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Log file (default: LEDGER_SLOW_QUERY_LOG)")
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--sort", choices=sorted(SORTS), default="total")
+        parser.add_argument("--since", help="Only entries at or after this ISO date/time")
+        parser.add_argument("--fail-on-scan", action="store_true", help="Exit non-zero if any query scans ledger_transaction")
+        parser.add_argument("--clear", action="store_true", help="Truncate the log file and exit")
+
+    def handle(self, *args, **opts):
+        path = opts["path"] or slowlog.log_path()
+        if opts["clear"]:
+            if os.path.exists(path):
+                open(path, "w").close()
+            self.stdout.write(self.style.SUCCESS(f"✅ Cleared {path}"))
+            return
+
+        entries = slowlog.read_log(path)
+        if opts["since"]:
+            entries = [e for e in entries if e["ts"] >= opts["since"]]
+        if not entries:
+            self.stdout.write(f"No slow queries in {path}.")
+            return
+
+        groups = slowlog.aggregate(entries)
+        groups.sort(key=lambda g: g[SORTS[opts["sort"]]], reverse=True)
+        self.stdout.write(f"📋 {len(entries):,} slow queries, {len(groups):,} fingerprints ({path})\n")
+
+        for rank, g in enumerate(groups[:opts["top"]], 1):
+            flag = self.style.ERROR("  ⚠ FULL SCAN ledger_transaction") if g["full_scan"] else ""
+            self.stdout.write(
+                f"#{rank}  count={g['count']}  total={g['total_ms']:.0f}ms  p50={g['p50']:.1f}ms  "
+                f"p95={g['p95']:.1f}ms  max={g['max']:.1f}ms{flag}"
+            )
+            self.stdout.write(f"    {g['fingerprint'][:500]}")
+            callers = sorted(g["callers"].items(), key=lambda c: -c[1])
+            self.stdout.write("    callers: " + ", ".join(f"{c} ×{n}" for c, n in callers[:5]))
+            self.stdout.write(f"    sample params: {g['sample']['params']}")
+            for line in g["plan"]:
+                self.stdout.write(f"      {line}")
+            self.stdout.write("")
+
+        scans = [g for g in groups if g["full_scan"]]
+        if scans:
+            msg = f"{len(scans)} fingerprint(s) scan all of ledger_transaction"
+            if opts["fail_on_scan"]:
+                raise CommandError(msg)
+            self.stdout.write(self.style.WARNING(f"⚠ {msg}"))
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
@@ -0,0 +1,52 @@
+"""
+نگه‌داری دوره‌ای SQLite (مثلاً روزانه با scheduled task):
+- PRAGMA optimize: آمار query planner را برای جدول‌هایی که لازم دارند به‌روز می‌کند (ANALYZE محدود)
+- PRAGMA wal_checkpoint: فایل ‎-wal را به دیتابیس اصلی برمی‌گرداند تا بی‌نهایت بزرگ نشود
+
+python manage.py sqlite_maintenance
+python manage.py sqlite_maintenance --checkpoint PASSIVE     # بدون صبر برای خواننده‌ها
+python manage.py sqlite_maintenance --no-optimize
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Run PRAGMA optimize and a WAL checkpoint on the SQLite database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Database alias")
+        parser.add_argument("--checkpoint", choices=["PASSIVE", "FULL", "RESTART", "TRUNCATE", "NONE"],
+                            default="TRUNCATE", help="wal_checkpoint mode (default TRUNCATE: shrink -wal to 0 bytes)")
+        parser.add_argument("--no-optimize", action="store_true", help="Skip PRAGMA optimize")
+
+    def handle(self, *args, **opts):
+        connection = connections[opts["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError(f"database '{opts['database']}' is {connection.vendor}, not SQLite")
+
+        with connection.cursor() as cur:
+            mode = cur.execute("PRAGMA journal_mode").fetchone()[0]
+            self.stdout.write(f"🗄 journal_mode={mode}")
+
+            if not opts["no_optimize"]:
+                t0 = time.perf_counter()
+                cur.execute("PRAGMA optimize")
+                self.stdout.write(f"📊 optimize: {time.perf_counter() - t0:.2f}s")
+
+            if opts["checkpoint"] != "NONE":
+                if mode.lower() != "wal":
+                    self.stdout.write("ℹ️ Not in WAL mode; checkpoint skipped")
+                else:
+                    t0 = time.perf_counter()
+                    busy, log, done = cur.execute(f"PRAGMA wal_checkpoint({opts['checkpoint']})").fetchone()
+                    line = f"📝 wal_checkpoint({opts['checkpoint']}): {done}/{log} frames | {time.perf_counter() - t0:.2f}s"
+                    if busy:
+                        # خواننده/نویسنده‌ای هنوز فعال بود؛ دفعه‌ی بعد ادامه پیدا می‌کند
+                        self.stdout.write(self.style.WARNING(line + " | busy, not complete"))
+                    else:
+                        self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS("✅ Done."))
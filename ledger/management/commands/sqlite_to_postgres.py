@@ -0,0 +1,113 @@
+"""
+انتقال یک فایل SQLite (مثلاً db.sqlite3 فعلی) به دیتابیس تنظیم‌شده (معمولاً PostgreSQL با LEDGER_DB=postgres).
+
+LEDGER_DB=postgres python manage.py migrate
+LEDGER_DB=postgres python manage.py sqlite_to_postgres --source db.sqlite3
+LEDGER_DB=postgres python manage.py sqlite_to_postgres --source backups/restored.sqlite3 --batch 20000
+
+- همه‌ی جدول‌ها (حتی contenttypes/auth/sessions و جدول‌های واسط m2m) با همان id ها کپی می‌شوند
+- جدول‌های مقصد اول خالی می‌شوند (TRUNCATE در PostgreSQL)، همه در یک تراکنش
+- درج با executemany دسته‌ای و بدون ساخت آبجکت مدل؛ در پایان sequence ها تنظیم و تعداد ردیف‌ها مقایسه می‌شود
+"""
+import os
+import time
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction as dbtx
+from django.db.utils import load_backend
+
+from ledger import viewcache
+
+SOURCE_ALIAS = "sqlite_source"
+
+
+def open_source(path):
+    """اتصال جنگو به فایل SQLite منبع، بدون ثبت در settings.DATABASES / connections."""
+    cfg = {"ENGINE": "django.db.backends.sqlite3", "NAME": path}
+    cfg = connections.configure_settings({DEFAULT_DB_ALIAS: {}, SOURCE_ALIAS: cfg})[SOURCE_ALIAS]
+    return load_backend(cfg["ENGINE"]).DatabaseWrapper(cfg, SOURCE_ALIAS)
+
+
+def _models():
+    models = [m for m in apps.get_models(include_auto_created=True) if m._meta.managed and not m._meta.proxy]
+    # ترتیب وابستگی کلیدهای خارجی (در PostgreSQL قیدها DEFERRABLE هستند، ولی ترتیب درست ارزان است)
+    return serializers.sort_dependencies([(None, models)], allow_cycles=True)
+
+
+def copy_model(model, source, target, batch):
+    """ردیف‌های یک مدل از source به target؛ خروجی: تعداد ردیف‌های درج‌شده."""
+    opts = model._meta
+    fields = opts.concrete_fields
+    qn = target.ops.quote_name
+    sql = (f"INSERT INTO {qn(opts.db_table)} ({', '.join(qn(f.column) for f in fields)}) "
+           f"VALUES ({', '.join(['%s'] * len(fields))})")
+    # همان کوئری values_list ولی کامپایل‌شده برای اتصال منبع (تبدیل‌های from_db_value هم اعمال می‌شوند)
+    query = model._base_manager.order_by("pk").values_list(*[f.attname for f in fields]).query
+    rows = query.get_compiler(connection=source).results_iter(chunked_fetch=True, chunk_size=batch)
+
+    count = 0
+    chunk = []
+    with target.cursor() as cursor:
+        for row in rows:
+            # تبدیل به قالب مقصد (JSON، Decimal، تاریخ، بولی) مثل save()
+            chunk.append([f.get_db_prep_save(v, connection=target) for f, v in zip(fields, row)])
+            if len(chunk) >= batch:
+                cursor.executemany(sql, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            cursor.executemany(sql, chunk)
+            count += len(chunk)
+    return count
+
+
+def _source_count(model, source):
+    with source.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {source.ops.quote_name(model._meta.db_table)}")
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = "Bulk-copy every table from a SQLite file into the configured database (e.g. PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", required=True, help="Path of the SQLite database file to copy from")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Target database alias (default: default)")
+        parser.add_argument("--batch", type=int, default=5000, help="Rows per executemany batch")
+
+    def handle(self, *args, **opts):
+        path = os.path.abspath(opts["source"])
+        if not os.path.exists(path):
+            raise CommandError(f"source not found: {path}")
+        source = open_source(path)
+        target = connections[opts["database"]]
+        if source.settings_dict["NAME"] == target.settings_dict["NAME"]:
+            raise CommandError("source and target are the same database")
+
+        models = _models()
+        started = time.perf_counter()
+        with dbtx.atomic(using=target.alias):
+            tables = [m._meta.db_table for m in models]
+            target.ops.execute_sql_flush(
+                target.ops.sql_flush(no_style(), tables, reset_sequences=False, allow_cascade=True)
+            )
+            for model in models:
+                t0 = time.perf_counter()
+                copied = copy_model(model, source, target, opts["batch"])
+                expected = _source_count(model, source)
+                if copied != expected:
+                    raise CommandError(f"{model._meta.label}: copied {copied} of {expected} rows")
+                if copied:
+                    self.stdout.write(f"📦 {model._meta.label:<40} {copied:>10,} rows | {time.perf_counter() - t0:.1f}s")
+
+            # id های کپی‌شده صریح بودند → sequence ها باید بعد از بیشترین id ادامه دهند
+            with target.cursor() as cursor:
+                for sql in target.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+        source.close()
+        viewcache.bump(viewcache.TX, viewcache.ITEMS, viewcache.PARTIES)
+        self.stdout.write(self.style.SUCCESS(f"✅ Done in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,23 @@
+"""
+همگام‌سازی نقش طرف حساب‌ها (مشتری/فروشنده) با تاریخچه‌ی تراکنش‌ها و حذف طرف حساب‌های بدون تراکنش.
+مناسب اجرای شبانه (cron).
+
+python manage.py sync_party_roles             # نقش‌ها + حذف طرف حساب‌های بدون تراکنش
+python manage.py sync_party_roles --no-prune  # فقط نقش‌ها
+"""
+from django.core.management.base import BaseCommand
+
+from ledger.services.parties import sync_roles
+
+
+class Command(BaseCommand):
+    help = "Set party customer/supplier flags from transaction history and delete parties without transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-prune", action="store_true", help="Keep parties that have no transactions")
+
+    def handle(self, *args, **opts):
+        result = sync_roles(prune=not opts["no_prune"])
+        self.stdout.write(f"👥 Roles corrected: customers={result['customers']} | suppliers={result['suppliers']}")
+        self.stdout.write(f"🧽 Orphan parties pruned={result['pruned']}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Done in {result['seconds']:.2f}s"))
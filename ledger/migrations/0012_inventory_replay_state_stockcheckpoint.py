@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0011_remove_party_party_at_least_one_role_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='replay_state',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_miladi', models.DateField()),
+                ('tx_id', models.BigIntegerField()),
+                ('state', models.JSONField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='ledger.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'date_miladi', 'tx_id'], name='ledger_stoc_item_id_ecd39f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0012_inventory_replay_state_stockcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['item', 'date_miladi', 'id'], name='ledger_tran_item_id_144428_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:16
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+# همان علامت‌های services/balances.SIGN (مهاجرت نباید به کد جاری وابسته باشد)
+SIGN = {"SELL": 1, "USE": 1, "PAY": 1, "BUY": -1, "RCV": -1}
+
+
+def backfill_running_balance(apps, schema_editor):
+    Transaction = apps.get_model("ledger", "Transaction")
+    conn = schema_editor.connection
+    table = conn.ops.quote_name(Transaction._meta.db_table)
+    sql = f"UPDATE {table} SET running_balance = %s WHERE id = %s"
+
+    rows = (Transaction.objects.filter(party__isnull=False)
+            # بدون تاریخ‌ها اول، مثل balances.refresh_party (روی PostgreSQL هم)
+            .order_by("party_id", models.F("date_miladi").asc(nulls_first=True), "id")
+            .values_list("party_id", "id", "op_type", "total_price")
+            .iterator(chunk_size=5000))
+    batch = []
+    with conn.cursor() as cursor:
+        for _, group in groupby(rows, key=lambda r: r[0]):
+            balance = 0
+            for _, tx_id, op, total in group:
+                balance += SIGN.get(op, 0) * int(total or 0)
+                batch.append((balance, tx_id))
+            if len(batch) >= 5000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0013_transaction_item_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='running_balance',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['party', 'date_miladi', 'id'], name='ledger_tran_party_i_107c74_idx'),
+        ),
+        migrations.RunPython(backfill_running_balance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, Max, Sum, When
+from django.db.models.functions import Coalesce
+
+# همان SUMMARY_FIELD در services/balances (مهاجرت نباید به کد جاری وابسته باشد)
+SUMMARY_FIELD = {"SELL": "total_sell", "RCV": "total_rcv", "BUY": "total_buy", "PAY": "total_pay"}
+
+
+def backfill_party_balances(apps, schema_editor):
+    Party = apps.get_model("ledger", "Party")
+    PartyBalance = apps.get_model("ledger", "PartyBalance")
+    Transaction = apps.get_model("ledger", "Transaction")
+
+    def total(op):
+        return Coalesce(Sum(Case(When(op_type=op, then=F("total_price")), default=0,
+                                 output_field=models.BigIntegerField())), 0)
+
+    rows = (Transaction.objects.filter(party_id__in=Party.objects.values("id"))
+            .order_by().values("party_id")
+            .annotate(**{field: total(op) for op, field in SUMMARY_FIELD.items()},
+                      last_tx_date=Max("date_miladi")))
+    PartyBalance.objects.bulk_create([
+        PartyBalance(balance=(r["total_sell"] - r["total_rcv"]) - (r["total_buy"] - r["total_pay"]), **r)
+        for r in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0014_transaction_running_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyBalance',
+            fields=[
+                ('party', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='ledger.party')),
+                ('total_sell', models.BigIntegerField(default=0)),
+                ('total_rcv', models.BigIntegerField(default=0)),
+                ('total_buy', models.BigIntegerField(default=0)),
+                ('total_pay', models.BigIntegerField(default=0)),
+                ('balance', models.BigIntegerField(default=0)),
+                ('last_tx_date', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['balance'], name='ledger_part_balance_6fea8c_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_party_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0015_partybalance'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='ledger_tran_date_mi_5c68d0_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date_miladi', 'id'], name='ledger_tran_date_mi_c9f35e_idx'),
+        ),
+    ]
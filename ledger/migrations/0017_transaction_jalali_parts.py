@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:20
+
+import jdatetime
+from django.db import migrations, models
+
+
+def _parts(date_shamsi, date_miladi):
+    # همان منطق Transaction.fill_jdate (مهاجرت نباید به کد جاری وابسته باشد)
+    if date_shamsi:
+        s = str(date_shamsi).strip().translate(str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789')).replace('-', '/')
+        parts = s.split('/')
+        if len(parts) == 3:
+            try:
+                y, m, d = (int(p) for p in parts)
+                if 1 <= m <= 12 and 1 <= d <= 31:
+                    return y, m, d
+            except ValueError:
+                pass
+    if date_miladi:
+        j = jdatetime.date.fromgregorian(date=date_miladi)
+        return j.year, j.month, j.day
+    return None, None, None
+
+
+def backfill_jalali_parts(apps, schema_editor):
+    Transaction = apps.get_model("ledger", "Transaction")
+    conn = schema_editor.connection
+    table = conn.ops.quote_name(Transaction._meta.db_table)
+    sql = f"UPDATE {table} SET jy = %s, jm = %s, jd = %s WHERE id = %s"
+
+    rows = Transaction.objects.values_list("id", "date_shamsi", "date_miladi").iterator(chunk_size=5000)
+    batch = []
+    with conn.cursor() as cursor:
+        for tx_id, date_shamsi, date_miladi in rows:
+            batch.append((*_parts(date_shamsi, date_miladi), tx_id))
+            if len(batch) >= 5000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0016_transaction_date_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='jd',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='jm',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='jy',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['op_type', 'jy', 'jm', 'jd'], name='ledger_tran_op_type_2dafd4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['jy', 'jm', 'jd'], name='ledger_tran_jy_b4358b_idx'),
+        ),
+        migrations.RunPython(backfill_jalali_parts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:21
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_daily_sales(apps, schema_editor):
+    DailySalesRollup = apps.get_model("ledger", "DailySalesRollup")
+    Transaction = apps.get_model("ledger", "Transaction")
+    rows = (Transaction.objects.filter(op_type__in=("SELL", "USE"), jy__isnull=False)
+            .order_by().values("jy", "jm", "jd")
+            .annotate(sales=Coalesce(Sum("total_price"), 0), cogs=Coalesce(Sum("cogs"), 0), rows=Count("id")))
+    DailySalesRollup.objects.bulk_create([DailySalesRollup(**r) for r in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0017_transaction_jalali_parts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jy', models.SmallIntegerField()),
+                ('jm', models.SmallIntegerField()),
+                ('jd', models.SmallIntegerField()),
+                ('sales', models.BigIntegerField(default=0)),
+                ('cogs', models.BigIntegerField(default=0)),
+                ('rows', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('jy', 'jm', 'jd'), name='daily_sales_rollup_day')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:29
+
+from django.db import migrations, models
+
+# همان utils.normalize_search (مهاجرت نباید به کد جاری وابسته باشد)
+_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ؤ": "و",
+    **{chr(0x0660 + k): chr(0x06F0 + k) for k in range(10)},
+    "\u200c": None, "\u200d": None, "\u0640": None, "\u0670": None,
+    **{chr(c): None for c in range(0x064B, 0x0653)},
+})
+
+
+def _normalize(s):
+    if not s:
+        return ''
+    s = str(s).strip().translate(_MAP).translate(str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789'))
+    s = s.replace(',', '').replace('٬', '').lower()
+    return ''.join(s.split())
+
+
+def backfill_search_columns(apps, schema_editor):
+    conn = schema_editor.connection
+    for model_name, source, target in (("Item", "name", "search_name"), ("Party", "name", "search_name"),
+                                       ("Transaction", "description", "search_description")):
+        Model = apps.get_model("ledger", model_name)
+        sql = (f"UPDATE {conn.ops.quote_name(Model._meta.db_table)} "
+               f"SET {conn.ops.quote_name(target)} = %s WHERE id = %s")
+        batch = []
+        with conn.cursor() as cursor:
+            for pk, value in Model.objects.exclude(**{f"{source}__isnull": True}).exclude(**{source: ""}) \
+                                          .values_list("id", source).iterator(chunk_size=5000):
+                batch.append((_normalize(value), pk))
+                if len(batch) >= 5000:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0018_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='item',
+            name='ledger_item_name_1f8e6e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='party',
+            name='ledger_part_name_a560d6_idx',
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='party',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='search_description',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['name', 'search_name'], name='ledger_item_name_a4b5af_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['search_name'], name='ledger_item_search__e96246_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(fields=['name', 'search_name'], name='ledger_part_name_584f3e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(fields=['search_name'], name='ledger_part_search__35a5da_idx'),
+        ),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:56
+
+from django.db import migrations, models
+
+# فقط PostgreSQL: ایندکس trigram برای جستجوی «شامل» (search_name__contains → LIKE '%...%')
+# SQLite چنین ایندکسی ندارد و همان اسکن ستون کوتاه نرمال‌شده را انجام می‌دهد
+TRGM_INDEXES = [
+    ("ledger_item_search_trgm", "ledger_item", "search_name"),
+    ("ledger_party_search_trgm", "ledger_party", "search_name"),
+    ("ledger_tx_search_desc_trgm", "ledger_transaction", "search_description"),
+]
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    qn = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRGM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {qn(name)} ON {qn(table)} USING gin ({qn(column)} gin_trgm_ops)"
+        )
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRGM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0020_transaction_import_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('op_type', 'SELL'), ('op_type', 'USE'), _connector='OR'), fields=['date_miladi', 'id'], name='ledger_tx_sale_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('op_type', 'BUY')), fields=['date_miladi', 'id'], name='ledger_tx_buy_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('op_type', 'RCV')), fields=['date_miladi', 'id'], name='ledger_tx_rcv_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('op_type', 'PAY')), fields=['date_miladi', 'id'], name='ledger_tx_pay_date_idx'),
+        ),
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
@@ -1,5 +1,8 @@
+import jdatetime
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
+from .utils import split_jdate, normalize_search
+from . import viewcache
 
 # --- ثابت‌ها (کنار مدل‌ها) ---
 OP_SELL = "SELL"
@@ -42,6 +45,11 @@ class TransactionQuerySet(models.QuerySet):
     def payments(self):  return self.filter(op_type=OP_PAY)
     def ownuse(self):    return self.filter(op_type=OP_USE)
 
+# ترتیب زمانی تراکنش‌ها (date_miladi, id) با جای صریح ردیف‌های بدون تاریخ: در ترتیب صعودی اول
+# (پیش‌فرض SQLite؛ PostgreSQL بدون NULLS FIRST/LAST آن‌ها را آخر می‌گذارد)
+CHRONO      = (F("date_miladi").asc(nulls_first=True), F("id").asc())
+CHRONO_DESC = (F("date_miladi").desc(nulls_last=True), F("id").desc())
+
 class TransactionManager(models.Manager):
     def get_queryset(self): return TransactionQuerySet(self.model, using=self._db)
     def sales(self):     return self.get_queryset().sales()
@@ -58,6 +66,10 @@ class Transaction(models.Model):
     op_type     = models.CharField(max_length=15, choices=OP_CHOICES)
     date_miladi = models.DateField(null=True, blank=True)
     date_shamsi = models.CharField(max_length=10, null=True, blank=True)
+    # اجزای عددی تاریخ شمسی برای فیلتر/گروه‌بندی با ایندکس (با fill_jdate پر می‌شوند)
+    jy = models.SmallIntegerField(null=True, blank=True, editable=False)
+    jm = models.SmallIntegerField(null=True, blank=True, editable=False)
+    jd = models.SmallIntegerField(null=True, blank=True, editable=False)
 
     party = models.ForeignKey(
         'Party',
@@ -75,18 +87,62 @@ class Transaction(models.Model):
     is_cogs_temp   = models.BooleanField(default=False)
     payment_method = models.CharField(max_length=10, choices=PaymentMethod.choices, default=PaymentMethod.POS2, null=True, blank=True,)
     description    = models.CharField(max_length=50, null=True, blank=True)
+    # شکل نرمال‌شده‌ی description برای جستجو (utils.normalize_search)
+    search_description = models.CharField(max_length=50, blank=True, default="", editable=False)
+    # مانده‌ی طرف حساب بعد از این تراکنش (به ترتیب date_miladi, id)؛ services/balances نگه‌اش می‌دارد
+    running_balance = models.BigIntegerField(null=True, blank=True, editable=False)
+    # ردیف اکسلی که این تراکنش از آن آمده (import_hbmaison --incremental):
+    # import_key = هویت ردیف (تاریخ، نوع، طرف حساب، کالا، شماره‌ی تکرار)، import_fp = اثر انگشت محتوای آن
+    import_key = models.CharField(max_length=40, null=True, blank=True, unique=True, editable=False)
+    import_fp  = models.CharField(max_length=40, null=True, blank=True, editable=False)
 
     objects = TransactionManager()
 
     class Meta:
         indexes = [
             models.Index(fields=["party", "op_type"]),
-            models.Index(fields=["date_miladi"]),
+            models.Index(fields=["date_miladi", "id"]),  # صفحه‌بندی keyset لیست تراکنش‌ها (جایگزین ایندکس تک‌ستونی تاریخ)
+            models.Index(fields=["item", "date_miladi", "id"]),  # بازپخش COGS به ترتیب تاریخ هر کالا
+            models.Index(fields=["party", "date_miladi", "id"]),  # مانده‌ی جاری و آخرین ردیف‌های هر طرف حساب
+            models.Index(fields=["op_type", "jy", "jm", "jd"]),   # گزارش فروش ماهانه/روزانه
+            models.Index(fields=["jy", "jm", "jd"]),              # فیلتر تاریخ لیست تراکنش‌ها
+            # ایندکس‌های جزئی «آخرین تراکنش‌ها»ی هر صفحه‌ی ثبت (get_recent_transactions، keyset نزولی):
+            # هر ردیف فقط در یکی از آن‌هاست. شرط فروش OR است نه IN: SQLite ایندکس جزئی را با IN پارامتری به کار نمی‌برد
+            models.Index(fields=["date_miladi", "id"], condition=Q(op_type=OP_SELL) | Q(op_type=OP_USE),
+                         name="ledger_tx_sale_date_idx"),
+            models.Index(fields=["date_miladi", "id"], condition=Q(op_type=OP_BUY), name="ledger_tx_buy_date_idx"),
+            models.Index(fields=["date_miladi", "id"], condition=Q(op_type=OP_RCV), name="ledger_tx_rcv_date_idx"),
+            models.Index(fields=["date_miladi", "id"], condition=Q(op_type=OP_PAY), name="ledger_tx_pay_date_idx"),
         ]
 
     def __str__(self):
         return f"{self.op_type} - {getattr(self, 'party', None)} - {self.total_price}"
 
+    def fill_jdate(self):
+        """jy/jm/jd از date_shamsi (یا اگر خالی/نامعتبر بود از date_miladi)."""
+        parts = split_jdate(self.date_shamsi)
+        if parts is None and self.date_miladi:
+            j = jdatetime.date.fromgregorian(date=self.date_miladi)
+            parts = (j.year, j.month, j.day)
+        self.jy, self.jm, self.jd = parts or (None, None, None)
+
+    def fill_search(self):
+        self.search_description = normalize_search(self.description)
+
+    def save(self, *args, **kwargs):
+        # bulk_create از save عبور نمی‌کند → services/stock._build_tx هم fill_jdate/fill_search را صدا می‌زند
+        self.fill_jdate()
+        self.fill_search()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {"date_shamsi", "date_miladi"} & update_fields:
+                update_fields |= {"jy", "jm", "jd"}
+            if "description" in update_fields:
+                update_fields.add("search_description")
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
     @property
     def gross_profit(self):
         # حاشیه سود ناخالص (اگر cogs موجود باشد)
@@ -138,6 +194,7 @@ class PartyManager(models.Manager):
 
 class Party(models.Model):
     name = models.CharField(max_length=50)
+    search_name = models.CharField(max_length=50, blank=True, default="", editable=False)  # utils.normalize_search(name)
     # ✅ دو بولین به‌جای role:
     is_customer = models.BooleanField(default=False)
     is_supplier = models.BooleanField(default=False)
@@ -148,12 +205,27 @@ class Party(models.Model):
         verbose_name = "طرف حساب"
         verbose_name_plural = "طرف حساب‌ها"
         indexes = [
-            models.Index(fields=["name"]),
+            # search_name کنار name → جستجوی «شامل» به ترتیب نام فقط روی ایندکس (بدون خواندن جدول)
+            models.Index(fields=["name", "search_name"]),
+            models.Index(fields=["search_name"]),  # «شروع با» به‌صورت بازه
         ]
  
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "search_name"}
+        super().save(*args, **kwargs)
+        viewcache.bump(viewcache.PARTIES)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        viewcache.bump(viewcache.PARTIES)
+        return result
+
 class ItemGroup(models.TextChoices):
     FORMAL    = "formal",    "لباس مجلسی"
     SPORT     = "sport",     "لباس اسپرت"
@@ -165,6 +237,7 @@ class ItemGroup(models.TextChoices):
 
 class Item(models.Model):
     name       = models.CharField(max_length=255)
+    search_name = models.CharField(max_length=255, blank=True, default="", editable=False)  # utils.normalize_search(name)
     unit       = models.CharField(max_length=50, blank=True, null=True)
     sell_price = models.IntegerField(null=True, blank=True)
     group      = models.CharField(max_length=100, choices=ItemGroup.choices, blank=True, null=True)
@@ -176,11 +249,28 @@ class Item(models.Model):
     class Meta:
         verbose_name = "کالا"
         verbose_name_plural = "کالاها"
-        indexes = [models.Index(fields=["name"])]
+        indexes = [
+            # search_name کنار name → جستجوی «شامل» به ترتیب نام فقط روی ایندکس (بدون خواندن جدول)
+            models.Index(fields=["name", "search_name"]),
+            models.Index(fields=["search_name"]),  # «شروع با» به‌صورت بازه
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "search_name"}
+        super().save(*args, **kwargs)
+        viewcache.bump(viewcache.ITEMS)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        viewcache.bump(viewcache.ITEMS)
+        return result
+
     @property
     def settlement_type(self):
         """برای راحتی در گزارش‌گیری"""
@@ -198,5 +288,67 @@ class Inventory(models.Model):
     qty = models.DecimalField(max_digits=18, decimal_places=0, default=0)
     last_buy_cost = models.DecimalField(max_digits=18, decimal_places=0, default=0, verbose_name="آخرین قیمت خرید")
 
+    # وضعیت لایه‌های بهای تمام‌شده بعد از آخرین تراکنش بازپخش‌شده (None = نامعلوم → بازپخش کامل)
+    replay_state = models.JSONField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.item} — {self.qty}"
+
+class StockCheckpoint(models.Model):
+    """
+    اسنپ‌شات میانی لایه‌های FIFO یک کالا (هر چند صد تراکنش یک‌بار).
+    ثبت‌های با تاریخ گذشته فقط از نزدیک‌ترین چک‌پوینت قبلی بازپخش می‌شوند.
+    """
+    item        = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="stock_checkpoints")
+    date_miladi = models.DateField()
+    tx_id       = models.BigIntegerField()   # آخرین تراکنشِ لحاظ‌شده در این اسنپ‌شات
+    state       = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["item", "date_miladi", "tx_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} @ {self.date_miladi} #{self.tx_id}"
+
+class PartyBalance(models.Model):
+    """
+    جمع‌های هر طرف حساب (فقط طرف حساب‌های دارای تراکنش).
+    با هر ثبت به‌روز می‌شود؛ بازسازی/تطبیق: manage.py rebuild_party_balances
+    """
+    party        = models.OneToOneField(Party, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    total_sell   = models.BigIntegerField(default=0)
+    total_rcv    = models.BigIntegerField(default=0)
+    total_buy    = models.BigIntegerField(default=0)
+    total_pay    = models.BigIntegerField(default=0)
+    balance      = models.BigIntegerField(default=0)   # (فروش - دریافت) - (خرید - پرداخت)
+    last_tx_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["balance"]),
+        ]
+
+    def __str__(self):
+        return f"{self.party_id}: {self.balance}"
+
+class DailySalesRollup(models.Model):
+    """
+    جمع فروش/مصرف هر روز شمسی (برای گزارش فروش ماهانه/روزانه).
+    با هر ثبت و هر اصلاح COGS به‌روز می‌شود؛ بازسازی: manage.py rebuild_sales_rollup
+    """
+    jy    = models.SmallIntegerField()
+    jm    = models.SmallIntegerField()
+    jd    = models.SmallIntegerField()
+    sales = models.BigIntegerField(default=0)   # جمع total_price فروش/مصرف
+    cogs  = models.BigIntegerField(default=0)   # جمع COGS همان ردیف‌ها
+    rows  = models.IntegerField(default=0)      # تعداد ردیف‌های فروش/مصرف
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["jy", "jm", "jd"], name="daily_sales_rollup_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.jy}/{self.jm:02d}/{self.jd:02d}: {self.sales}"
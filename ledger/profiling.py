@@ -0,0 +1,154 @@
+# ledger/profiling.py
+"""
+پروفایل cProfile یک درخواست، فقط برای کاربر staff و فقط وقتی خواسته شود:
+
+    /parties/?_profile=1                  (یا هدر X-Ledger-Profile: 1)
+
+- درخواست زیر cProfile اجرا می‌شود؛ SQL های اجرا‌شده هم (با زمان و پارامترها) ثبت می‌شوند
+- در LEDGER_PROFILE_DIR سه فایل: ‎.pstats (برای snakeviz / python -m pstats) ، ‎.txt (خلاصه‌ی پرهزینه‌ترین
+  توابع به ترتیب cumulative + فهرست SQL) و ‎.json (مشخصات برای فهرست)
+- فقط LEDGER_PROFILE_KEEP پروفایل آخر نگه داشته می‌شود؛ فهرست در /admin/profiles/
+- درخواست‌های عادی: فقط یک جستجوی کلید در META و رشته‌ی query (parse فقط اگر _profile در آن باشد) ؛
+  LEDGER_PROFILING=False → middleware حذف
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PARAM = "_profile"
+HEADER = "HTTP_X_LEDGER_PROFILE"
+TOP_FUNCTIONS = 40
+
+# نام فایل‌ها: 20261017-210000-123456-parties_list
+_NAME_RE = re.compile(r"^\d{8}-\d{6}-\d{6}-[\w-]+$")
+
+
+def profile_dir():
+    return str(getattr(settings, "LEDGER_PROFILE_DIR", os.path.join(settings.BASE_DIR, "profiles")))
+
+
+def keep_count():
+    return getattr(settings, "LEDGER_PROFILE_KEEP", 50)
+
+
+def _requested(request):
+    if HEADER in request.META:
+        return True
+    # بررسی رشته فقط برای رد سریع؛ x_profile=1 هم آن را دارد → تصمیم با پارامترهای parse‌شده
+    return PARAM in request.META.get("QUERY_STRING", "") and PARAM in request.GET
+
+
+def path_for(name, ext):
+    """مسیر فایل یک پروفایل؛ نام نامعتبر (مثلاً ../) → ValueError"""
+    if not _NAME_RE.match(name):
+        raise ValueError(f"invalid profile name: {name!r}")
+    return os.path.join(profile_dir(), f"{name}.{ext}")
+
+
+def profiles():
+    """مشخصات پروفایل‌های ذخیره‌شده، جدیدترین اول."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    result = []
+    for fn in sorted(os.listdir(directory), reverse=True):
+        if fn.endswith(".json"):
+            with open(os.path.join(directory, fn), encoding="utf-8") as f:
+                result.append(json.load(f))
+    return result
+
+
+def rotate(keep):
+    """حذف پروفایل‌های قدیمی‌تر از keep تای آخر؛ خروجی: نام‌های حذف‌شده"""
+    removed = []
+    for meta in profiles()[keep:]:
+        for ext in ("pstats", "txt", "json"):
+            path = path_for(meta["name"], ext)
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(meta["name"])
+    return removed
+
+
+def _summary(meta, profiler, queries):
+    out = io.StringIO()
+    out.write(f"{meta['method']} {meta['path']}  view={meta['view']}  status={meta['status']}  user={meta['user']}\n")
+    out.write(f"{meta['created']}  total {meta['ms']}ms  sql {meta['sql_ms']}ms in {meta['queries']} queries\n\n")
+    out.write(f"== top {TOP_FUNCTIONS} functions by cumulative time ==\n")
+    pstats.Stats(profiler, stream=out).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    out.write(f"== SQL ({len(queries)}) ==\n")
+    for ms, sql, params in queries:
+        out.write(f"{ms:9.2f}ms  {sql}\n           params={params!r}\n")
+    return out.getvalue()
+
+
+def save(request, response, profiler, queries, total_ms):
+    """ذخیره‌ی پروفایل یک درخواست؛ خروجی: نام پروفایل"""
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match else "-"
+    now = datetime.now()
+    name = f"{now:%Y%m%d-%H%M%S-%f}-" + re.sub(r"[^\w-]", "_", view)
+    meta = {
+        "name": name, "created": now.isoformat(timespec="seconds"), "method": request.method,
+        "path": request.get_full_path(), "view": view, "status": response.status_code,
+        "user": request.user.get_username(), "ms": round(total_ms, 1), "queries": len(queries),
+        "sql_ms": round(sum(q[0] for q in queries), 1),
+    }
+    os.makedirs(profile_dir(), exist_ok=True)
+    profiler.dump_stats(path_for(name, "pstats"))
+    with open(path_for(name, "txt"), "w", encoding="utf-8") as f:
+        f.write(_summary(meta, profiler, queries))
+    # json آخر نوشته می‌شود: فهرست فقط پروفایل‌های کامل را می‌بیند
+    with open(path_for(name, "json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    rotate(keep_count())
+    return name
+
+
+class ProfilingMiddleware:
+    """بعد از AuthenticationMiddleware (request.user لازم است)."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "LEDGER_PROFILING", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+
+        request.ledger_profiling = True  # cached_view: خود view اجرا شود، نه پاسخ کش‌شده
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            t0 = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append(((time.perf_counter() - t0) * 1000, sql, params))
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # پروفایلر دیگری در همین thread فعال است → بدون پروفایل
+            return self.get_response(request)
+        t0 = time.perf_counter()
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(record):
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        total_ms = (time.perf_counter() - t0) * 1000
+
+        response["X-Ledger-Profile"] = save(request, response, profiler, queries, total_ms)
+        return response
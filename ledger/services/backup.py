@@ -0,0 +1,272 @@
+# ledger/services/backup.py
+"""
+پشتیبان‌گیری از دیتابیس:
+- snapshot: کپی سازگار SQLite با Online Backup API (sqlite3.Connection.backup) به‌صورت چند صفحه در هر قدم؛
+  بین قدم‌ها قفل آزاد می‌شود تا نوشتن‌های برنامه منتظر نمانند (اگر وسط کار دیتابیس عوض شود SQLite خودش از نو کپی می‌کند)
+- dump_jsonl: خروجی JSONL فشرده و جریانی (هر خط یک ردیف؛ همان قالب loaddata) بدون ساخت آبجکت مدل،
+  همه‌ی جدول‌ها در یک تراکنش فقط‌خواندنی (یک نمای سازگار، بدون قفل نوشتن؛ در WAL نوشتن‌ها ادامه می‌دهند)
+- فشرده‌سازی gzip یا zstd (اگر پکیج zstandard نصب باشد)، فایل ‎.sha256 کنار هر پشتیبان و بررسی آن بعد از نوشتن
+- rotate: نگه داشتن فقط N پشتیبان آخر هر نوع
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+COMPRESSIONS = ("gzip", "zstd", "none")
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+# مدل‌هایی که به id جدول contenttypes وابسته‌اند و بین دیتابیس‌ها قابل انتقال نیستند (مثل dumpdata -e)
+JSONL_EXCLUDE = {"contenttypes.contenttype", "auth.permission", "sessions.session", "admin.logentry"}
+CHUNK = 1 << 20
+
+
+class BackupError(Exception):
+    pass
+
+
+def _open_compressed(path, compression, mode="wb"):
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise BackupError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        raw = open(path, mode)
+        if "w" in mode:
+            return zstandard.ZstdCompressor(level=10, threads=-1).stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return open(path, mode)
+
+
+def _digest(f):
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(CHUNK), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_file(path):
+    with open(path, "rb") as f:
+        return _digest(f)
+
+
+def _check_roundtrip(path, compression, raw_checksum):
+    """فایل نوشته‌شده را از نو باز (و از فشردگی خارج) می‌کند و با checksum داده‌ی اصلی مقایسه می‌کند."""
+    with _open_compressed(path, compression, "rb") as f:
+        if _digest(f) != raw_checksum:
+            raise BackupError(f"{path} does not read back to the data that was written")
+
+
+def _write_checksum(path):
+    checksum = sha256_file(path)
+    with open(path + ".sha256", "w", encoding="ascii") as f:
+        f.write(f"{checksum}  {os.path.basename(path)}\n")
+    return checksum
+
+
+def verify(path):
+    """بررسی فایل پشتیبان با ‎.sha256 کنارش؛ خروجی checksum (در صورت اختلاف BackupError)."""
+    try:
+        with open(path + ".sha256", encoding="ascii") as f:
+            expected = f.read().split()[0]
+    except (OSError, IndexError):
+        raise BackupError(f"missing checksum file for {path}")
+    actual = sha256_file(path)
+    if actual != expected:
+        raise BackupError(f"checksum mismatch for {path}: {actual} != {expected}")
+    return actual
+
+
+def _finish(tmp_path, path, compression):
+    """فایل موقت را فشرده در path می‌نویسد، بازخوانی/مقایسه می‌کند و checksum کنارش می‌گذارد."""
+    raw = hashlib.sha256()
+    try:
+        with open(tmp_path, "rb") as src, _open_compressed(path + ".part", compression) as dst:
+            for block in iter(lambda: src.read(CHUNK), b""):
+                raw.update(block)
+                dst.write(block)
+    finally:
+        os.remove(tmp_path)
+    os.replace(path + ".part", path)
+    _check_roundtrip(path, compression, raw.hexdigest())
+    return _write_checksum(path)
+
+
+def _stamp():
+    # ترتیب الفبایی نام‌ها = ترتیب زمانی (rotate به آن تکیه می‌کند)
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def snapshot(directory, *, using=DEFAULT_DB_ALIAS, compression="gzip", pages=256, sleep=0.005):
+    """
+    پشتیبان سازگار SQLite در directory (db-<زمان>.sqlite3[.gz|.zst]).
+    pages: تعداد صفحه در هر قدم (-1 یعنی یک‌جا)، sleep: مکث بین قدم‌ها (ثانیه)
+    خروجی: {"path", "bytes", "checksum", "seconds"}
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        raise BackupError(f"online snapshot only supports SQLite (database '{using}' is {connection.vendor}); use JSONL")
+    # با تراکنش باز روی همین اتصال، backup_step برای همیشه SQLITE_BUSY برمی‌گرداند
+    if connection.in_atomic_block:
+        raise BackupError("cannot snapshot from inside a transaction (atomic block) on the same connection")
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"db-{_stamp()}.sqlite3{EXTENSIONS[compression]}")
+    tmp_path = path + ".tmp"
+
+    connection.ensure_connection()
+    target = sqlite3.connect(tmp_path)
+    try:
+        connection.connection.backup(target, pages=pages, sleep=sleep)
+        ok = target.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        target.close()
+    if ok != "ok":
+        os.remove(tmp_path)
+        raise BackupError(f"snapshot failed quick_check: {ok}")
+
+    checksum = _finish(tmp_path, path, compression)
+    return {"path": path, "bytes": os.path.getsize(path), "checksum": checksum,
+            "seconds": time.perf_counter() - started}
+
+
+def _dump_models(app_labels=None):
+    if app_labels:
+        models = [m for label in app_labels for m in apps.get_app_config(label).get_models()]
+    else:
+        models = list(apps.get_models())
+    models = [m for m in models if m._meta.label_lower not in JSONL_EXCLUDE
+              and m._meta.managed and not m._meta.proxy]
+    # ترتیب وابستگی کلیدهای خارجی (مثل dumpdata) تا loaddata بدون خطا بخواند
+    return serializers.sort_dependencies([(None, models)], allow_cycles=True)
+
+
+def iter_jsonl(models, *, using=DEFAULT_DB_ALIAS, chunk_size=2000, stats=None):
+    """
+    خطوط JSONL (قالب سریالایزر jsonl جنگو: model / pk / fields) با values_list، بدون ساخت آبجکت.
+    stats: دیکشنری اختیاری؛ {label: تعداد} در آن پر می‌شود
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for model in models:
+        opts = model._meta
+        fields = [f for f in opts.local_concrete_fields if f.serialize]  # کلید اصلی serialize=False است
+        m2m = {}
+        for f in opts.many_to_many:
+            if f.serialize and f.remote_field.through._meta.auto_created:
+                through = f.remote_field.through
+                pairs = through.objects.using(using).order_by().values_list(
+                    f.m2m_field_name() + "_id", f.m2m_reverse_field_name() + "_id")
+                m2m[f.name] = grouped = {}
+                for owner, target in pairs.iterator(chunk_size=chunk_size):
+                    grouped.setdefault(owner, []).append(target)
+
+        rows = model._base_manager.using(using).order_by("pk").values_list("pk", *[f.attname for f in fields])
+        count = 0
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            data = {f.name: v for f, v in zip(fields, values)}
+            for name, grouped in m2m.items():
+                data[name] = grouped.get(pk, [])
+            count += 1
+            yield encoder.encode({"model": opts.label_lower, "pk": pk, "fields": data}) + "\n"
+        if stats is not None:
+            stats[opts.label_lower] = count
+
+
+@contextmanager
+def _read_snapshot(using):
+    """
+    یک نمای سازگار از کل دیتابیس برای خواندن، بدون گرفتن قفل نوشتن.
+    - SQLite: BEGIN معمولی (DEFERRED)؛ transaction.atomic با transaction_mode=IMMEDIATE قفل نوشتن را
+      تا پایان dump نگه می‌داشت و ثبت‌های هم‌زمان با «database is locked» خطا می‌دادند
+    - PostgreSQL: REPEATABLE READ READ ONLY (در READ COMMITTED هر کوئری نمای خودش را دارد)
+    - داخل تراکنش فراخواننده: همان تراکنش
+    """
+    connection = connections[using]
+    if connection.in_atomic_block:
+        yield
+        return
+    if connection.vendor == "sqlite":
+        connection.ensure_connection()
+        # اتصال جنگو در autocommit است (isolation_level=None) → BEGIN دستی همان تراکنش DEFERRED است
+        connection.connection.execute("BEGIN")
+        try:
+            yield
+        finally:
+            connection.connection.execute("ROLLBACK")
+        return
+    with transaction.atomic(using=using):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        yield
+
+
+def dump_jsonl(directory, *, using=DEFAULT_DB_ALIAS, compression="gzip", app_labels=None, chunk_size=2000):
+    """
+    خروجی JSONL قابل خواندن با loaddata در directory (dump-<زمان>.jsonl[.gz|.zst]).
+    خروجی: {"path", "bytes", "checksum", "seconds", "rows": {label: n}}
+    """
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"dump-{_stamp()}.jsonl{EXTENSIONS[compression]}")
+    stats = {}
+    raw = hashlib.sha256()
+    try:
+        with _read_snapshot(using), _open_compressed(path + ".part", compression) as f:
+            for line in iter_jsonl(_dump_models(app_labels), using=using, chunk_size=chunk_size, stats=stats):
+                data = line.encode("utf-8")
+                raw.update(data)
+                f.write(data)
+        os.replace(path + ".part", path)
+    finally:
+        if os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+    _check_roundtrip(path, compression, raw.hexdigest())
+    checksum = _write_checksum(path)
+    return {"path": path, "bytes": os.path.getsize(path), "checksum": checksum,
+            "seconds": time.perf_counter() - started, "rows": stats}
+
+
+def backups(directory, prefix):
+    """فایل‌های پشتیبان یک نوع (db- یا dump-)، جدیدترین اول."""
+    if not os.path.isdir(directory):
+        return []
+    names = [n for n in os.listdir(directory)
+             if n.startswith(prefix) and not n.endswith((".sha256", ".part", ".tmp"))]
+    return sorted((os.path.join(directory, n) for n in names), reverse=True)
+
+
+def rotate(directory, prefix, keep, keep_days=None):
+    """
+    حذف پشتیبان‌های قدیمی یک نوع: keep تای آخر همیشه می‌مانند؛
+    اگر keep_days داده شود بقیه تا آن تعداد روز هم می‌مانند. خروجی: مسیرهای حذف‌شده
+    """
+    cutoff = time.time() - timedelta(days=keep_days).total_seconds() if keep_days else None
+    removed = []
+    for path in backups(directory, prefix)[keep:]:
+        if cutoff is not None and os.path.getmtime(path) >= cutoff:
+            continue
+        for p in (path, path + ".sha256"):
+            if os.path.exists(p):
+                os.remove(p)
+        removed.append(path)
+    return removed
+
+
+def restore_snapshot(path, target_path):
+    """بازکردن یک snapshot (فشرده یا نه) در target_path بعد از بررسی checksum."""
+    verify(path)
+    compression = next((c for c, ext in EXTENSIONS.items() if ext and path.endswith(ext)), "none")
+    with _open_compressed(path, compression, "rb") as src, open(target_path, "wb") as dst:
+        for block in iter(lambda: src.read(CHUNK), b""):
+            dst.write(block)
+    return target_path
@@ -0,0 +1,153 @@
+# ledger/services/balances.py
+"""
+مانده‌ی طرف حساب‌ها:
+- مانده‌ی جاری روی خود تراکنش‌ها (Transaction.running_balance)؛
+  مانده‌ی فعلی هر طرف حساب = running_balance آخرین تراکنشش به ترتیب (date_miladi, id)
+- جدول خلاصه‌ی PartyBalance (جمع فروش/دریافت/خرید/پرداخت) برای لیست‌ها و گزارش‌ها
+"""
+from django.db import connection, transaction
+from django.db.models import Q, F, Sum, Max, Case, When, Value, BigIntegerField
+from django.db.models.functions import Coalesce, Greatest
+from ledger import viewcache
+from ledger.models import CHRONO, CHRONO_DESC, Party, PartyBalance, Transaction, OP_SELL, OP_USE, OP_PAY, OP_BUY, OP_RCV
+
+# اثر هر عملیات روی مانده‌ی طرف حساب (فروش/مصرف/پرداخت +، خرید/دریافت −)
+SIGN = {OP_SELL: 1, OP_USE: 1, OP_PAY: 1, OP_BUY: -1, OP_RCV: -1}
+
+
+def party_delta(op_type, total_price):
+    return SIGN.get(op_type, 0) * int(total_price or 0)
+
+
+def _save_running(changes, batch_size=2000):
+    """ذخیره‌ی {tx_id: running_balance} با یک UPDATE آماده و executemany."""
+    if not changes:
+        return
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    sql = f"UPDATE {table} SET running_balance = %s WHERE id = %s"
+    params = [(bal, tx_id) for tx_id, bal in changes.items()]
+    with connection.cursor() as cursor:
+        for k in range(0, len(params), batch_size):
+            cursor.executemany(sql, params[k:k + batch_size])
+
+
+def refresh_party(party_id, since=None):
+    """
+    بازمحاسبه‌ی running_balance ردیف‌های یک طرف حساب از since=(date_miladi, id) به بعد.
+    - since=None (یا تاریخ خالی) یعنی کل تاریخچه
+    - فقط ردیف‌هایی که مانده‌شان واقعاً عوض شده ذخیره می‌شوند
+    خروجی: {tx_id: running_balance} ردیف‌های تغییرکرده
+    """
+    qs = Transaction.objects.filter(party_id=party_id)
+    balance = 0
+
+    if since is not None and since[0] is not None:
+        d, i = since
+        # ردیف‌های بدون تاریخ در ترتیب صعودی اول می‌آیند
+        prev = (qs.filter(Q(date_miladi__lt=d) | Q(date_miladi=d, id__lt=i) | Q(date_miladi__isnull=True))
+                  .order_by(*CHRONO_DESC)
+                  .values_list("running_balance")
+                  .first())
+        # اگر ردیف قبلی هنوز مانده ندارد → کل تاریخچه
+        if prev is None or prev[0] is not None:
+            balance = prev[0] if prev else 0
+            qs = qs.filter(Q(date_miladi__gt=d) | Q(date_miladi=d, id__gte=i))
+
+    changes = {}
+    rows = qs.order_by(*CHRONO).values_list("id", "op_type", "total_price", "running_balance")
+    for tx_id, op, total, current in rows.iterator(chunk_size=2000):
+        balance += party_delta(op, total)
+        if current != balance:
+            changes[tx_id] = balance
+
+    _save_running(changes)
+    return changes
+
+
+def refresh_parties(since_by_party):
+    """
+    since_by_party: {party_id: (date_miladi, id) یا None}
+    (یا فقط مجموعه‌ای از party_id ها برای بازمحاسبه‌ی کامل)
+    خروجی: {tx_id: running_balance} همه‌ی ردیف‌های تغییرکرده
+    """
+    if not isinstance(since_by_party, dict):
+        since_by_party = dict.fromkeys(since_by_party)
+    changes = {}
+    for party_id in sorted(p for p in since_by_party if p is not None):
+        changes.update(refresh_party(party_id, since_by_party[party_id]))
+    return changes
+
+
+# ستون‌های جمع در PartyBalance برای هر عملیات
+SUMMARY_FIELD = {OP_SELL: "total_sell", OP_RCV: "total_rcv", OP_BUY: "total_buy", OP_PAY: "total_pay"}
+
+
+def _summary_balance(total_sell, total_rcv, total_buy, total_pay):
+    return (total_sell - total_rcv) - (total_buy - total_pay)
+
+
+def add_to_summary(txs):
+    """افزودن تراکنش‌های تازه ثبت‌شده به PartyBalance (یک UPDATE برای هر طرف حساب)."""
+    acc = {}
+    for tx in txs:
+        if tx.party_id is None:
+            continue
+        sums, last = acc.setdefault(tx.party_id, ({f: 0 for f in SUMMARY_FIELD.values()}, [None]))
+        field = SUMMARY_FIELD.get(tx.op_type)
+        if field:
+            sums[field] += int(tx.total_price or 0)
+        if tx.date_miladi is not None and (last[0] is None or tx.date_miladi > last[0]):
+            last[0] = tx.date_miladi
+
+    for party_id in sorted(acc):
+        sums, (last_date,) = acc[party_id]
+        delta = _summary_balance(**sums)
+        updates = {f: F(f) + v for f, v in sums.items() if v}
+        if delta:
+            updates["balance"] = F("balance") + delta
+        if last_date is not None:
+            # Greatest با NULL در SQLite خروجی NULL می‌دهد
+            updates["last_tx_date"] = Coalesce(Greatest(F("last_tx_date"), Value(last_date)), Value(last_date))
+        summary = PartyBalance.objects.filter(party_id=party_id)
+        found = summary.update(**updates) if updates else summary.exists()
+        if not found:
+            PartyBalance.objects.create(party_id=party_id, balance=delta, last_tx_date=last_date, **sums)
+
+
+@transaction.atomic
+def rebuild_summary(party_ids=None):
+    """
+    بازسازی PartyBalance با یک GROUP BY روی تراکنش‌ها (کل یا فقط party_ids).
+    خروجی: تعداد ردیف‌های خلاصه
+    """
+    qs = Transaction.objects.filter(party_id__in=Party.objects.values("id"))
+    summaries = PartyBalance.objects.all()
+    if party_ids is not None:
+        party_ids = [p for p in party_ids if p is not None]
+        qs = qs.filter(party_id__in=party_ids)
+        summaries = summaries.filter(party_id__in=party_ids)
+
+    def total(op):
+        return Coalesce(Sum(Case(When(op_type=op, then=F("total_price")), default=0,
+                                 output_field=BigIntegerField())), 0)
+
+    rows = (qs.order_by().values("party_id")
+              .annotate(**{field: total(op) for op, field in SUMMARY_FIELD.items()},
+                        last_tx_date=Max("date_miladi")))
+    objs = [
+        PartyBalance(balance=_summary_balance(r["total_sell"], r["total_rcv"], r["total_buy"], r["total_pay"]), **r)
+        for r in rows
+    ]
+    summaries.delete()
+    PartyBalance.objects.bulk_create(objs, batch_size=500)
+    viewcache.bump(viewcache.TX)
+    return len(objs)
+
+
+def resync_parties(party_ids):
+    """بازمحاسبه‌ی کامل مانده‌ی جاری و خلاصه‌ی چند طرف حساب (بعد از ویرایش/حذف خارج از مسیر ثبت)."""
+    party_ids = {p for p in party_ids if p is not None}
+    if not party_ids:
+        return
+    refresh_parties(party_ids)
+    rebuild_summary(party_ids)
@@ -0,0 +1,292 @@
+# ledger/services/cogs.py
+"""
+هسته‌ی بازپخش COGS روی ردیف‌های فشرده (تاپل)، بدون آبجکت ORM و بدون دسترسی به دیتابیس.
+سیاست‌ها: FIFO (به‌همراه منطق کالای امانی)، LPP (آخرین قیمت خرید) و AVG (میانگین موزون).
+post_stock_tx، دستور rebuild_inventory (حتی داخل پروسس‌های جدا) و recalc.py همه از همین استفاده می‌کنند.
+"""
+from collections import deque, namedtuple
+from datetime import date as _date
+from ledger.models import OP_BUY, OP_SELL, OP_USE
+
+# با هر تغییر در ساختار وضعیت ذخیره‌شده بالا برود (وضعیت‌های قدیمی → بازپخش کامل)
+STATE_VERSION = 3
+
+# ستون‌های هر ردیف ورودی، به همین ترتیب
+ROW_FIELDS = ("id", "op_type", "qty", "unit_price", "date_miladi", "cogs", "is_cogs_temp")
+
+# تنظیمات کالا که روی COGS اثر دارند
+CostParams = namedtuple("CostParams", "is_consignment commission_amount commission_percent")
+
+
+def params_of(item):
+    return CostParams(bool(item.is_consignment), item.commission_amount, item.commission_percent)
+
+
+def signature(params, policy="FIFO"):
+    # اگر سیاست یا امانی بودن/کمیسیون کالا عوض شود، وضعیت ذخیره‌شده دیگر معتبر نیست
+    return f"{STATE_VERSION}:{policy}:{int(params.is_consignment)}:{params.commission_amount or 0}:{params.commission_percent or 0}"
+
+
+class ReplayState:
+    """وضعیت بازپخش یک کالا بعد از یک تراکنش مشخص (قابل ذخیره به‌صورت JSON)."""
+    __slots__ = ("layers", "last_buy_price", "buy_date", "dated_buy_price", "prior_buy_price",
+                 "qty", "avg_cost", "rows", "pos")
+
+    def __init__(self):
+        # هر لایه: [qty, unit_price, tx_id, cogs]
+        # tx_id و cogs (COGS جاریِ همان فروش) فقط برای لایه‌های منفی (فروش‌های موقت) پر می‌شوند
+        self.layers = deque()
+        self.last_buy_price = None  # آخرین قیمت خریدِ دیده‌شده در بازپخش
+        # برای «آخرین خرید با تاریخ اکیداً قبل از X» (بدون کوئری جدا برای هر ردیف):
+        self.buy_date = None         # تاریخ آخرین خرید تاریخ‌دار
+        self.dated_buy_price = None  # قیمت آخرین خرید در همان تاریخ
+        self.prior_buy_price = None  # قیمت آخرین خرید در تاریخ‌های قبل از buy_date
+        self.qty = 0                # موجودی جاری امانی/LPP/AVG (برای FIFO از جمع لایه‌ها)
+        self.avg_cost = 0           # میانگین موزون (فقط AVG/LPP)
+        self.rows = 0               # تعداد تراکنش‌های بازپخش‌شده از ابتدای تاریخچه
+        self.pos = None             # (date_miladi, id) آخرین تراکنش بازپخش‌شده
+
+    def to_json(self, sig):
+        date, tx_id = self.pos if self.pos else (None, None)
+        return {
+            "sig": sig,
+            "pos": [date.isoformat() if date else None, tx_id],
+            "rows": self.rows,
+            "qty": self.qty,
+            "avg": self.avg_cost,
+            "last_buy": self.last_buy_price,
+            "buy": [self.buy_date.isoformat() if self.buy_date else None, self.dated_buy_price, self.prior_buy_price],
+            "layers": [list(l) for l in self.layers],
+        }
+
+    @classmethod
+    def from_json(cls, data, sig):
+        if not data or data.get("sig") != sig:
+            return None
+        state = cls()
+        date, tx_id = data["pos"]
+        if tx_id is not None:
+            state.pos = (_date.fromisoformat(date) if date else None, tx_id)
+        state.rows = data["rows"]
+        state.qty = data["qty"]
+        state.avg_cost = data["avg"]
+        state.last_buy_price = data["last_buy"]
+        buy_date, state.dated_buy_price, state.prior_buy_price = data["buy"]
+        state.buy_date = _date.fromisoformat(buy_date) if buy_date else None
+        state.layers = deque(list(l) for l in data["layers"])
+        return state
+
+    def note_buy(self, date, price):
+        self.last_buy_price = price
+        if date is None:
+            return  # خرید بدون تاریخ در «خرید قبل از تاریخ X» دیده نمی‌شود
+        if self.buy_date != date:
+            # ردیف‌ها به ترتیب تاریخ می‌آیند؛ روز جدید → خرید روز قبلی «قبلی» می‌شود
+            self.prior_buy_price = self.dated_buy_price
+            self.buy_date = date
+        self.dated_buy_price = price
+
+    def buy_price_before(self, date):
+        """قیمت آخرین خرید با date_miladi < date (معادل فیلتر date_miladi__lt)؛ اگر نباشد None."""
+        if self.buy_date is None or date is None:
+            return None
+        if self.buy_date < date:
+            return self.dated_buy_price
+        return self.prior_buy_price
+
+
+def _step_consignment(state, final, tx_id, op, q, up, date, params):
+    if op == OP_BUY:
+        state.qty += q
+        state.note_buy(date, up)
+        final[tx_id] = (None, False)
+    elif op == OP_SELL:
+        state.qty -= q
+        # فروش امانی: COGS = (unit_price - کمیسیون) * qty
+        commission = 0
+        if params.commission_amount:
+            commission = params.commission_amount
+        elif params.commission_percent:
+            commission = int(up * params.commission_percent / 100)
+
+        if up == 0:
+            # اگر خریدی قبلش نبوده → 0 (یا هشدار چون ما قبل از خرید کالایی رو فروختیم)
+            last_buy = state.buy_price_before(date)
+            final[tx_id] = ((last_buy or 0) * q, False)
+        else:
+            final[tx_id] = ((up - commission) * q, False)
+    elif op == OP_USE:
+        state.qty -= q
+        last_buy = state.buy_price_before(date)
+        final[tx_id] = ((last_buy or 0) * q, False)
+
+
+def _step_fifo(state, final, tx_id, op, q, up, date, params):
+    layers = state.layers
+
+    if op == OP_BUY:
+        buy_qty = q
+
+        # ابتدا قدیمی‌ترین منفی‌ها را پوشش بده و COGS فروش‌هایشان را اصلاح کن
+        while buy_qty > 0 and layers and layers[0][0] < 0:
+            neg = layers[0]
+            neg_qty, neg_price, neg_id, neg_cogs = neg
+            cover = min(buy_qty, -neg_qty)
+
+            # COGS جدید = قدیمی - (cover * neg_price) + (cover * up)
+            neg_cogs = int(neg_cogs or 0) - cover * int(neg_price) + cover * up
+
+            # اگر کامل پوشش داده شد → دیگر موقت نیست
+            if neg_qty + cover == 0:
+                final[neg_id] = (neg_cogs, False)
+                layers.popleft()
+            else:
+                # پوشش جزئی: temp باقی می‌ماند، فقط مقدار باقی‌مانده منفی کم می‌شود
+                neg[0] = neg_qty + cover
+                neg[3] = neg_cogs
+                final[neg_id] = (neg_cogs, True)
+
+            buy_qty -= cover
+
+        # باقی‌مانده خرید → لایه مثبت
+        if buy_qty > 0:
+            layers.append([buy_qty, up, None, None])
+
+        state.note_buy(date, up)
+
+        # خرید COGS ندارد
+        final[tx_id] = (None, False)
+
+    elif op in (OP_SELL, OP_USE):
+        sell_qty = q
+        cogs_val = 0
+
+        # مصرف از لایه‌های مثبت (FIFO)
+        while sell_qty > 0 and layers and layers[0][0] > 0:
+            layer = layers[0]
+            use = min(sell_qty, layer[0])
+            cogs_val += use * int(layer[1])
+            sell_qty -= use
+            if layer[0] == use:
+                layers.popleft()
+            else:
+                layer[0] -= use
+
+        # اگر هنوز فروش باقی مانده → موجودی منفی
+        if sell_qty > 0:
+            # قیمت پایه برای بخش منفی:
+            # 1) اگر قبلاً خریدی دیده‌ایم → last_buy_price
+            # 2) وگرنه (هیچ خریدی تا کنون نبوده) → قیمت فروش
+            # صف همیشه یا تماماً مثبت است یا تماماً منفی (خرید اول منفی‌ها را می‌پوشاند)،
+            # پس این‌جا لایه‌ی مثبتی نمانده و نیازی به پیمایش صف نیست
+            if state.last_buy_price is not None:
+                base_price = int(state.last_buy_price)
+            else:
+                base_price = up  # اولین فروش‌ها قبل از هر خرید
+
+            cogs_val += sell_qty * base_price
+            # منفی را به انتهای صف اضافه کن تا خریدهای بعدی FIFO پوشش دهند
+            layers.append([-sell_qty, base_price, tx_id, cogs_val])
+            final[tx_id] = (cogs_val, True)
+        else:
+            final[tx_id] = (cogs_val, False)
+
+    else:
+        # دریافت/پرداخت و ...: COGS ندارد
+        final[tx_id] = (None, False)
+
+
+def _moving_buy(state, q, up):
+    # میانگین موزون موجودی (Moving Average) + آخرین قیمت خرید
+    new_qty = state.qty + q
+    if new_qty > 0:
+        state.avg_cost = int((state.qty * state.avg_cost + q * up) / new_qty)
+    state.qty = new_qty
+    state.last_buy_price = up
+
+
+def _step_lpp(state, final, tx_id, op, q, up, date, params):
+    if op == OP_BUY:
+        _moving_buy(state, q, up)
+        final[tx_id] = (None, False)
+    elif op in (OP_SELL, OP_USE):
+        # COGS = آخرین قیمت خرید × تعداد
+        final[tx_id] = ((state.last_buy_price or 0) * q, False)
+        state.qty -= q
+    else:
+        final[tx_id] = (None, False)
+
+
+def _step_avg(state, final, tx_id, op, q, up, date, params):
+    if op == OP_BUY:
+        _moving_buy(state, q, up)
+        final[tx_id] = (None, False)
+    elif op in (OP_SELL, OP_USE):
+        # COGS = میانگین موزون × تعداد
+        final[tx_id] = (state.avg_cost * q, False)
+        state.qty -= q
+    else:
+        final[tx_id] = (None, False)
+
+
+# سیاست‌های قابل انتخاب؛ در FIFO کالای امانی منطق امانی خودش را دارد
+FIFO, LPP, AVG = "FIFO", "LPP", "AVG"
+POLICIES = {
+    FIFO: _step_fifo,
+    LPP:  _step_lpp,
+    AVG:  _step_avg,
+}
+
+
+def _step_for(params, policy):
+    if policy == FIFO and params.is_consignment:
+        return _step_consignment
+    return POLICIES[policy]
+
+
+def replay(rows, state, params, checkpoint_every=0, policy=FIFO):
+    """
+    بازپخش ردیف‌های یک کالا با سیاست policy (FIFO / LPP / AVG).
+    - rows: تاپل‌های ROW_FIELDS مرتب بر اساس (date_miladi, id)
+    - state: وضعیت شروع (ReplayState() یا از چک‌پوینت)؛ درجا جلو می‌رود
+    خروجی: (changes, checkpoints)
+    - changes: {id: (cogs, is_cogs_temp)} فقط ردیف‌هایی که مقدارشان واقعاً عوض شده
+    - checkpoints: [(date_miladi, id, state_json)] هر checkpoint_every ردیف یک‌بار
+    """
+    sig = signature(params, policy)
+    step = _step_for(params, policy)
+
+    original = {}   # مقدار فعلی (cogs, is_cogs_temp) ردیف‌های خوانده‌شده
+    final = {}      # مقدار نهایی بعد از بازپخش
+    checkpoints = []
+
+    for tx_id, op, q, up, date, cogs, is_temp in rows:
+        original[tx_id] = (cogs, is_temp)
+        step(state, final, tx_id, op, int(q or 0), int(up or 0), date, params)
+
+        state.rows += 1
+        state.pos = (date, tx_id)
+        if checkpoint_every and state.rows % checkpoint_every == 0 and date is not None:
+            checkpoints.append((date, tx_id, state.to_json(sig)))
+
+    changes = {tx_id: val for tx_id, val in final.items() if original.get(tx_id) != val}
+    return changes, checkpoints
+
+
+def inventory_snapshot(state, params, policy=FIFO):
+    """(qty, last_buy_cost) اسنپ‌شات موجودی بعد از بازپخش."""
+    if _step_for(params, policy) is not _step_fifo:
+        return state.qty, state.last_buy_price or 0
+
+    # اسنپ‌شات موجودی از روی لایه‌ها
+    qty = sum(l[0] for l in state.layers)
+
+    # آخرین قیمت خرید
+    last_buy_cost = 0
+    for lqty, lprice, _, _ in reversed(state.layers):
+        if lqty > 0:
+            last_buy_cost = int(lprice)
+            break
+    if last_buy_cost == 0 and state.last_buy_price is not None:
+        last_buy_cost = int(state.last_buy_price)
+    return qty, last_buy_cost
@@ -0,0 +1,84 @@
+# ledger/services/export.py
+"""
+خروجی CSV/XLSX تراکنش‌ها با حافظه‌ی ثابت:
+- ردیف‌ها با values_list و iterator(chunk_size) خوانده می‌شوند (بدون ساخت آبجکت مدل)
+- CSV خط به خط تولید می‌شود (StreamingHttpResponse یا فایل)
+- XLSX با Workbook(write_only=True) نوشته می‌شود (openpyxl ردیف‌ها را در فایل موقت نگه می‌دارد نه حافظه)
+"""
+import csv
+import time
+
+from openpyxl import Workbook
+
+from ledger.models import CHRONO, OP_CHOICES
+
+CHUNK_SIZE = 2000
+
+# (عنوان ستون، فیلد values_list)
+COLUMNS = [
+    ("شناسه", "id"),
+    ("تاریخ", "date_shamsi"),
+    ("تاریخ میلادی", "date_miladi"),
+    ("نوع عملیات", "op_type"),
+    ("طرف حساب", "party__name"),
+    ("کالا", "item__name"),
+    ("تعداد", "qty"),
+    ("قیمت واحد", "unit_price"),
+    ("مبلغ کل", "total_price"),
+    ("قیمت تمام شده", "cogs"),
+    ("COGS موقت", "is_cogs_temp"),
+    ("روش پرداخت", "payment_method"),
+    ("توضیحات", "description"),
+]
+HEADER = [title for title, _ in COLUMNS]
+_OP_LABELS = dict(OP_CHOICES)
+
+
+def export_rows(qs, chunk_size=CHUNK_SIZE):
+    """ردیف‌های خروجی به ترتیب (date_miladi, id)؛ تاریخ شمسی از jy/jm/jd (هم‌شکل)."""
+    fields = [f for _, f in COLUMNS] + ["jy", "jm", "jd"]
+    rows = qs.order_by(*CHRONO).values_list(*fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        *row, jy, jm, jd = row
+        if jy:
+            row[1] = f"{jy:04d}/{jm:02d}/{jd:02d}"
+        row[3] = _OP_LABELS.get(row[3], row[3])
+        yield row
+
+
+class _Echo:
+    """شبه‌فایل برای csv.writer: هر خط را برمی‌گرداند به‌جای نوشتن."""
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, stats=None):
+    """
+    خطوط CSV (با BOM تا اکسل فارسی را درست باز کند).
+    stats: دیکشنری اختیاری؛ rows و seconds در پایان پر می‌شوند
+    """
+    started = time.perf_counter()
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(HEADER)
+    count = 0
+    for row in rows:
+        count += 1
+        yield writer.writerow(row)
+    if stats is not None:
+        stats.update(rows=count, seconds=time.perf_counter() - started)
+
+
+def write_xlsx(rows, fileobj, stats=None):
+    """نوشتن ردیف‌ها در fileobj به‌صورت xlsx (write-only)."""
+    started = time.perf_counter()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("تراکنش‌ها")
+    ws.sheet_view.rightToLeft = True
+    ws.append(HEADER)
+    count = 0
+    for row in rows:
+        count += 1
+        ws.append(row)
+    wb.save(fileobj)
+    if stats is not None:
+        stats.update(rows=count, seconds=time.perf_counter() - started)
@@ -0,0 +1,67 @@
+# ledger/services/parties.py
+"""
+نقش طرف حساب‌ها (مشتری/فروشنده) از روی تاریخچه‌ی تراکنش‌ها و حذف طرف حساب‌های بدون تراکنش.
+همه set-based روی ایندکس (party, op_type): هیچ طرف حسابی در پایتون خوانده نمی‌شود
+→ برای اجرای شبانه روی داده‌ی بزرگ هم مناسب است (sync_party_roles)
+"""
+import time
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, OuterRef, Q
+from ledger import viewcache
+from ledger.models import Party, PartyBalance, Transaction, OP_SELL, OP_RCV, OP_USE, OP_BUY, OP_PAY
+
+CUSTOMER_OPS = (OP_SELL, OP_RCV, OP_USE)
+SUPPLIER_OPS = (OP_BUY, OP_PAY)
+
+
+def _has_tx(ops=None):
+    qs = Transaction.objects.filter(party_id=OuterRef("pk"))
+    if ops is not None:
+        qs = qs.filter(op_type__in=ops)
+    return Exists(qs)
+
+
+def role_flags():
+    """(is_customer, is_supplier) هر طرف حساب به‌صورت عبارت SQL؛ بدون هیچ‌کدام → مشتری."""
+    is_supplier = _has_tx(SUPPLIER_OPS)
+    is_customer = ExpressionWrapper(Q(_has_tx(CUSTOMER_OPS)) | ~Q(is_supplier), output_field=BooleanField())
+    return is_customer, is_supplier
+
+
+def _prune_orphans():
+    """یک DELETE برای طرف حساب‌های بدون تراکنش (خلاصه‌ی کهنه‌ی آن‌ها قبلش پاک می‌شود)."""
+    qn = connection.ops.quote_name
+    party, tx, summary = (qn(m._meta.db_table) for m in (Party, Transaction, PartyBalance))
+    orphan = f"NOT EXISTS (SELECT 1 FROM {tx} WHERE {tx}.{qn('party_id')} = {party}.{qn('id')})"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {summary} WHERE {qn('party_id')} IN (SELECT {qn('id')} FROM {party} WHERE {orphan})"
+        )
+        cursor.execute(f"DELETE FROM {party} WHERE {orphan}")
+        return cursor.rowcount
+
+
+@transaction.atomic
+def sync_roles(prune=True):
+    """
+    - نقش طرف حساب‌های دارای تراکنش: فروش/دریافت/مصرف → مشتری، خرید/پرداخت → فروشنده
+      (حداکثر دو UPDATE، فقط ردیف‌هایی که واقعاً عوض می‌شوند)
+    - prune: طرف حساب‌های بدون هیچ تراکنشی حذف می‌شوند
+    خروجی: {"customers": n, "suppliers": n, "pruned": n, "seconds": s}
+    (customers/suppliers = تعداد ردیف‌هایی که همان پرچم‌شان اصلاح شد)
+    """
+    started = time.perf_counter()
+    is_customer, is_supplier = role_flags()
+    active = Party.objects.filter(_has_tx())
+
+    customers = (active.alias(flag=is_customer).exclude(is_customer=F("flag"))
+                       .update(is_customer=is_customer))
+    suppliers = (active.alias(flag=is_supplier).exclude(is_supplier=F("flag"))
+                       .update(is_supplier=is_supplier))
+    pruned = _prune_orphans() if prune else 0
+
+    if customers or suppliers or pruned:
+        viewcache.bump(viewcache.PARTIES)
+    return {"customers": customers, "suppliers": suppliers, "pruned": pruned,
+            "seconds": time.perf_counter() - started}
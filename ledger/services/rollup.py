@@ -0,0 +1,94 @@
+# ledger/services/rollup.py
+"""
+جمع روزانه‌ی فروش (DailySalesRollup) بر اساس روز شمسی (jy, jm, jd).
+- ثبت فروش/مصرف جدید: sales و rows اضافه می‌شوند (post_stock_txs)
+- هر تغییر COGS در بازپخش (از جمله اصلاح COGS موقت با خرید بعدی): فقط اختلاف COGS اعمال می‌شود (replay_item)
+"""
+from django.db import connection, transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import Coalesce
+from ledger import viewcache
+from ledger.models import DailySalesRollup, Transaction, OP_SELL, OP_USE
+
+# عملیات‌هایی که در گزارش فروش حساب می‌شوند
+SALE_OPS = (OP_SELL, OP_USE)
+
+
+def apply_rollup(deltas):
+    """
+    deltas: {(jy, jm, jd): [sales, cogs, rows]} اختلاف‌ها برای هر روز
+    همه‌ی روزها با یک INSERT ... ON CONFLICT DO UPDATE (افزایشی) و executemany
+    """
+    params = [(*day, *vals) for day, vals in sorted(deltas.items()) if any(vals)]
+    if not params:
+        return
+    qn = connection.ops.quote_name
+    table = qn(DailySalesRollup._meta.db_table)
+    key = ", ".join(qn(c) for c in ("jy", "jm", "jd"))
+    sums = [qn(c) for c in ("sales", "cogs", "rows")]
+    sql = (
+        f"INSERT INTO {table} ({key}, {', '.join(sums)}) VALUES (%s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT ({key}) DO UPDATE SET "
+        + ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in sums)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def add_sales(txs, deltas):
+    """sales/rows فروش‌های تازه ثبت‌شده را به deltas اضافه می‌کند (COGS آن‌ها از مسیر بازپخش می‌آید)."""
+    for tx in txs:
+        if tx.op_type in SALE_OPS and tx.jy is not None:
+            acc = deltas.setdefault((tx.jy, tx.jm, tx.jd), [0, 0, 0])
+            acc[0] += int(tx.total_price or 0)
+            acc[2] += 1
+    return deltas
+
+
+def add_cogs_changes(changes, sale_rows, deltas):
+    """
+    اختلاف COGS ردیف‌های فروش/مصرف را به deltas اضافه می‌کند.
+    changes: {tx_id: (cogs, is_cogs_temp)} خروجی بازپخش
+    sale_rows: {tx_id: (old_cogs, (jy, jm, jd))} ردیف‌های فروش/مصرفِ بازپخش‌شده
+    """
+    for tx_id, (cogs, _) in changes.items():
+        row = sale_rows.get(tx_id)
+        if row is None:
+            continue
+        old_cogs, day = row
+        diff = int(cogs or 0) - int(old_cogs or 0)
+        if diff and day[0] is not None:
+            deltas.setdefault(day, [0, 0, 0])[1] += diff
+    return deltas
+
+
+@transaction.atomic
+def rebuild_rollup(days=None):
+    """
+    بازسازی از روی تراکنش‌ها با یک GROUP BY (کل جدول یا فقط روزهای days).
+    خروجی: تعداد روزها
+    """
+    qs = Transaction.objects.filter(op_type__in=SALE_OPS, jy__isnull=False)
+    existing = DailySalesRollup.objects.all()
+    if days is not None:
+        days = {d for d in days if d and d[0] is not None}
+        if not days:
+            return 0
+        # بیشتر اوقات چند روز از یک ماه‌اند → فیلتر ماه + بررسی روز در پایتون
+        months = {(jy, jm) for jy, jm, _ in days}
+        qs = qs.filter(jy__in={m[0] for m in months}, jm__in={m[1] for m in months})
+        existing = existing.filter(jy__in={m[0] for m in months}, jm__in={m[1] for m in months})
+
+    rows = (qs.order_by().values("jy", "jm", "jd")
+              .annotate(sales=Coalesce(Sum("total_price"), 0), cogs=Coalesce(Sum("cogs"), 0), rows=Count("id")))
+    objs = [DailySalesRollup(**r) for r in rows
+            if days is None or (r["jy"], r["jm"], r["jd"]) in days]
+
+    if days is None:
+        existing.delete()
+    else:
+        for jy, jm, jd in days:
+            existing.filter(jy=jy, jm=jm, jd=jd).delete()
+    DailySalesRollup.objects.bulk_create(objs, batch_size=500)
+    viewcache.bump(viewcache.TX)
+    return len(objs)
@@ -0,0 +1,46 @@
+# ledger/services/search.py
+"""
+ستون‌های جستجوی نرمال‌شده (utils.normalize_search):
+- Item.search_name / Party.search_name با ایندکس → «شروع با» به‌صورت بازه روی ایندکس
+- Transaction.search_description (بدون ایندکس؛ همیشه همراه فیلترهای دیگر و صفحه‌بندی keyset خوانده می‌شود)
+روی save پر می‌شوند؛ این ماژول برای پر کردن/تطبیق ردیف‌های قدیمی یا bulk است.
+"""
+from django.db import connection
+from ledger import viewcache
+from ledger.models import Item, Party, Transaction
+from ledger.utils import normalize_search
+
+# {نام: (مدل، ستون اصلی، ستون جستجو)}
+SEARCH_COLUMNS = {
+    "items": (Item, "name", "search_name"),
+    "parties": (Party, "name", "search_name"),
+    "transactions": (Transaction, "description", "search_description"),
+}
+
+
+def refresh_search(model, source, target, batch_size=2000):
+    """
+    بازمحاسبه‌ی ستون جستجو؛ فقط ردیف‌هایی که مقدارشان عوض شده با یک UPDATE آماده و executemany نوشته می‌شوند.
+    خروجی: تعداد ردیف‌های اصلاح‌شده
+    """
+    qn = connection.ops.quote_name
+    sql = f"UPDATE {qn(model._meta.db_table)} SET {qn(target)} = %s WHERE id = %s"
+    rows = model.objects.order_by().values_list("id", source, target)
+
+    changed = 0
+    params = []
+    with connection.cursor() as cursor:
+        for pk, value, current in rows.iterator(chunk_size=batch_size):
+            normalized = normalize_search(value)
+            if normalized != current:
+                params.append((normalized, pk))
+            if len(params) >= batch_size:
+                cursor.executemany(sql, params)
+                changed += len(params)
+                params = []
+        if params:
+            cursor.executemany(sql, params)
+            changed += len(params)
+    if changed:
+        viewcache.bump(viewcache.TX, viewcache.ITEMS, viewcache.PARTIES)
+    return changed
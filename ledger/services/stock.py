@@ -1,30 +1,146 @@
 # ledger/services/stock.py
-from django.db import transaction
-from collections import deque
-from ledger.models import Transaction, Inventory, OP_BUY, OP_SELL, OP_USE
+from django.db import connection, transaction
+from django.db.models import Q
+from ledger.models import CHRONO, Item, Party, Transaction, Inventory, StockCheckpoint
+from ledger.services.cogs import ROW_FIELDS, ReplayState, params_of, signature, replay, inventory_snapshot
+from ledger.services.balances import refresh_parties, add_to_summary, rebuild_summary
+from ledger.services import rollup
+from ledger import viewcache
+
+# هر چند تراکنش یک‌بار، اسنپ‌شات میانی لایه‌ها ذخیره شود
+CHECKPOINT_EVERY = 500
+
+
+def _is_before(pos, key):
+    """
+    آیا موقعیت pos=(date, id) قبل از key است؟
+    اگر تاریخ یکی از دو طرف خالی باشد قابل مقایسه نیست → None
+    """
+    if pos is None:
+        return True
+    if pos[0] is None or key[0] is None:
+        return None
+    return pos < key
+
+
+def _start_state(item, inv, since, sig):
+    """
+    نقطه‌ی شروع بازپخش را پیدا می‌کند:
+    1) اگر تراکنش‌های تغییرکرده همه بعد از آخرین بازپخش باشند → ادامه از همان وضعیت (فقط افزودن)
+    2) وگرنه آخرین چک‌پوینتِ قبل از since (چک‌پوینت‌های بعدی حذف می‌شوند)
+    3) وگرنه بازپخش کامل از اولین تراکنش کالا
+    """
+    checkpoints = StockCheckpoint.objects.filter(item=item)
+
+    if since is not None:
+        head = ReplayState.from_json(inv.replay_state, sig)
+        if head is not None and _is_before(head.pos, since) is True:
+            return head
+
+        date, tx_id = since
+        if date is not None:
+            cp = (checkpoints
+                  .filter(Q(date_miladi__lt=date) | Q(date_miladi=date, tx_id__lt=tx_id))
+                  .order_by("-date_miladi", "-tx_id")
+                  .first())
+            state = ReplayState.from_json(cp.state, sig) if cp else None
+            if state is not None:
+                (checkpoints
+                 .filter(Q(date_miladi__gt=cp.date_miladi) | Q(date_miladi=cp.date_miladi, tx_id__gt=cp.tx_id))
+                 .delete())
+                return state
+
+    checkpoints.delete()
+    return ReplayState()
+
+
+def bulk_update_cogs(changes, batch_size=2000):
+    """
+    ذخیره‌ی {tx_id: (cogs, is_cogs_temp)} با یک UPDATE آماده و executemany
+    (bulk_update جنگو برای دسته‌های بزرگ CASE WHEN های طولانی می‌سازد و کند است).
+    """
+    if not changes:
+        return
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    sql = f"UPDATE {table} SET cogs = %s, is_cogs_temp = %s WHERE id = %s"
+    params = [(c, t, tx_id) for tx_id, (c, t) in changes.items()]
+    with connection.cursor() as cursor:
+        for k in range(0, len(params), batch_size):
+            cursor.executemany(sql, params[k:k + batch_size])
+
 
 @transaction.atomic
-def post_stock_tx(
-    *, date_shamsi, date_miladi, op_type, item=None, party=None,
-    qty=0, unit_price=0, total_price=0, payment_method=None, **extra
-):
+def replay_item(item, *, since=None, inv=None, sales_deltas=None):
     """
-    ثبت تراکنش + بازپخش کامل تاریخچه همان کالا با FIFO:
-    - COGS همه‌ی فروش‌ها (قدیمی و جدید) محاسبه/اصلاح می‌شود
-    - فروش‌های قبل از خرید: موقت با قیمت فروش و بعداً با خرید اصلاح می‌شوند
-    - اسنپ‌شات موجودی (qty/last_buy_cost) به‌روز می‌شود
+    بازپخش FIFO (یا امانی) تراکنش‌های یک کالا از نقطه‌ی since=(date_miladi, id) به بعد.
+    - since=None یعنی بازپخش کامل تاریخچه
+    - فقط ردیف‌هایی که COGS/موقت بودنشان واقعاً عوض شده ذخیره می‌شوند
+    - اسنپ‌شات موجودی (qty/last_buy_cost) و وضعیت لایه‌ها به‌روز می‌شود
+    - اختلاف COGS فروش‌ها در جمع روزانه‌ی فروش (DailySalesRollup) اعمال می‌شود
+      (اگر sales_deltas داده شود فقط به آن اضافه می‌شود تا فراخواننده یک‌جا اعمال کند)
+    خروجی: {tx_id: (cogs, is_cogs_temp)} ردیف‌های تغییرکرده
     """
-    qty = int(qty or 0)
-    unit_price = int(unit_price or 0)
-    total_price = int(total_price or 0)
+    if inv is None:
+        inv, _ = Inventory.objects.select_for_update().get_or_create(
+            item=item, defaults={"qty": 0, "last_buy_cost": 0}
+        )
+
+    params = params_of(item)
+    sig = signature(params)
+    state = _start_state(item, inv, since, sig)
+
+    qs = Transaction.objects.filter(item=item)
+    if state.pos is not None:
+        d, i = state.pos
+        qs = qs.filter(Q(date_miladi__gt=d) | Q(date_miladi=d, id__gt=i))
+    rows = qs.order_by(*CHRONO).values_list(*ROW_FIELDS, "jy", "jm", "jd")
+
+    # COGS قبلی و روز شمسی فروش‌ها برای اعمال اختلاف در جمع روزانه
+    sale_rows = {}
+
+    def _rows():
+        for row in rows.iterator(chunk_size=2000):
+            if row[1] in rollup.SALE_OPS:
+                sale_rows[row[0]] = (row[5], row[7:])
+            yield row[:7]
+
+    changes, checkpoints = replay(_rows(), state, params, CHECKPOINT_EVERY)
+
+    # فروش‌های قبل از نقطه‌ی شروع (COGS موقت که با خرید جدید تسویه شد) در sale_rows نیستند
+    missing = [tx_id for tx_id in changes if tx_id not in sale_rows]
+    for k in range(0, len(missing), 2000):
+        for tx_id, old_cogs, *day in (Transaction.objects
+                                      .filter(id__in=missing[k:k + 2000], op_type__in=rollup.SALE_OPS)
+                                      .values_list("id", "cogs", "jy", "jm", "jd")):
+            sale_rows[tx_id] = (old_cogs, tuple(day))
+
+    # فقط ردیف‌هایی که واقعاً تغییر کرده‌اند را ذخیره کن
+    bulk_update_cogs(changes)
+    if sales_deltas is None:
+        rollup.apply_rollup(rollup.add_cogs_changes(changes, sale_rows, {}))
+    else:
+        rollup.add_cogs_changes(changes, sale_rows, sales_deltas)
+    if checkpoints:
+        StockCheckpoint.objects.bulk_create([
+            StockCheckpoint(item=item, date_miladi=d, tx_id=i, state=s) for d, i, s in checkpoints
+        ])
 
-    # قفل موجودی کالا
-    inv, _ = Inventory.objects.select_for_update().get_or_create(
-        item=item, defaults={"qty": 0, "last_buy_cost": 0}
-    )
+    inv.qty, inv.last_buy_cost = inventory_snapshot(state, params)
+    inv.replay_state = state.to_json(sig)
+    inv.save(update_fields=["qty", "last_buy_cost", "replay_state"])
+
+    return changes
 
-    # 1) ابتدا تراکنش جدید را بسازیم (با cogs=None) تا در بازپخش لحاظ شود
-    new_tx = Transaction.objects.create(
+
+def _build_tx(
+    *, date_shamsi, date_miladi, op_type, item=None, party=None,
+    qty=0, unit_price=0, total_price=0, payment_method=None, **extra
+):
+    # ردیف‌های کالایی همیشه عدد صحیح دارند؛ دریافت/پرداخت همان مقدار ورودی را نگه می‌دارند
+    if item is not None:
+        qty = int(qty or 0)
+        unit_price = int(unit_price or 0)
+    tx = Transaction(
         date_shamsi=date_shamsi,
         date_miladi=date_miladi,
         op_type=op_type,
@@ -32,198 +148,223 @@ def post_stock_tx(
         party=party,
         qty=qty,
         unit_price=unit_price,
-        total_price=total_price,
+        total_price=int(total_price or 0),
         payment_method=payment_method,
         cogs=None,
         is_cogs_temp=False,
         **extra
     )
+    tx.fill_jdate()
+    tx.fill_search()
+    return tx
 
-    # 2) بازپخش کل تاریخچه همان کالا (همراهِ تراکنش جدید)
-    qs = (Transaction.objects
-          .filter(item=item)
-          .order_by("date_miladi", "id")
-          .all())
-
-    is_consignment = getattr(item, "is_consignment", False)
-
-    # هر لایه: [qty, unit_price, tx_ref]
-    # tx_ref فقط برای لایه‌های منفی (فروش‌های موقت) نگه داشته می‌شود
-    layers = deque()
-    changed_txs = []
-
-    last_buy_price = None  # آخرین قیمت خریدِ دیده‌شده در بازپخش
-
-    if is_consignment:
-        inv.qty = 0
-
-    for tx in qs:
-        op = tx.op_type
-        q  = int(tx.qty or 0)
-        up = int(tx.unit_price or 0)
-
-        if is_consignment:
-            if op == OP_BUY:
-                inv.qty += q
-                tx.cogs = None
-                last_buy_price = up
-            elif op == OP_SELL:
-                inv.qty -= q
-                # فروش امانی: COGS = (unit_price - کمیسیون) * qty
-                commission = 0
-                if tx.item.commission_amount:
-                    commission = tx.item.commission_amount
-                elif tx.item.commission_percent:
-                    commission = int(tx.unit_price * tx.item.commission_percent / 100)
-
-                if up == 0:
-                    last_buy_tx = (
-                        Transaction.objects
-                        .filter(item=tx.item, op_type=OP_BUY, date_miladi__lt=tx.date_miladi)
-                        .order_by("-date_miladi", "-id")
-                        .first()
-                    )
-                    if last_buy_tx:
-                        tx.cogs = (last_buy_tx.unit_price) * q
-                    else:
-                        tx.cogs = 0  # یا هشدار چون ما قبل از خرید کالایی رو فروختیم
-                else:
-                    tx.cogs = (up - commission) * q
-
-            elif op == OP_USE:
-                inv.qty -= q
-
-                last_buy_tx = (
-                    Transaction.objects
-                    .filter(item=tx.item, op_type=OP_BUY, date_miladi__lt=tx.date_miladi)
-                    .order_by("-date_miladi", "-id")
-                    .first()
-                )
-                if last_buy_tx:
-                    tx.cogs = (last_buy_tx.unit_price or 0) * q
-                else:
-                    tx.cogs = 0  # یا هشدار چون ما قبل از خرید کالایی رو استفاده/هدیه دادیم
-
-            else:
-                continue
-
-            tx.is_cogs_temp = False
-            changed_txs.append(tx)
-            # ❗ بعد از انجام منطق امانی، برو آیتم بعدی
-            continue
-
-        if op == OP_BUY:
-            buy_qty = q
-
-            # ابتدا قدیمی‌ترین منفی‌ها را پوشش بده و COGS فروش‌هایشان را اصلاح کن
-            while buy_qty > 0 and layers and layers[0][0] < 0:
-                neg_qty, neg_price, neg_tx = layers[0]
-                cover = min(buy_qty, -neg_qty)
-
-                # اگر قبلاً COGS نداشت، صفر فرض کن
-                orig_cogs = int(neg_tx.cogs or 0)
-                # COGS جدید = قدیمی - (cover * neg_price) + (cover * up)
-                neg_tx.cogs = orig_cogs - cover * int(neg_price) + cover * up
-
-                # اگر کامل پوشش داده شد → دیگر موقت نیست
-                if neg_qty + cover == 0:
-                    neg_tx.is_cogs_temp = False
-                    layers.popleft()
-                else:
-                    # پوشش جزئی: temp باقی می‌ماند، فقط مقدار باقی‌مانده منفی کم می‌شود
-                    layers[0][0] = neg_qty + cover
-
-                changed_txs.append(neg_tx)
-                buy_qty -= cover
-
-            # باقی‌مانده خرید → لایه مثبت
-            if buy_qty > 0:
-                layers.append([buy_qty, up, None])
-
-            last_buy_price = up
-
-            # خرید COGS ندارد؛ اگر قبلاً چیزی بوده پاک شود
-            if tx.cogs is not None or tx.is_cogs_temp:
-                tx.cogs = None
-                tx.is_cogs_temp = False
-                changed_txs.append(tx)
-
-        elif op in (OP_SELL, OP_USE):
-            sell_qty = q
-            cogs_val = 0
-
-            # مصرف از لایه‌های مثبت (FIFO)
-            while sell_qty > 0 and layers and layers[0][0] > 0:
-                layer_qty, layer_price, _ = layers[0]
-                use = min(sell_qty, layer_qty)
-                cogs_val += use * int(layer_price)
-                sell_qty -= use
-                layer_qty -= use
-                if layer_qty == 0:
-                    layers.popleft()
-                else:
-                    layers[0][0] = layer_qty
-
-            # اگر هنوز فروش باقی مانده → موجودی منفی
-            if sell_qty > 0:
-                # قیمت پایه برای بخش منفی:
-                # 1) اگر لایه مثبت داریم → آخرین قیمت خرید واقعی
-                # 2) وگرنه اگر قبلاً خریدی دیده‌ایم → last_buy_price
-                # 3) وگرنه (هیچ خریدی تا کنون نبوده) → قیمت فروش
-                last_pos_price = None
-                for lqty, lprice, _ in reversed(layers):
-                    if lqty > 0:
-                        last_pos_price = lprice
-                        break
-
-                if last_pos_price is not None:
-                    base_price = int(last_pos_price)
-                elif last_buy_price is not None:
-                    base_price = int(last_buy_price)
-                else:
-                    base_price = up  # اولین فروش‌ها قبل از هر خرید
-
-                cogs_val += sell_qty * base_price
-                # منفی را به انتهای صف اضافه کن تا خریدهای بعدی FIFO پوشش دهند
-                layers.append([-sell_qty, base_price, tx])
-                tx.is_cogs_temp = True
-            else:
-                tx.is_cogs_temp = False
-
-            tx.cogs = cogs_val
-            changed_txs.append(tx)
-
-        else:
-            # دریافت/پرداخت و ...: COGS ندارد
-            if tx.cogs is not None or tx.is_cogs_temp:
-                tx.cogs = None
-                tx.is_cogs_temp = False
-                changed_txs.append(tx)
-
-    # 3) همهٔ تراکنش‌های تغییرکرده را یکجا ذخیره کن
-    if changed_txs:
-        Transaction.objects.bulk_update(changed_txs, ["cogs", "is_cogs_temp"])
-
-    if is_consignment:
-        last_buy_cost = last_buy_price
-    else:
-        # 4) اسنپ‌شات موجودی را از روی لایه‌ها به‌روز کن
-        qty_sum = sum(l[0] for l in layers)
-
-        # آخرین قیمت خرید
-        last_buy_cost = 0
-        for lqty, lprice, _ in reversed(layers):
-            if lqty > 0:
-                last_buy_cost = int(lprice)
-                break
-        if last_buy_cost == 0 and last_buy_price is not None:
-            last_buy_cost = int(last_buy_price)
-
-        inv.qty = qty_sum
-
-    inv.last_buy_cost = last_buy_cost
-    inv.save(update_fields=["qty", "last_buy_cost"])
-
-    # 5) رکورد جدید را با COGS نهایی برگردان
-    new_tx.refresh_from_db(fields=["cogs", "is_cogs_temp"])
-    return new_tx
+
+def _earliest(a, b):
+    if a is None:
+        return b
+    if a[0] is None or b[0] is None:
+        # تاریخ خالی قابل مقایسه نیست → بازپخش کامل
+        return (None, min(a[1], b[1]))
+    return min(a, b)
+
+
+def _lock_inventories(item_ids):
+    """
+    قفل ردیف‌های Inventory (SELECT ... FOR UPDATE در PostgreSQL؛ در SQLite خود BEGIN IMMEDIATE قفل است).
+    به ترتیب item_id تا دو ثبت گروهی هم‌زمان با کالاهای مشترک بن‌بست نشوند.
+    """
+    qs = Inventory.objects.select_for_update().filter(item_id__in=item_ids).order_by("item_id")
+    return {inv.item_id: inv for inv in qs}
+
+
+@transaction.atomic
+def replay_items(positions):
+    """
+    بازپخش کالاها بعد از تغییر خارج از مسیر ثبت (ویرایش/حذف در ادمین):
+    positions = [(item_id, (date_miladi, tx_id)), ...] — موقعیت قدیم و جدید ردیف‌های درگیر؛
+    هر کالا از قدیمی‌ترین موقعیتش (چک‌پوینت‌ها و وضعیت لایه‌های بعد از آن کنار گذاشته می‌شوند)
+    """
+    since = {}
+    for item_id, key in positions:
+        if item_id is not None:
+            since[item_id] = _earliest(since.get(item_id), key)
+    invs = _lock_inventories(since)
+    items = Item.objects.in_bulk(list(since))
+    for item_id in sorted(items):
+        replay_item(items[item_id], since=since[item_id], inv=invs.get(item_id))
+
+
+def _lock_parties(party_ids):
+    """
+    قفل طرف حساب‌ها (بعد از قفل موجودی، به ترتیب id): مانده‌ی جاری هر طرف حساب از ردیف قبلی‌اش ادامه می‌یابد
+    و دو ثبت هم‌زمان برای یک طرف حساب با کالاهای مختلف نباید هر دو از همان ردیف قبلی حساب کنند.
+    """
+    if not connection.features.has_select_for_update:
+        return  # SQLite: FOR UPDATE ندارد و قفل نوشتن از BEGIN IMMEDIATE گرفته شده
+    ids = sorted(p for p in party_ids if p is not None)
+    if ids:
+        list(Party.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id", flat=True))
+
+
+@transaction.atomic
+def post_stock_txs(specs):
+    """
+    ثبت گروهی تراکنش‌ها با یک بار بازپخش برای هر کالا:
+    - specs: لیست dict با همان آرگومان‌های post_stock_tx (date_miladi از نوع date)
+    - همه‌ی ردیف‌ها با bulk_create ساخته می‌شوند (ترتیب id همان ترتیب لیست است)
+    - هر کالا یک بار از قدیمی‌ترین ردیف جدیدش بازپخش می‌شود
+    - ردیف‌های بدون کالا (دریافت/پرداخت) بازپخش کالا ندارند
+    - مانده‌ی جاری هر طرف حساب فقط از قدیمی‌ترین ردیف جدیدش به بعد به‌روز می‌شود
+    - جمع‌های PartyBalance هر طرف حساب با یک UPDATE افزایش می‌یابد
+    - جمع روزانه‌ی فروش (sales/rows) روزهای فروش‌های جدید به‌روز می‌شود
+    خروجی: تراکنش‌های ساخته‌شده با cogs/is_cogs_temp/running_balance نهایی، به همان ترتیب ورودی
+    """
+    txs = [_build_tx(**spec) for spec in specs]
+    if not txs:
+        return []
+
+    items = {tx.item_id: tx.item for tx in txs if tx.item_id is not None}
+
+    # قفل موجودی همه‌ی کالاها (نبودها ساخته می‌شوند)
+    invs = _lock_inventories(items)
+    missing = [Inventory(item_id=iid, qty=0, last_buy_cost=0) for iid in items if iid not in invs]
+    if missing and connection.features.has_select_for_update:
+        # ثبت هم‌زمان دیگری ممکن است همان ردیف را ساخته باشد → نادیده بگیر و دوباره قفل کن
+        Inventory.objects.bulk_create(missing, ignore_conflicts=True)
+        invs = _lock_inventories(items)
+    elif missing:
+        # SQLite: BEGIN IMMEDIATE از قبل کل دیتابیس را قفل کرده
+        for inv in Inventory.objects.bulk_create(missing):
+            invs[inv.item_id] = inv
+    _lock_parties({tx.party_id for tx in txs})
+
+    Transaction.objects.bulk_create(txs, batch_size=500)
+
+    since, party_since = {}, {}
+    for tx in txs:
+        key = (tx.date_miladi, tx.id)
+        if tx.item_id is not None:
+            since[tx.item_id] = _earliest(since.get(tx.item_id), key)
+        if tx.party_id is not None:
+            party_since[tx.party_id] = _earliest(party_since.get(tx.party_id), key)
+
+    by_id = {tx.id: tx for tx in txs}
+    sales_deltas = {}
+    for item_id in sorted(items):
+        changes = replay_item(items[item_id], since=since[item_id], inv=invs[item_id], sales_deltas=sales_deltas)
+        for tx_id, (cogs, is_temp) in changes.items():
+            tx = by_id.get(tx_id)
+            if tx is not None:
+                tx.cogs, tx.is_cogs_temp = cogs, is_temp
+
+    for tx_id, balance in refresh_parties(party_since).items():
+        tx = by_id.get(tx_id)
+        if tx is not None:
+            tx.running_balance = balance
+    add_to_summary(txs)
+    rollup.apply_rollup(rollup.add_sales(txs, sales_deltas))
+    viewcache.bump(viewcache.TX)
+
+    return txs
+
+
+def post_stock_tx(
+    *, date_shamsi, date_miladi, op_type, item=None, party=None,
+    qty=0, unit_price=0, total_price=0, payment_method=None, **extra
+):
+    """
+    ثبت تراکنش + بازپخش FIFO همان کالا از نقطه‌ی اثر تراکنش جدید:
+    - ثبت در انتهای تاریخچه فقط لایه‌های باز را مصرف/تمدید می‌کند
+    - ثبت با تاریخ گذشته از نزدیک‌ترین چک‌پوینت قبلی بازپخش می‌شود
+    - فروش‌های قبل از خرید: موقت با قیمت فروش و بعداً با خرید اصلاح می‌شوند
+    - اسنپ‌شات موجودی (qty/last_buy_cost) به‌روز می‌شود
+    """
+    return post_stock_txs([dict(
+        date_shamsi=date_shamsi,
+        date_miladi=date_miladi,
+        op_type=op_type,
+        item=item,
+        party=party,
+        qty=int(qty or 0),
+        unit_price=int(unit_price or 0),
+        total_price=total_price,
+        payment_method=payment_method,
+        **extra
+    )])[0]
+
+
+# فیلدهایی که ویرایش گروهی (sync_stock_txs) بازنویسی می‌کند؛ cogs/مانده با بازپخش اصلاح می‌شوند
+SYNC_FIELDS = [
+    "date_shamsi", "date_miladi", "jy", "jm", "jd", "op_type", "item", "party",
+    "qty", "unit_price", "total_price", "payment_method", "description", "search_description",
+    "import_key", "import_fp",
+]
+
+
+@transaction.atomic
+def sync_stock_txs(create=(), update=None, delete=()):
+    """
+    افزودن/ویرایش/حذف گروهی تراکنش‌ها با یک بار بازپخش برای هر کالای درگیر:
+    - create: لیست spec (مثل post_stock_txs)
+    - update: {tx_id: spec} — ردیف با همان id بازنویسی می‌شود
+    - delete: id ردیف‌های حذفی
+    - هر کالا/طرف حساب از قدیمی‌ترین موقعیت قدیم یا جدید ردیف‌های درگیرش بازپخش می‌شود
+    - خلاصه‌ی طرف حساب‌ها و جمع روزانه‌ی روزهای درگیر دوباره ساخته می‌شوند
+    خروجی: {"created": n, "updated": n, "deleted": n, "items": n, "parties": n}
+    """
+    update = update or {}
+    delete = list(delete)
+    if not (create or update or delete):
+        return {"created": 0, "updated": 0, "deleted": 0, "items": 0, "parties": 0}
+    touched = list(update) + delete
+
+    since, party_since, days = {}, {}, set()
+
+    def _touch(item_id, party_id, key, day):
+        if item_id is not None:
+            since[item_id] = _earliest(since.get(item_id), key)
+        if party_id is not None:
+            party_since[party_id] = _earliest(party_since.get(party_id), key)
+        days.add(day)
+
+    # موقعیت قبلی ردیف‌های ویرایشی/حذفی
+    old_rows = Transaction.objects.filter(id__in=touched).values_list(
+        "id", "item_id", "party_id", "date_miladi", "jy", "jm", "jd")
+    for tx_id, item_id, party_id, d, jy, jm, jd in old_rows.iterator(chunk_size=2000):
+        _touch(item_id, party_id, (d, tx_id), (jy, jm, jd))
+
+    # قفل‌ها قبل از هر نوشتنی و به همان ترتیب post_stock_txs (موجودی، بعد طرف حساب) تا بن‌بست نشود
+    specs = list(create) + list(update.values())
+    invs = _lock_inventories(set(since) | {getattr(s.get("item"), "pk", None) for s in specs} - {None})
+    _lock_parties(set(party_since) | {getattr(s.get("party"), "pk", None) for s in specs})
+
+    for k in range(0, len(delete), 500):
+        Transaction.objects.filter(id__in=delete[k:k + 500]).delete()
+
+    updated = []
+    for tx_id, spec in update.items():
+        tx = _build_tx(**spec)
+        tx.id = tx_id
+        updated.append(tx)
+    Transaction.objects.bulk_update(updated, SYNC_FIELDS, batch_size=500)
+
+    created = [_build_tx(**spec) for spec in create]
+    Transaction.objects.bulk_create(created, batch_size=500)
+
+    for tx in updated + created:
+        _touch(tx.item_id, tx.party_id, (tx.date_miladi, tx.id), (tx.jy, tx.jm, tx.jd))
+
+    items = Item.objects.in_bulk(list(since))
+    sales_deltas = {}
+    for item_id in sorted(items):
+        replay_item(items[item_id], since=since[item_id], inv=invs.get(item_id), sales_deltas=sales_deltas)
+
+    refresh_parties(party_since)
+    rebuild_summary(party_since)
+    # اختلاف COGS فروش‌های روزهای دیگر؛ روزهای خود ردیف‌های درگیر از نو ساخته می‌شوند
+    rollup.apply_rollup(sales_deltas)
+    rollup.rebuild_rollup(days)
+    viewcache.bump(viewcache.TX)
+
+    return {"created": len(created), "updated": len(updated), "deleted": len(delete),
+            "items": len(items), "parties": len(party_since)}
@@ -0,0 +1,188 @@
+# ledger/slowlog.py
+"""
+لاگ کوئری‌های کند: هر کوئری کندتر از LEDGER_SLOW_QUERY_MS با پارامترها، تابع صدا‌زننده (اولین فریم کد پروژه)
+و نقشه‌ی اجرای آن (SQLite: EXPLAIN QUERY PLAN ، PostgreSQL: EXPLAIN) یک خط JSON در LEDGER_SLOW_QUERY_LOG می‌شود.
+
+- روی همه‌ی اتصال‌ها (connection_created در apps.py) به‌صورت execute_wrapper نصب می‌شود؛ برای کوئری‌های سریع
+  فقط یک اندازه‌گیری زمان و یک مقایسه اضافه دارد
+- EXPLAIN روی یک cursor خام جدا اجرا می‌شود (نتیجه‌ی کوئری اصلی دست نمی‌خورد، خودش هم دوباره لاگ نمی‌شود)
+  و برای هر اثر انگشت SQL فقط یک بار در هر پروسس
+- گزارش تجمیعی (تعداد، p50/p95 ، اسکن کامل ledger_transaction): python manage.py slow_queries
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+from .instrumentation import fingerprint
+
+log = logging.getLogger("ledger.slowsql")
+
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+# نقشه‌ی هر اثر انگشت یک بار در هر پروسس؛ سقف برای کوئری‌های پویا
+_plans = {}
+MAX_PLANS = 500
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.join(_HERE, f) for f in ("slowlog.py", "viewcache.py", "instrumentation.py", "profiling.py")}
+
+# SQLite: «SCAN ledger_transaction» بدون USING INDEX ؛ PostgreSQL: «Seq Scan on ledger_transaction»
+_FULL_SCAN_RE = re.compile(r"\bSCAN (?:TABLE )?ledger_transaction\b(?! USING)|Seq Scan on ledger_transaction\b")
+
+
+def threshold():
+    return getattr(settings, "LEDGER_SLOW_QUERY_MS", None)
+
+
+def log_path():
+    return str(getattr(settings, "LEDGER_SLOW_QUERY_LOG", os.path.join(settings.BASE_DIR, "logs", "slow_queries.jsonl")))
+
+
+def is_full_scan(plan):
+    """آیا نقشه‌ی اجرا کل جدول ledger_transaction را می‌خواند؟"""
+    return any(_FULL_SCAN_RE.search(line) for line in plan)
+
+
+def explain(connection, sql, params):
+    """نقشه‌ی اجرای یک کوئری به‌صورت لیست خط‌ها (روی cursor خام، بدون execute_wrapper ها)."""
+    if connection.vendor == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif connection.vendor == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return []
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if connection.vendor != "sqlite":
+        return [row[0] for row in rows]
+
+    # (id, parent, notused, detail) → تورفتگی به عمق درخت
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def _caller():
+    """
+    از کوئری به بیرون: اولین فریم کد پروژه تا آخرین فریم پشت سر هم پروژه (معمولاً خود view)
+    → «ledger/utils.py:108 keyset_page ← ledger/views.py:531 transaction_list»
+    دکوریتورها/middleware های خود پروژه (viewcache، instrumentation، profiling) رد می‌شوند.
+    """
+    base = str(settings.BASE_DIR)
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(base) and "site-packages" not in filename:
+            if filename not in _SKIP_FILES:
+                frames.append(f"{os.path.relpath(filename, base)}:{frame.f_lineno} {frame.f_code.co_name}")
+        elif frames:
+            break
+        frame = frame.f_back
+    if not frames:
+        return "-"
+    return frames[0] if len(frames) == 1 else f"{frames[0]} ← {frames[-1]}"
+
+
+def _plan_for(connection, fp, sql, params):
+    if fp in _plans:
+        return _plans[fp]
+    try:
+        plan = explain(connection, sql, params)
+    except Exception as e:  # noqa: BLE001 — لاگ کندی نباید خود درخواست را خراب کند
+        plan = [f"EXPLAIN failed: {e}"]
+    if len(_plans) < MAX_PLANS:
+        _plans[fp] = plan
+    return plan
+
+
+def record(connection, sql, params, ms):
+    fp = fingerprint(sql)
+    plan = []
+    if sql.lstrip()[:6].upper().startswith(EXPLAINABLE):
+        plan = _plan_for(connection, fp, sql, params)
+    entry = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "ms": round(ms, 2),
+        "fingerprint": fp,
+        "sql": sql,
+        "params": [str(p)[:100] for p in (params or ())][:50],
+        "caller": _caller(),
+        "vendor": connection.vendor,
+        "plan": plan,
+    }
+    path = log_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    log.warning("slow query %.1fms at %s: %s%s", ms, entry["caller"], fp[:200],
+                " [full scan of ledger_transaction]" if is_full_scan(plan) else "")
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    limit = threshold()
+    if limit is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    result = execute(sql, params, many, context)
+    ms = (time.perf_counter() - t0) * 1000
+    if ms >= limit and not many:
+        record(context["connection"], sql, params, ms)
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """connection_created: wrapper یک بار روی هر DatabaseWrapper (اتصال دوباره همان آبجکت است)."""
+    if threshold() is not None and slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def read_log(path=None):
+    """خط‌های فایل لاگ (خط خراب — مثلاً نیمه‌نوشته — نادیده گرفته می‌شود)."""
+    path = path or log_path()
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def aggregate(entries):
+    """گروه‌بندی با اثر انگشت: تعداد، مجموع/p50/p95/بیشینه‌ی زمان، صدازننده‌ها، نمونه و آخرین نقشه."""
+    groups = {}
+    for e in entries:
+        g = groups.setdefault(e["fingerprint"], {"fingerprint": e["fingerprint"], "ms": [], "callers": {}, "plan": []})
+        g["ms"].append(e["ms"])
+        g["callers"][e["caller"]] = g["callers"].get(e["caller"], 0) + 1
+        g["sample"] = e
+        if e.get("plan"):
+            g["plan"] = e["plan"]
+    result = []
+    for g in groups.values():
+        ms = g.pop("ms")
+        g.update(count=len(ms), total_ms=round(sum(ms), 1), p50=_pct(ms, .5), p95=_pct(ms, .95), max=max(ms),
+                 full_scan=is_full_scan(g["plan"]))
+        result.append(g)
+    return result
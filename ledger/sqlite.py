@@ -0,0 +1,51 @@
+# ledger/sqlite.py
+"""
+تنظیمات SQLite برای اجرا در production (با سیگنال connection_created روی هر اتصال جدید اعمال می‌شود).
+
+- WAL: خواننده‌ها (صفحه‌های گزارش) پشت نوشتن post_stock_tx منتظر نمی‌مانند و نویسنده هم پشت خواننده‌ها
+- synchronous=NORMAL: در WAL امن است (فقط ممکن است آخرین commit قبل از قطع برق از دست برود، دیتابیس خراب نمی‌شود)
+- cache_size / mmap_size: صفحه‌های پرمصرف (ledger_transaction و ایندکس‌هایش) در حافظه بمانند
+- busy_timeout: به‌جای خطای فوری "database is locked" تا این مدت صبر کند
+- BEGIN IMMEDIATE (در DATABASES → OPTIONS → transaction_mode): قفل نوشتن از اول تراکنش گرفته می‌شود؛
+  دو تراکنش DEFERRED که اول می‌خوانند و بعد می‌نویسند بن‌بست می‌شوند و یکی بدون صبر خطا می‌دهد
+
+پروفایل با LEDGER_SQLITE_PROFILE در settings انتخاب می‌شود ("production" یا "default" = تنظیمات خود SQLite).
+"""
+from django.conf import settings
+
+PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,        # منفی = KiB → حدود ۶۴ مگابایت برای هر اتصال
+        "mmap_size": 268435456,      # ۲۵۶ مگابایت
+        "temp_store": "MEMORY",
+        "busy_timeout": 20000,       # میلی‌ثانیه
+    },
+}
+
+
+def pragmas(profile=None):
+    """PRAGMAهای یک پروفایل (پیش‌فرض: LEDGER_SQLITE_PROFILE) به ترتیب اعمال."""
+    name = profile or getattr(settings, "LEDGER_SQLITE_PROFILE", "default")
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"unknown SQLite profile {name!r} (choices: {', '.join(PROFILES)})")
+
+
+def apply_pragmas(conn, profile=None):
+    """PRAGMAها را روی یک اتصال sqlite3 (خام یا connection.connection جنگو) اجرا می‌کند."""
+    cursor = conn.cursor()
+    try:
+        for name, value in pragmas(profile).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_connection(sender, connection, **kwargs):
+    """گیرنده‌ی سیگنال connection_created (در LedgerConfig.ready وصل می‌شود)."""
+    if connection.vendor == "sqlite":
+        apply_pragmas(connection.connection)
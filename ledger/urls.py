@@ -16,10 +16,14 @@ urlpatterns = [
     path("item/create/", views.item_create, name="item_create"),
     path("party/create/", views.party_create, name="party_create"),
     path('transactions/', views.transaction_list, name='transaction_list'),
+    path('transactions/export/', views.transaction_export, name='transaction_export'),
     path("reports/customer-balance/", views.customer_balance_report, name="customer_balance_report"),
     path("monthly_sales/", views.monthly_sales, name="monthly_sales"),
     path("<int:year>/<int:month>/", views.daily_sales, name="daily_sales"),
     path('ajax/get-sell-price/', views.get_sell_price, name='get_sell_price'),
+    path('ajax/cache-stats/', views.cache_stats, name='cache_stats'),
+    path('ajax/items/search/', views.ajax_item_search, name='ajax_item_search'),
+    path('ajax/parties/search/', views.ajax_party_search, name='ajax_party_search'),
     path('ajax/get-party-transactions/', views.get_party_transactions, name='get_party_transactions'),
     path('ajax/get-item-transactions/', views.get_item_transactions, name='get_item_transactions'),
     path('ajax/get-recent-transactions/', views.get_recent_transactions, name='get_recent_transactions'),
@@ -1,35 +1,8 @@
-from functools import wraps
-from django.conf import settings
-
-def ajax_debug_logger(view_func):
-    """
-    Decorator: لاگ‌های ثبت‌شده در view را به خروجی JSON اضافه می‌کند (در حالت DEBUG=True)
-    """
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        request._debug_logs = []  # لیست موقت برای ذخیره لاگ‌ها
-
-        def dlog(*parts):
-            msg = " ".join(str(p) for p in parts)
-            request._debug_logs.append(msg)
-            print("🪵 DEBUG:", msg)  # در کنسول سرور هم چاپ می‌شود
-
-        request.dlog = dlog  # اضافه به request برای استفاده در view
-        response = view_func(request, *args, **kwargs)
-
-        # اگر پاسخ از نوع JSON است و DEBUG=True → لاگ‌ها را به آن اضافه کن
-        if settings.DEBUG and hasattr(request, "_debug_logs"):
-            try:
-                if hasattr(response, "content") and response.get("Content-Type") == "application/json":
-                    import json
-                    data = json.loads(response.content)
-                    data["_debug"] = request._debug_logs
-                    response.content = json.dumps(data, ensure_ascii=False)
-            except Exception:
-                pass
-
-        return response
-    return wrapper
+import base64
+import binascii
+from datetime import date
+from django.db import connection
+from django.db.models import Q
 
 # تبدیل رقم به انگلیسی
 def toEn(s, as_int=False):
@@ -62,3 +35,90 @@ def toEn(s, as_int=False):
 def toFa(s):
     return s.translate(str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹'))
 
+
+# --- متن جستجو (ستون‌های search_* در Item/Party/Transaction) ---
+# نویسه‌های عربی/فارسی هم‌ارز → یک شکل؛ اعراب، کشیده و نیم‌فاصله حذف می‌شوند
+_SEARCH_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ؤ": "و",
+    "٠": "۰", "١": "۱", "٢": "۲", "٣": "۳", "٤": "۴", "٥": "۵", "٦": "۶", "٧": "۷", "٨": "۸", "٩": "۹",
+    "\u200c": None, "\u200d": None, "\u0640": None, "\u0670": None,
+    **{chr(c): None for c in range(0x064B, 0x0653)},
+})
+
+def normalize_search(s):
+    """
+    شکل یکسان متن برای جستجو: 'كيف  ٢' و 'کیف۲' و 'کیف 2' → 'کیف2'
+    (رقم‌ها با toEn انگلیسی، حروف کوچک، بدون فاصله/نیم‌فاصله)
+    """
+    if not s:
+        return ''
+    s = toEn(str(s).translate(_SEARCH_MAP)).lower()
+    return ''.join(s.split())
+
+def search_prefix(field, q):
+    """
+    شرط «شروع با q» به‌صورت بازه روی ایندکس (LIKE در SQLite از ایندکس استفاده نمی‌کند).
+    در PostgreSQL همان LIKE 'q%': ایندکس trigram آن را پوشش می‌دهد و بازه با collation زبانی قابل اعتماد نیست.
+    """
+    if connection.vendor == "postgresql":
+        return Q(**{f"{field}__startswith": q})
+    return Q(**{f"{field}__gte": q, f"{field}__lt": q + "\uffff"})
+
+
+# تفکیک تاریخ شمسی متنی به (سال, ماه, روز)
+def split_jdate(s):
+    """
+    '1403/05/12' یا '۱۴۰۳-۵-۱۲' → (1403, 5, 12)؛ اگر قابل تفکیک نباشد None
+    """
+    parts = toEn(s).replace('-', '/').split('/') if s else []
+    if len(parts) != 3:
+        return None
+    try:
+        y, m, d = (int(p) for p in parts)
+    except ValueError:
+        return None
+    if not (1 <= m <= 12 and 1 <= d <= 31):
+        return None
+    return y, m, d
+
+# --- صفحه‌بندی keyset روی (date_miladi, id) نزولی ---
+def encode_cursor(tx):
+    """توکن مات برای «بعد از این ردیف» به ترتیب (-date_miladi, -id)."""
+    raw = f"{tx.date_miladi.isoformat() if tx.date_miladi else ''}|{tx.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    """(date_miladi, id) از توکن؛ توکن نامعتبر → ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        d, tx_id = raw.split("|")
+        return (date.fromisoformat(d) if d else None), int(tx_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+def keyset_page(qs, cursor, limit):
+    """
+    یک صفحه از qs به ترتیب (-date_miladi, -id) بعد از cursor (با ایندکس (date_miladi, id)).
+    ردیف‌های بدون تاریخ در ترتیب نزولی آخر می‌آیند.
+    خروجی: (rows, next_cursor) — next_cursor=None یعنی صفحه‌ی بعدی نیست
+    """
+    from .models import CHRONO_DESC  # models خودش از utils ایمپورت می‌کند
+    order = CHRONO_DESC
+    if not cursor:
+        rows = list(qs.order_by(*order)[:limit + 1])
+    else:
+        d, tx_id = decode_cursor(cursor)
+        if d is None:
+            rows = list(qs.filter(date_miladi__isnull=True, id__lt=tx_id).order_by('-id')[:limit + 1])
+        else:
+            # date_miladi <= d بازه‌ی ایندکس را مشخص می‌کند؛ شرط دوم فقط ردیف‌های همان روز را می‌بُرد
+            rows = list(qs.filter(date_miladi__lte=d)
+                          .filter(Q(date_miladi__lt=d) | Q(id__lt=tx_id))
+                          .order_by(*order)[:limit + 1])
+            if len(rows) <= limit:
+                rows += qs.filter(date_miladi__isnull=True).order_by('-id')[:limit + 1 - len(rows)]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,113 @@
+# ledger/viewcache.py
+"""
+کش پاسخ گزارش‌ها (monthly_sales، daily_sales، customer_balance_report، items_list، parties_list).
+
+- کلید = نام view + پارامترهای GET مرتب‌شده (بدون مقادیر خالی) + کاربر + نسخه‌ی داده‌هایی که view به آن‌ها وابسته است
+- هر نوشتن، نسخه‌ی همان داده را عوض می‌کند (bump) → کلیدهای قبلی دیگر خوانده نمی‌شوند
+  و خودشان با TIMEOUT از کش پاک می‌شوند؛ نیازی به پیدا کردن/حذف تک‌تک کلیدها نیست
+- نسخه یک توکن تصادفی است نه شمارنده: set تک‌مرحله‌ای است (incr کش فایلی get+set غیر اتمی است و دو bump
+  هم‌زمان یکی می‌شدند) و اگر کلید نسخه با cull کش حذف شود، نسخه‌ی تازه با هیچ کلید قدیمی برخورد نمی‌کند
+- bump بعد از commit اجرا می‌شود: GET هم‌زمان پیش از commit داده‌ی قدیمی را زیر نسخه‌ی جدید کش نمی‌کند
+- تعداد hit/miss هر view در همان کش شمرده می‌شود (cache_stats)
+"""
+import hashlib
+import uuid
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+# داده‌هایی که نسخه دارند
+TX = "tx"            # تراکنش‌ها و هرچه از آن‌ها ساخته می‌شود (موجودی، مانده‌ها، جمع روزانه)
+ITEMS = "items"
+PARTIES = "parties"
+
+PREFIX = "ledger:vc"
+# نسخه‌ها و آمار نباید منقضی شوند
+FOREVER = None
+
+_registry = set()
+
+
+def _timeout():
+    return getattr(settings, "LEDGER_VIEW_CACHE_TIMEOUT", 3600)
+
+
+def _set_versions(scopes):
+    cache.set_many({f"{PREFIX}:v:{scope}": uuid.uuid4().hex for scope in scopes}, FOREVER)
+
+
+def bump(*scopes):
+    """نسخه‌ی داده‌های scopes را عوض می‌کند (بعد از هر نوشتن؛ داخل تراکنش → بعد از commit)."""
+    transaction.on_commit(partial(_set_versions, scopes))
+
+
+def versions(scopes):
+    keys = [f"{PREFIX}:v:{s}" for s in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # هنوز ساخته نشده یا cull شده → توکن تازه (اگر پروسس دیگری زودتر ساخته، همان)
+            token = uuid.uuid4().hex
+            found[key] = token if cache.add(key, token, FOREVER) else cache.get(key, token)
+    return tuple(found[k] for k in keys)
+
+
+def _count(name, outcome):
+    key = f"{PREFIX}:stats:{name}:{outcome}"
+    if not cache.add(key, 1, FOREVER):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, FOREVER)
+
+
+def stats():
+    """{view: {"hit": n, "miss": n}} برای همه‌ی viewهای کش‌شده."""
+    keys = {(name, outcome): f"{PREFIX}:stats:{name}:{outcome}"
+            for name in _registry for outcome in ("hit", "miss")}
+    found = cache.get_many(list(keys.values()))
+    return {name: {outcome: found.get(keys[(name, outcome)], 0) for outcome in ("hit", "miss")}
+            for name in sorted(_registry)}
+
+
+def _key(name, request, args, kwargs, scopes):
+    params = sorted((k, v) for k in request.GET for v in request.GET.getlist(k) if v != "")
+    ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+    raw = repr((name, args, sorted(kwargs.items()), params, ajax, request.user.pk, versions(scopes)))
+    return f"{PREFIX}:r:{name}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def cached_view(*scopes):
+    """
+    دکوریتور view: پاسخ 200 درخواست‌های GET تا تغییر یکی از scopes (یا TIMEOUT) از کش داده می‌شود.
+    هدر X-Cache: HIT/MISS برای بررسی. درخواست‌های پروفایل (ledger/profiling.py) از کش عبور نمی‌کنند.
+    """
+    def decorator(view_func):
+        name = view_func.__name__
+        _registry.add(name)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or getattr(request, "ledger_profiling", False):
+                return view_func(request, *args, **kwargs)
+
+            key = _key(name, request, args, kwargs, scopes)
+            cached = cache.get(key)
+            if cached is not None:
+                _count(name, "hit")
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response["X-Cache"] = "HIT"
+                return response
+
+            _count(name, "miss")
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, response["Content-Type"]), _timeout())
+            response["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
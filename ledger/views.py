@@ -1,27 +1,44 @@
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, redirect
-from .models import Item, Party, Transaction, Inventory, OP_SELL, OP_BUY, OP_USE, OP_RCV, OP_PAY, OP_CHOICES, PERSIAN_MONTHS
+from .models import Item, Party, PartyBalance, DailySalesRollup, Transaction, Inventory, OP_SELL, OP_BUY, OP_USE, OP_RCV, OP_PAY, OP_CHOICES, PERSIAN_MONTHS, CHRONO, CHRONO_DESC
 from django import forms
 from .forms import TransactionForm, PartyForm, ItemForm
 from django.urls import reverse
 from django.utils.http import urlencode
 from django.contrib import messages
 from django.db.models import Window, Sum, Count, Case, When, Value, F, Q, ExpressionWrapper, IntegerField, BigIntegerField, FloatField
-from django.http import JsonResponse, HttpResponseRedirect, HttpResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseRedirect, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, FileResponse, Http404
 from django.template.loader import render_to_string
 from datetime import timedelta
 from decimal import Decimal
 import jdatetime
-from .services.stock import post_stock_tx
-from django.db.models.functions import Coalesce, Substr, Cast
+from .services.stock import post_stock_txs
+from .services.export import export_rows, iter_csv, write_xlsx
+import logging
+import os
+import tempfile
+from django.db.models.functions import Coalesce
 from persiantools.jdatetime import JalaliDate
-from .utils import toEn, ajax_debug_logger
+from .viewcache import cached_view, TX, ITEMS, PARTIES
+from . import profiling, viewcache
+from .instrumentation import dlog
+from .utils import toEn, keyset_page, normalize_search, search_prefix
+
+# حداکثر ردیف‌های مودال طرف حساب (مانده‌ی هر ردیف ذخیره‌شده است، پس برش اثری روی آن ندارد)
+PARTY_MODAL_LIMIT = 300
 
 def _last_n_keep_ascending(qs, n):
     # آخرین n تا را می‌گیریم ولی برای نمایش صعودی می‌چینیم
-    last_desc = list(qs.order_by('-date_miladi', '-id')[:n])
+    last_desc = list(qs.order_by(*CHRONO_DESC)[:n])
     return list(reversed(last_desc))
 
+def _after_tx(qs, tx):
+    # ردیف‌های بعد از tx به ترتیب (date_miladi, id)
+    if tx.date_miladi is None:
+        return qs.filter(Q(date_miladi__isnull=False) | Q(id__gt=tx.id))
+    return qs.filter(Q(date_miladi__gt=tx.date_miladi) | Q(date_miladi=tx.date_miladi, id__gt=tx.id))
+
 def ajax_party_txs(request):
     party_id    = request.GET.get('party_id')
     from_last   = request.GET.get('from_last') == "1"
@@ -42,34 +59,27 @@ def ajax_party_txs(request):
         return JsonResponse({
             "html": "<tr><td colspan='6'>طرف حساب پیدا نشد.</td></tr>", "balance": 0, })
 
-    # ساخت QuerySet پایه
+    try:
+        limit = int(request.GET.get("limit") or PARTY_MODAL_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest("limit invalid")
+
+    # مانده‌ی جاری روی خود تراکنش‌ها ذخیره شده (Transaction.running_balance)
+    # → فقط آخرین limit ردیف با ایندکس (party, date_miladi, id) خوانده می‌شود
     qs = (
         Transaction.objects
         .select_related('item', 'party')
         .filter(party_id=party_id)
-        .order_by('date_miladi', 'id')
-    )
-
-    # محاسبه delta برای طرف حساب
-    qs = qs.annotate(
-        delta=Case(
-            When(op_type__in=[OP_SELL, OP_USE, OP_PAY], then= Coalesce(F('total_price'), Value(0))),
-            When(op_type__in=[OP_BUY, OP_RCV],          then=-Coalesce(F('total_price'), Value(0))),
-            default=Value(0),
-            output_field=BigIntegerField(),
-        )
     )
 
-    # running balance
-    qs = qs.annotate(
-        running_balance=Window(
-            expression=Sum('delta'),
-            order_by=[F('date_miladi').asc(), F('id').asc()],
-        )
-    )
+    # ----- از آخرین تسویه -----
+    if from_last:
+        last_settle = qs.filter(running_balance=0).order_by(*CHRONO_DESC).first()
+        if last_settle:
+            qs = _after_tx(qs, last_settle)
 
-    total_count = qs.count()
-    if total_count == 0:
+    txs = _last_n_keep_ascending(qs, limit)
+    if not txs:
         return JsonResponse({
             "html": "<tr><td colspan='7' class='text-center'>رکوردی یافت نشد</td></tr>",
             "last_id": None,
@@ -77,20 +87,13 @@ def ajax_party_txs(request):
             "balance": 0,
         })
 
-    # ----- از آخرین تسویه -----
-    if from_last:
-        last_settle = qs.filter(running_balance=0).last()
-        if last_settle:
-            qs = qs.filter(id__gt=last_settle.id)
-
     # ----- آخرین مانده حساب -----
-    last_tx = qs.last()
-    balance = last_tx.running_balance if last_tx else 0
+    balance = txs[-1].running_balance or 0
 
     # تولید html
     html = render_to_string(
         "ledger/partials/party_modal_txs.html",
-        {"txs": qs, "page_source": page_source},
+        {"txs": txs, "page_source": page_source},
         request=request
     )
 
@@ -119,7 +122,7 @@ def ajax_item_txs(request):
         Transaction.objects
         .select_related('item','party')
         .filter(item_id=item_id, op_type__in=[OP_SELL, OP_BUY, OP_USE])
-        .order_by('date_miladi', 'id')
+        .order_by(*CHRONO)
         .annotate(
             delta=Case(
                 When(op_type=OP_BUY,  then=Coalesce(F('qty'), Value(0))),
@@ -130,9 +133,10 @@ def ajax_item_txs(request):
             )
         )
         .annotate(
-            running_balance=Window(
+            # مانده‌ی تعدادی کالا (running_balance فیلد مانده‌ی حساب طرف حساب است)
+            running_qty=Window(
                 expression=Sum('delta'),
-                order_by=[F('date_miladi').asc(), F('id').asc()],
+                order_by=list(CHRONO),
             )
         )
     )
@@ -150,27 +154,11 @@ def ajax_item_txs(request):
     })
 
 @login_required
-@ajax_debug_logger
 def register_transaction(request, op_type):
-    items = Item.objects.all()
-
     OP_LABELS = dict(OP_CHOICES)
 
-    # فیلتر طرف حساب بر اساس نوع عملیات
-    if op_type in (OP_SELL, OP_USE):
-        parties = Party.objects.filter(is_customer=True)
-        page_source = 'sell'
-    elif op_type == OP_BUY:
-        parties = Party.objects.filter(is_supplier=True)
-        page_source = "buy"
-    elif op_type == OP_RCV:
-        parties = Party.objects.filter(is_customer=True)
-        page_source = "rcv"
-    elif op_type == OP_PAY:
-        parties = Party.objects.filter(is_supplier=True)
-        page_source = "pay"
-    else:
-        parties = Party.objects.all()
+    # لیست کالا/طرف حساب در صفحه رندر نمی‌شود؛ select2 از ajax_item_search/ajax_party_search می‌خواند
+    page_source = {OP_SELL: "sell", OP_USE: "sell", OP_BUY: "buy", OP_RCV: "rcv", OP_PAY: "pay"}.get(op_type)
 
     if request.method == 'POST':
         form = TransactionForm(request.POST, op_type=op_type)
@@ -182,7 +170,7 @@ def register_transaction(request, op_type):
             form.fields['total_price'].required = False
 
         if form.is_valid():
-            request.dlog("✅ Form valid:", form.cleaned_data)
+            dlog(request, "✅ Form valid:", form.cleaned_data)
 
             # تبدیل تاریخ شمسی به میلادی
             date_shamsi = request.POST.get('date_shamsi')
@@ -208,7 +196,8 @@ def register_transaction(request, op_type):
             party = form.cleaned_data['party']
             total_price = Decimal(str(parse_number(form.cleaned_data['total_price'])))
 
-            created = []
+            # ردیف کالا و ردیف تسویه با هم و در یک بازپخش ثبت می‌شوند
+            specs = []
             if page_source in ("buy", "sell"):
                 item = form.cleaned_data['item']
 
@@ -219,7 +208,7 @@ def register_transaction(request, op_type):
                 else:
                     unit_price = Decimal(str(parse_number(form.cleaned_data['unit_price'])))
 
-                post_stock_tx(
+                specs.append(dict(
                     date_shamsi=date_shamsi,
                     date_miladi=mi_date,
                     op_type=op_type,
@@ -230,13 +219,11 @@ def register_transaction(request, op_type):
                     total_price=total_price,
                     payment_method="",
                     description=form.cleaned_data.get('description'),
-                )
-
-                created.append(op_type)
+                ))
 
             if form.cleaned_data.get('payment_amount') > 0:
                 op_type2 = 'PAY' if page_source in ('buy', 'pay') else 'RCV'
-                Transaction.objects.create(
+                specs.append(dict(
                     date_shamsi=date_shamsi,
                     date_miladi=mi_date,
                     op_type=op_type2,
@@ -247,16 +234,17 @@ def register_transaction(request, op_type):
                     total_price=form.cleaned_data.get('payment_amount'),
                     payment_method=form.cleaned_data.get('payment_method'),
                     description=form.cleaned_data.get('description'),
-                )
-                created.append(op_type2)
+                ))
+
+            created = [tx.op_type for tx in post_stock_txs(specs)]
 
-            request.dlog("✅ operations:", created)
+            dlog(request, "✅ operations:", created)
             return JsonResponse({
                 "success": True,
                 "operations": created
             })
         else:
-            request.dlog("❌ Form invalid:", form.errors)
+            dlog(request, "❌ Form invalid:", form.errors)
             return JsonResponse({ "success": False, "errors": form.errors })
     else:
         form = TransactionForm(op_type=op_type)
@@ -266,14 +254,12 @@ def register_transaction(request, op_type):
             if fld in form.fields:
                 form.fields[fld].widget = forms.HiddenInput()
 
-    recent_qs = Transaction.objects.order_by('-date_miladi')
+    recent_qs = Transaction.objects.order_by(*CHRONO_DESC)
     if op_type in (OP_SELL, OP_BUY):
         recent_qs = recent_qs.filter(op_type=op_type)
 
     context = {
         'form': form,
-        'parties': parties,
-        'items': items,
         'readonly_total_price': (page_source == "sell"),
         'op_type': op_type,
         'recent_transactions': recent_qs[:20],
@@ -298,6 +284,41 @@ def register_payment(request):
 def register_receipt(request):
     return register_transaction(request, OP_RCV)
 
+@staff_member_required
+def cache_stats(request):
+    # برای مانیتورینگ: تعداد hit/miss کش هر گزارش و نسخه‌ی فعلی داده‌ها
+    scopes = (TX, ITEMS, PARTIES)
+    return JsonResponse({
+        "views": viewcache.stats(),
+        "versions": dict(zip(scopes, viewcache.versions(scopes))),
+    })
+
+@staff_member_required
+def profile_list(request):
+    # پروفایل‌های ذخیره‌شده‌ی ?_profile=1 (ledger/profiling.py)
+    from django.contrib import admin
+    return render(request, "ledger/admin/profiles.html", {
+        **admin.site.each_context(request),
+        "title": "پروفایل درخواست‌ها",
+        "profiles": profiling.profiles(),
+        "keep": profiling.keep_count(),
+    })
+
+@staff_member_required
+def profile_detail(request, name):
+    # خلاصه‌ی متنی؛ ?download=1 → فایل ‎.pstats
+    ext = "pstats" if request.GET.get("download") else "txt"
+    try:
+        path = profiling.path_for(name, ext)
+    except ValueError:
+        raise Http404
+    if not os.path.exists(path):
+        raise Http404
+    if ext == "pstats":
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=os.path.basename(path))
+    with open(path, encoding="utf-8") as f:
+        return HttpResponse(f.read(), content_type="text/plain; charset=utf-8")
+
 @login_required
 def get_sell_price(request):
     item_id = request.GET.get('item_id')
@@ -318,7 +339,63 @@ def get_sell_price(request):
 
     return JsonResponse({'sell_price': sell_price, 'stock': stock, 'unit': unit, 'is_consignment': is_consignment})
 
+# حداکثر نتایج جستجوی کالا/طرف حساب در select2
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX = 50
+
+def _autocomplete(qs, q, limit, fields):
+    """
+    اول نام‌هایی که با q شروع می‌شوند (بازه روی ایندکس search_name)،
+    بعد اگر جا ماند نام‌هایی که q را دارند. مقایسه روی شکل نرمال‌شده (ي/ی، ك/ک، نیم‌فاصله، رقم‌ها)
+    و ترتیب هم ترتیب search_name است تا LIMIT روی خود ایندکس متوقف شود.
+    خروجی: حداکثر limit ردیف values.
+    """
+    q = normalize_search(q)
+    order = ("search_name", "id")
+    if not q:
+        return list(qs.order_by(*order).values(*fields)[:limit])
+    rows = list(qs.filter(search_prefix("search_name", q)).order_by(*order).values(*fields)[:limit])
+    if len(rows) < limit:
+        seen = [r["id"] for r in rows]
+        rows += list(qs.filter(search_name__contains=q).exclude(id__in=seen)
+                       .order_by(*order).values(*fields)[:limit - len(rows)])
+    return rows
+
+def _autocomplete_args(request):
+    q = (request.GET.get("q") or "").strip()
+    try:
+        limit = int(request.GET.get("limit") or AUTOCOMPLETE_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    return q, max(1, min(limit, AUTOCOMPLETE_MAX))
+
 @login_required
+def ajax_item_search(request):
+    q, limit = _autocomplete_args(request)
+    rows = _autocomplete(Item.objects.all(), q, limit, ("id", "name", "sell_price", "inventory__qty"))
+    results = [{
+        "id": r["id"],
+        "text": r["name"],
+        "name": r["name"],
+        "sell_price": float(r["sell_price"] or 0),
+        "stock": float(r["inventory__qty"] or 0),
+    } for r in rows]
+    return JsonResponse({"results": results})
+
+@login_required
+def ajax_party_search(request):
+    q, limit = _autocomplete_args(request)
+    qs = Party.objects.all()
+    role = request.GET.get("role")
+    if role == "customer":
+        qs = Party.objects.customers()
+    elif role == "supplier":
+        qs = Party.objects.suppliers()
+    rows = _autocomplete(qs, q, limit, ("id", "name"))
+    return JsonResponse({"results": [{"id": r["id"], "text": r["name"], "name": r["name"]} for r in rows]})
+
+@login_required
+@cached_view(TX, ITEMS)
 def items_list(request):
     q = (request.GET.get("q") or "").strip()
     exclude_zero = request.GET.get("exclude_zero") == "on"
@@ -340,8 +417,9 @@ def items_list(request):
         .order_by("name")
     )
 
-    if q:
-        items = items.filter(name__icontains=q)
+    term = normalize_search(q)  # ي/ی، ك/ک، نیم‌فاصله و رقم‌ها یکسان
+    if term:
+        items = items.filter(search_name__contains=term)
 
     if exclude_zero:
         items = items.filter(Q(inventory__qty__isnull=False))  # رکورد موجودی داشته باشه
@@ -388,49 +466,23 @@ def item_create(request):
         return render(request, "ledger/partials/item_form.html", {"form": form})
 
 @login_required
+@cached_view(TX, PARTIES)
 def parties_list(request):
     q = (request.GET.get("q") or "").strip()
     include_customers = request.GET.get("include_customers") == "on"
     include_suppliers = request.GET.get("include_suppliers") == "on"
     exclude_zero = request.GET.get("exclude_zero") == "on"
 
+    # جمع‌ها از جدول خلاصه‌ی PartyBalance (O(طرف حساب‌ها)، نه O(تراکنش‌ها))
     parties = (
-        Party.objects.annotate(
-            total_sell=Sum(
-                Case(
-                    When(transactions__op_type=OP_SELL, then=F("transactions__total_price")),
-                    default=0, output_field=IntegerField(),
-                )
-            ),
-            total_rcv=Sum(
-                Case(
-                    When(transactions__op_type=OP_RCV, then=F("transactions__total_price")),
-                    default=0, output_field=IntegerField(),
-                )
-            ),
-            total_buy=Sum(
-                Case(
-                    When(transactions__op_type=OP_BUY, then=F("transactions__total_price")),
-                    default=0, output_field=IntegerField(),
-                )
-            ),
-            total_pay=Sum(
-                Case(
-                    When(transactions__op_type=OP_PAY, then=F("transactions__total_price")),
-                    default=0, output_field=IntegerField(),
-                )
-            ),
-        )
-        .annotate(
-            balance=ExpressionWrapper(
-                (F("total_sell") - F("total_rcv")) - (F("total_buy") - F("total_pay")),
-                output_field=IntegerField(),
-            )
-        ).order_by("name")
+        Party.objects
+        .annotate(balance=Coalesce(F("summary__balance"), Value(0), output_field=BigIntegerField()))
+        .order_by("name")
     )
 
-    if q:
-        parties = parties.filter(name__icontains=q)
+    term = normalize_search(q)  # ي/ی، ك/ک، نیم‌فاصله و رقم‌ها یکسان
+    if term:
+        parties = parties.filter(search_name__contains=term)
 
     if include_customers:
         parties = parties.filter(is_customer=True)
@@ -501,78 +553,65 @@ def transaction_list(request):
     # --- فیلترها ---
     qs = Transaction.objects.select_related('item', 'party')
     if form.is_valid():
-        op_type     = form.cleaned_data.get('op_type') or ''
-        party       = form.cleaned_data.get('party') or ''
-        item        = form.cleaned_data.get('item') or ''
-        qty         = toEn(form.cleaned_data.get('qty'), True)
-        unit_price  = toEn(form.cleaned_data.get('unit_price'), True)
-        total_price = toEn(form.cleaned_data.get('total_price'), True)
-        cogs        = toEn(form.cleaned_data.get('cogs'), True)
-        description = form.cleaned_data.get('description') or ''
-
-        if op_type:     qs = qs.filter(op_type=op_type)
-        if item:        qs = qs.filter(item=item)
-        if party:       qs = qs.filter(party=party)
-        if qty is not None:         qs = qs.filter(qty=qty)
-        if unit_price is not None:  qs = qs.filter(unit_price=unit_price)
-        if total_price is not None: qs = qs.filter(total_price=total_price)
-        if cogs is not None:        qs = qs.filter(cogs=cogs)
-        if description: qs = qs.filter(description__icontains=description)
-
-        day   = toEn(form.cleaned_data.get('day_input'))
-        month = toEn(form.cleaned_data.get('month_input'))
-        year  = toEn(form.cleaned_data.get('year_input'))
-
-        # 🧠 فیلتر ترکیبی تاریخ
-        if year or month or day:
-            # ساخت regex دینامیک
-            pattern = '^'
-            if year:
-                pattern += str(year).zfill(4)
-            else:
-                pattern += r'\d{4}'  # هر سالی
-
-            if month:
-                pattern += '/' + str(month).zfill(2)
-            else:
-                pattern += r'/\d{2}'  # هر ماهی
-
-            if day:
-                pattern += '/' + str(day).zfill(2)
-            else:
-                pattern += r'/\d{2}'  # هر روزی
-
-            qs = qs.filter(date_shamsi__regex=pattern)
-
-    # --- Infinite scroll ---
-    last_id = request.GET.get('last_id')
-    limit = 50
-
-    if last_id:
-        # رکوردهای قدیمی‌تر از آخرین ردیف فعلی
-        qs = qs.filter(id__lt=last_id).order_by('-date_miladi', '-id')[:limit]
-    else:
-        # بار اول → جدیدترین‌ها
-        qs = qs.order_by('-date_miladi', '-id')[:limit]
+        qs = form.filter_queryset(qs)
 
-    txs = list(qs)
-    last_id = txs[-1].id if txs else None
+    # --- Infinite scroll (keyset روی (date_miladi, id)؛ cursor = بعد از آخرین ردیف فعلی) ---
+    limit = 50
+    try:
+        txs, next_cursor = keyset_page(qs, request.GET.get('cursor'), limit)
+    except ValueError:
+        return HttpResponseBadRequest("cursor invalid")
 
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         html = render_to_string("ledger/partials/tx_rows.html", {"transactions": txs, "page_source": "ALL"}, request=request)
         return JsonResponse({
             "html": html,
-            "last_id": txs[-1].id if txs else None,   # قدیمی‌ترین در مجموعه فعلی
-            "has_more": len(txs) == limit,
+            "next_cursor": next_cursor,   # None یعنی رکورد قدیمی‌تری نیست
+            "has_more": next_cursor is not None,
         })
 
     return render(request, "ledger/transaction_list.html", {
         "transactions": txs,
         "form": form,
-        "transactions_last_id": last_id,
+        "transactions_next_cursor": next_cursor or "",
         "page_source": "ALL",
     })
 
+log = logging.getLogger("ledger.export")
+
+@login_required
+def transaction_export(request):
+    """خروجی CSV/XLSX تراکنش‌ها با همان فیلترهای لیست تراکنش‌ها (?format=csv|xlsx)."""
+    from .forms import TransactionFilterForm
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "xlsx"):
+        return HttpResponseBadRequest("format invalid")
+
+    form = TransactionFilterForm(request.GET or None)
+    qs = Transaction.objects.all()
+    if form.is_valid():
+        qs = form.filter_queryset(qs)
+    filename = f"transactions-{jdatetime.date.today():%Y%m%d}.{fmt}"
+    stats = {}
+
+    if fmt == "csv":
+        def body():
+            yield from iter_csv(export_rows(qs), stats)
+            log.info("CSV export: %d rows in %.1fs (%.0f rows/s)",
+                     stats["rows"], stats["seconds"], stats["rows"] / max(stats["seconds"], 1e-9))
+        response = StreamingHttpResponse(body(), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    # فایل zip اکسل فقط در پایان کامل می‌شود → اول در فایل موقت، بعد به‌صورت جریان
+    tmp = tempfile.TemporaryFile()
+    write_xlsx(export_rows(qs), tmp, stats)
+    tmp.seek(0)
+    log.info("XLSX export: %d rows in %.1fs (%.0f rows/s)",
+             stats["rows"], stats["seconds"], stats["rows"] / max(stats["seconds"], 1e-9))
+    return FileResponse(tmp, as_attachment=True, filename=filename,
+                        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
 @login_required
 def get_party_transactions(request):
     """
@@ -592,40 +631,19 @@ def get_party_transactions(request):
         Transaction.objects
         .select_related('item', 'party')
         .filter(party_id=party_id)
-        .order_by('date_miladi', 'id')
-        .annotate(
-            delta=Case(
-                When(op_type=OP_SELL, then= Coalesce(F('total_price'), Value(0))),
-                When(op_type=OP_RCV,  then=-Coalesce(F('total_price'), Value(0))),
-                When(op_type=OP_BUY,  then=-Coalesce(F('total_price'), Value(0))),
-                When(op_type=OP_PAY,  then= Coalesce(F('total_price'), Value(0))),
-                When(op_type=OP_USE,  then= Coalesce(F('total_price'), Value(0))),
-                default=Value(0),
-                output_field=BigIntegerField(),
-            )
-        )
-        .annotate(
-            running_balance=Window(
-                expression=Sum('delta'),
-                order_by=[F('date_miladi').asc(), F('id').asc()],
-            )
-        )
     )
 
-    if page_source == 'buy':
-        base_qs = base_qs.annotate(
-            running_balance=-(Coalesce(F('running_balance'), Value(0)))
-        )
-
-    total_count = base_qs.count()
-    if total_count == 0:
+    # مانده‌ی هر ردیف ذخیره‌شده است → فقط آخرین limit ردیف خوانده می‌شود
+    page_txs = _last_n_keep_ascending(base_qs, limit)
+    if not page_txs:
         html = '<tr><td colspan="7" class="text-center">رکوردی یافت نشد</td></tr>'
         return HttpResponse(html, content_type='text/html; charset=utf-8')
 
-    start_index = max(0, total_count - limit)
-    page_qs = base_qs[start_index:total_count]  # برش صفحه بعد از محاسبه مانده
+    if page_source == 'buy':
+        for t in page_txs:
+            t.running_balance = -(t.running_balance or 0)
 
-    html = render_to_string('ledger/partials/party_modal_rows.html', {'txs': page_qs, 'page_source': page_source}, request=request)
+    html = render_to_string('ledger/partials/party_modal_rows.html', {'txs': page_txs, 'page_source': page_source}, request=request)
     return HttpResponse(html, content_type='text/html; charset=utf-8')
 
 @login_required
@@ -644,7 +662,7 @@ def get_item_transactions(request):
             item_id=item_id,
             op_type__in = (OP_SELL, OP_BUY, OP_USE)
         )
-        .order_by('date_miladi', 'id')
+        .order_by(*CHRONO)
         .annotate(
             delta=Case(
                 When(op_type=OP_SELL, then=-Coalesce(F('qty'), Value(0))),
@@ -657,7 +675,7 @@ def get_item_transactions(request):
         .annotate(
             running_balance=Window(
                 expression=Sum('delta'),
-                order_by=[F('date_miladi').asc(), F('id').asc()],
+                order_by=list(CHRONO),
             )
         )
     )
@@ -676,7 +694,7 @@ def get_item_transactions(request):
 @login_required
 def get_recent_transactions(request):
     op_type = request.GET.get("op_type")
-    last_id = request.GET.get("last_id")
+    cursor  = request.GET.get("cursor")
 
     limit = int(request.GET.get("limit", 50))
     qs = Transaction.objects.select_related("item", "party")
@@ -687,12 +705,10 @@ def get_recent_transactions(request):
         else:
             qs = qs.filter(op_type=op_type)
 
-    if last_id:
-        qs = qs.filter(id__lt=last_id)
-
-    qs = qs.order_by("-date_miladi", "-id")[:limit]
-
-    txs = list(qs)  # ترتیب نزولی (جدیدترین → قدیمی‌تر)
+    try:
+        txs, next_cursor = keyset_page(qs, cursor, limit)  # ترتیب نزولی (جدیدترین → قدیمی‌تر)
+    except ValueError:
+        return HttpResponseBadRequest("cursor invalid")
 
     if not txs:
         html = '<tr><td colspan="7" class="text-center">هیچ تراکنشی یافت نشد</td></tr>'
@@ -703,63 +719,41 @@ def get_recent_transactions(request):
             page_source = "PAYRCV"
 
         html = render_to_string("ledger/partials/tx_rows.html", {"transactions": txs, "page_source": page_source}, request=request)
-        html += f'<input type="hidden" class="last-id" value="{txs[-1].id}" data-hasmore="false">'
+        has_more = "true" if next_cursor else "false"
+        html += f'<input type="hidden" class="next-cursor" value="{next_cursor or ""}" data-hasmore="{has_more}">'
     return HttpResponse(html, content_type="text/html; charset=utf-8")
 
+@cached_view(TX, PARTIES)
 def customer_balance_report(request):
     q = (request.GET.get("q") or "").strip()
     exclude_zero = request.GET.get("exclude_zero") == "on"
 
-    int0 = Value(0, output_field=IntegerField())
-
+    # از جدول خلاصه‌ی PartyBalance (هر طرف حساب دارای تراکنش یک ردیف)
     base = (
-        Transaction.objects
-        .values("party_id", party_name=F("party__name"))
-        .annotate(
-            total_purchase=Coalesce(
-                Sum(
-                    Case(
-                        When(op_type = OP_SELL, then=F("total_price")),
-                        default=int0,
-                        output_field=IntegerField(),
-                    ),
-                    output_field=IntegerField(),
-                ),
-                int0,
-                output_field=IntegerField(),
-            ),
-            total_payment=Coalesce(
-                Sum(
-                    Case(
-                        When(op_type = OP_RCV, then=F("total_price")),
-                        default=int0,
-                        output_field=IntegerField(),
-                    ),
-                    output_field=IntegerField(),
-                ),
-                int0,
-                output_field=IntegerField(),
-            ),
-        )
-        .annotate(
-            balance=ExpressionWrapper(
-                F("total_purchase") - F("total_payment"),
-                output_field=IntegerField(),
-            )
+        PartyBalance.objects
+        .values(
+            "party_id",
+            party_name=F("party__name"),
+            total_purchase=F("total_sell"),
+            total_payment=F("total_rcv"),
+            customer_balance=ExpressionWrapper(F("total_sell") - F("total_rcv"), output_field=BigIntegerField()),
         )
     )
 
-    if q:
-        base = base.filter(party__name__icontains=q)
+    term = normalize_search(q)  # ي/ی، ك/ک، نیم‌فاصله و رقم‌ها یکسان
+    if term:
+        base = base.filter(party__search_name__contains=term)
 
     if exclude_zero:
-        base = base.filter(~Q(balance=0))
+        base = base.exclude(customer_balance=0)
 
     # ترتیب نمایش
-    rows_qs = base.order_by("-balance", "party__name")
+    rows_qs = base.order_by("-customer_balance", "party__name")
 
     # ردیف‌های قابل‌نمایش را به لیست تبدیل کن
     rows = list(rows_qs)
+    for r in rows:
+        r["balance"] = r.pop("customer_balance")
 
     # جمع مانده‌ها روی همین rows (دقیقاً همان چیزی که کاربر می‌بیند)
     sum_balance = sum((r.get("balance") or 0) for r in rows)
@@ -786,20 +780,16 @@ def customer_balance_report(request):
     }
     return render(request, "reports/customer_balance_report.html", context)
 
+@cached_view(TX)
 def monthly_sales(request):
     monthly_sales = (
-        Transaction.objects
-        .filter(op_type__in=[OP_SELL, OP_USE])  # فقط فروش
+        DailySalesRollup.objects
+        .filter(rows__gt=0)  # جمع روزانه‌ی فروش/مصرف
+        .values(year=F("jy"), month=F("jm"))
         .annotate(
-            year =Cast(Substr("date_shamsi", 1, 4), IntegerField()),
-            month=Cast(Substr("date_shamsi", 6, 2), IntegerField()),
-            day  =Cast(Substr("date_shamsi", 9, 2), IntegerField()),
-        )
-        .values("year", "month")
-        .annotate(
-            total_sales    =Coalesce(Sum("total_price"), Value(0)),
+            total_sales    =Coalesce(Sum("sales"), Value(0)),
             total_cogs     =Coalesce(Sum("cogs"), Value(0)),
-            days_with_sales=Count("day", distinct=True),  # تعداد روزهای فروش در ماه
+            days_with_sales=Count("id"),  # تعداد روزهای فروش در ماه
         )
         .annotate(
             profit=F("total_sales") - F("total_cogs"),
@@ -827,6 +817,7 @@ def monthly_sales(request):
     context = {"monthly_sales": monthly_sales, "totals": totals, "max_sales": max_sales}
     return render(request, "ledger/monthly_sales.html", context)
 
+@cached_view(TX)
 def daily_sales(request, year, month):
     # محاسبات روزانه
 
@@ -837,22 +828,14 @@ def daily_sales(request, year, month):
         end_day = JalaliDate(year, month + 1, 1).to_gregorian()
 
     qs = (
-        Transaction.objects
-        .filter(
-            date_miladi__gte=start_day,
-            date_miladi__lt=end_day,
-            op_type__in=[OP_SELL, OP_USE])
-        .annotate(day=Cast(Substr("date_shamsi", 9, 2), IntegerField()))
-        .values("day")
-        .annotate(
-            total_sales =Coalesce(Sum("total_price"), Value(0)),
-            total_cogs  =Coalesce(Sum("cogs"), Value(0)),
-        )
+        DailySalesRollup.objects
+        .filter(jy=year, jm=month, rows__gt=0)
+        .values(day=F("jd"), total_sales=F("sales"), total_cogs=F("cogs"))
         .annotate(
             profit=F("total_sales") - F("total_cogs"),
             profit_percent=ExpressionWrapper(100.0 * F("profit") / F("total_sales"), output_field=FloatField(),)
         )
-        .order_by("date_shamsi")
+        .order_by("day")
     )
 
     qs_map = {}
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # بیرونی‌ترین: کوئری‌های session/auth هم شمرده می‌شوند (خاموش → از زنجیره حذف می‌شود)
+    "ledger.instrumentation.RequestInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # ?_profile=1 برای staff (request.user لازم است)
+    "ledger.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -78,8 +83,58 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # تراکنش‌های atomic با BEGIN IMMEDIATE (قفل نوشتن از اول؛ بدون بن‌بست DEFERRED)
+            "transaction_mode": "IMMEDIATE",
+        },
+    }
+}
+
+# PostgreSQL با متغیرهای محیطی (pip install "psycopg[binary]"):
+#   LEDGER_DB=postgres PGDATABASE=hbmaison PGUSER=... PGPASSWORD=... PGHOST=localhost PGPORT=5432
+# انتقال داده‌ی db.sqlite3 موجود: python manage.py sqlite_to_postgres --source db.sqlite3
+if os.environ.get("LEDGER_DB") == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("PGDATABASE", "hbmaison"),
+            "USER": os.environ.get("PGUSER", ""),
+            "PASSWORD": os.environ.get("PGPASSWORD", ""),
+            "HOST": os.environ.get("PGHOST", ""),
+            "PORT": os.environ.get("PGPORT", ""),
+            "CONN_MAX_AGE": int(os.environ.get("PG_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+
+# PRAGMAهای هر اتصال SQLite (ledger/sqlite.py): "production" = WAL و ... ، "default" = پیش‌فرض SQLite
+LEDGER_SQLITE_PROFILE = os.environ.get("LEDGER_SQLITE_PROFILE", "production")
+
+# کش پاسخ گزارش‌ها (ledger/viewcache.py)
+# فایلی و نه locmem: چند پروسس وب باید شمارنده‌های نسخه‌ی مشترک ببینند
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
     }
 }
+LEDGER_VIEW_CACHE_TIMEOUT = 3600  # ثانیه؛ باطل شدن اصلی با شمارنده‌های نسخه است
+
+# اندازه‌گیری هر درخواست (ledger/instrumentation.py): Server-Timing + خط لاگ ledger.requests
+# LEDGER_INSTRUMENT=1/0 در محیط؛ تنظیم‌نشده → همان DEBUG
+LEDGER_INSTRUMENT = {"1": True, "0": False}.get(os.environ.get("LEDGER_INSTRUMENT"))
+LEDGER_INSTRUMENT_DUP_THRESHOLD = 3   # تکرار یک شکل کوئری در یک درخواست → هشدار N+1
+LEDGER_SLOW_REQUEST_MS = 500
+
+# پروفایل cProfile درخواست‌های staff با ?_profile=1 (ledger/profiling.py) ؛ فهرست: /admin/profiles/
+LEDGER_PROFILING = True
+LEDGER_PROFILE_DIR = BASE_DIR / "profiles"
+LEDGER_PROFILE_KEEP = 50
+
+# لاگ کوئری‌های کند با EXPLAIN (ledger/slowlog.py) ؛ گزارش: manage.py slow_queries ؛ None → خاموش
+LEDGER_SLOW_QUERY_MS = 200
+LEDGER_SLOW_QUERY_LOG = BASE_DIR / "logs" / "slow_queries.jsonl"
 
 
 # Password validation
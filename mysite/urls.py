@@ -3,6 +3,9 @@ from django.contrib import admin
 from django.urls import path, include
 
 urlpatterns = [
+    # قبل از admin.site.urls (که همه‌ی مسیرهای admin/ را می‌گیرد)
+    path('admin/profiles/', ledger_views.profile_list, name='profile_list'),
+    path('admin/profiles/<str:name>/', ledger_views.profile_detail, name='profile_detail'),
     path('admin/', admin.site.urls),
     path('', include('ledger.urls')),  # اطمینان از این خط مهمه
     path('', ledger_views.register_purchase, name='home')
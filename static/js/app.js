@@ -10,17 +10,35 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 });
 
+// select2 با جستجوی ajax برای لیست‌های بزرگ (data-autocomplete روی <select>)
+// فقط گزینه‌ی انتخاب‌شده در HTML است؛ بقیه با تایپ از سرور می‌آیند
+function autocompleteOptions($el, options) {
+  const url = $el.data('autocomplete');
+  if (!url) return options;
+  const role = $el.data('role');
+  return Object.assign({
+    allowClear: !$el.prop('required'),
+    ajax: {
+      url: url,
+      dataType: 'json',
+      delay: 200,
+      data: params => ({ q: params.term || '', role: role || '' }),
+      processResults: data => data,
+    },
+  }, options);
+}
+
 function initSelect2BySize() {
   $('.select2').each(function() {
     const $el = $(this);
-    $el.select2({
+    $el.select2(autocompleteOptions($el, {
       dir: 'rtl',
       placeholder: $el.attr('placeholder') || 'انتخاب کنید',
       width: 'resolve', // 👈 یعنی عرض را از CSS بخوان
       language: {
         noResults: function() { return "موردی یافت نشد"; }
       }
-    });
+    }));
   });
 }
 
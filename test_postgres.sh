@@ -0,0 +1,34 @@
+#!/bin/bash
+# اجرای تست‌ها روی PostgreSQL محلی (داخل docker؛ پیش‌نیاز: pip install "psycopg[binary]")
+#   ./test_postgres.sh                 # همه‌ی تست‌های ledger
+#   ./test_postgres.sh ledger.tests.PostgresSupportTests
+# اگر PostgreSQL از قبل در دسترس است: PG_EXTERNAL=1 و متغیرهای PGHOST/PGPORT/PGUSER/PGPASSWORD
+
+set -e
+
+export LEDGER_DB=postgres
+export PGHOST=${PGHOST:-127.0.0.1}
+export PGPORT=${PGPORT:-55432}
+export PGUSER=${PGUSER:-hbmaison}
+export PGPASSWORD=${PGPASSWORD:-hbmaison}
+export PGDATABASE=${PGDATABASE:-hbmaison}
+CONTAINER=hbmaison-test-pg
+
+if [ -z "$PG_EXTERNAL" ]; then
+    echo "🐘 راه‌اندازی PostgreSQL روی پورت $PGPORT ..."
+    docker rm -f "$CONTAINER" >/dev/null 2>&1 || true
+    docker run -d --name "$CONTAINER" -p "$PGPORT:5432" \
+        -e POSTGRES_USER="$PGUSER" -e POSTGRES_PASSWORD="$PGPASSWORD" -e POSTGRES_DB="$PGDATABASE" \
+        postgres:16 >/dev/null
+    trap 'docker rm -f "$CONTAINER" >/dev/null 2>&1' EXIT
+
+    # -h: فقط بعد از پایان init به TCP گوش می‌دهد (سوکت یونیکس زودتر آماده است)
+    until docker exec "$CONTAINER" pg_isready -h 127.0.0.1 -U "$PGUSER" >/dev/null 2>&1; do
+        sleep 1
+    done
+fi
+
+echo "🧪 اجرای تست‌ها روی PostgreSQL ..."
+python manage.py test ${@:-ledger} --noinput
+
+echo "✅ تست‌ها روی PostgreSQL با موفقیت اجرا شد."